@@ -0,0 +1,386 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим хранилищем SQLite.
+
+Общий уровень — файл SQLite (LOCATION), который видят все процессы
+сервера, поэтому сброс ключа в одном процессе сразу виден остальным.
+Каждая запись общего уровня хранит метку stamp, которая меняется при
+любой записи ключа. Локальный уровень держит копию значения вместе
+с меткой и отдаёт её только после сверки метки с общим уровнем: сверка
+читает одно число, а не всё значение, и не требует распаковки.
+
+Локальный уровень ограничен числом записей и суммарным размером
+сериализованных значений (OPTIONS LOCAL_MAX_ENTRIES, LOCAL_MAX_BYTES)
+и вытесняет давно не использованные записи. tier_stats() показывает
+попадания по уровням; счётчики процессов периодически сбрасываются
+в общее хранилище, поэтому статистика общая для всех процессов.
+"""
+
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+STATS_FIELDS = ('local_hits', 'shared_hits', 'misses')
+STATS_FLUSH_EVERY = 100
+CULL_EVERY = 100
+
+
+def _new_stamp():
+    return random.getrandbits(62)
+
+
+class LocalLRU:
+    """Ограниченный по размеру LRU-словарь ключ → (метка, срок, данные)."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, stamp, expires, data):
+        self.delete(key)
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = (stamp, expires, data)
+        self.size += len(data)
+        while (len(self._entries) > self.max_entries
+               or self.size > self.max_bytes):
+            _, (_, _, evicted) = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def delete(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[2])
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class TieredCache(BaseCache):
+    """Кэш Django с локальным LRU и общим хранилищем в файле SQLite."""
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self._local = LocalLRU(
+            int(options.get('LOCAL_MAX_ENTRIES', 1000)),
+            int(options.get('LOCAL_MAX_BYTES', 16 * 1024 * 1024)),
+        )
+        self._lock = threading.RLock()
+        self._connections = threading.local()
+        self._stats = dict.fromkeys(STATS_FIELDS, 0)
+        self._operations = 0
+        self._writes = 0
+
+    # общий уровень
+
+    def _connection(self):
+        connection = getattr(self._connections, 'connection', None)
+        if connection is None or self._connections.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.location, timeout=30, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL, stamp INTEGER NOT NULL)'
+            )
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS stats (field TEXT PRIMARY KEY, '
+                'value INTEGER NOT NULL)'
+            )
+            self._connections.connection = connection
+            self._connections.pid = os.getpid()
+        return connection
+
+    def _write(self, *statements):
+        """Выполняет запросы в одной транзакции с блокировкой записи."""
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            for sql, params in statements:
+                connection.execute(sql, params)
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _expires(self, timeout):
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _alive(expires):
+        return expires is None or expires > time.time()
+
+    # учёт попаданий
+
+    def _count(self, field, amount=1):
+        with self._lock:
+            self._stats[field] += amount
+            self._operations += amount
+            if self._operations >= STATS_FLUSH_EVERY:
+                self._flush_stats()
+
+    def _flush_stats(self):
+        pending = [
+            (field, value) for field, value in self._stats.items() if value
+        ]
+        self._stats = dict.fromkeys(STATS_FIELDS, 0)
+        self._operations = 0
+        if not pending:
+            return
+        statements = []
+        for field, value in pending:
+            statements.append((
+                'INSERT OR IGNORE INTO stats (field, value) VALUES (?, 0)',
+                (field,)
+            ))
+            statements.append((
+                'UPDATE stats SET value = value + ? WHERE field = ?',
+                (value, field)
+            ))
+        self._write(*statements)
+
+    def tier_stats(self):
+        """Попадания по уровням и их доли среди всех обращений."""
+        with self._lock:
+            self._flush_stats()
+        rows = dict(self._connection().execute(
+            'SELECT field, value FROM stats'
+        ).fetchall())
+        values = {field: rows.get(field, 0) for field in STATS_FIELDS}
+        total = sum(values.values())
+        for field in ('local_hits', 'shared_hits'):
+            ratio = values[field] / total if total else 0.0
+            values[field.replace('hits', 'hit_ratio')] = ratio
+        values['local_entries'] = len(self._local)
+        values['local_bytes'] = self._local.size
+        return values
+
+    def reset_tier_stats(self):
+        with self._lock:
+            self._stats = dict.fromkeys(STATS_FIELDS, 0)
+            self._operations = 0
+        self._write(('DELETE FROM stats', ()))
+
+    # чтение
+
+    def _lookup(self, keys):
+        """{ключ: данные} для живых ключей из локального и общего уровней."""
+        with self._lock:
+            local = {
+                key: entry for key, entry in
+                ((key, self._local.get(key)) for key in keys) if entry
+            }
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, stamp, expires FROM cache '
+            f'WHERE key IN ({placeholders})', list(keys)
+        ).fetchall()
+        found, stale = {}, []
+        for key, stamp, expires in rows:
+            if not self._alive(expires):
+                continue
+            entry = local.get(key)
+            if entry is not None and entry[0] == stamp:
+                found[key] = entry[2]
+                self._count('local_hits')
+            else:
+                stale.append(key)
+        if stale:
+            found.update(self._fetch_shared(stale))
+        missing = len(keys) - len(found)
+        if missing:
+            self._count('misses', missing)
+        with self._lock:
+            for key in local:
+                if key not in found:
+                    self._local.delete(key)
+        return found
+
+    def _fetch_shared(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        rows = self._connection().execute(
+            f'SELECT key, stamp, expires, value FROM cache '
+            f'WHERE key IN ({placeholders})', list(keys)
+        ).fetchall()
+        found = {}
+        for key, stamp, expires, value in rows:
+            if not self._alive(expires):
+                continue
+            found[key] = bytes(value)
+            with self._lock:
+                self._local.set(key, stamp, expires, found[key])
+            self._count('shared_hits')
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        data = self._lookup([key]).get(key)
+        if data is None:
+            return default
+        return pickle.loads(data)
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        if not keys:
+            return {}
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        return {
+            made[key]: pickle.loads(data)
+            for key, data in self._lookup(list(made)).items()
+        }
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self._connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and self._alive(row[0])
+
+    # запись
+
+    def _store(self, key, value, timeout, mode):
+        data = pickle.dumps(value, self.pickle_protocol)
+        expires = self._expires(timeout)
+        stamp = _new_stamp()
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            if mode == 'add':
+                row = connection.execute(
+                    'SELECT expires FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and self._alive(row[0]):
+                    connection.execute('ROLLBACK')
+                    return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, stamp) '
+                'VALUES (?, ?, ?, ?)', (key, data, expires, stamp)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        with self._lock:
+            self._local.set(key, stamp, expires, data)
+            self._writes += 1
+            cull = self._writes % CULL_EVERY == 0
+        if cull:
+            self._cull()
+        return True
+
+    def _cull(self):
+        now = time.time()
+        self._write(('DELETE FROM cache WHERE expires <= ?', (now,)))
+        connection = self._connection()
+        count = connection.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            self.clear()
+            return
+        self._write((
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,)
+        ))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._store(key, value, timeout, 'add')
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._store(key, value, timeout, 'set')
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        expires = self._expires(timeout)
+        connection = self._connection()
+        cursor = connection.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)', (expires, key, time.time())
+        )
+        with self._lock:
+            self._local.delete(key)
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись под блокировкой."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None or not self._alive(row[1]):
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            data = pickle.dumps(value, self.pickle_protocol)
+            stamp = _new_stamp()
+            connection.execute(
+                'UPDATE cache SET value = ?, stamp = ? WHERE key = ?',
+                (data, stamp, key)
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        with self._lock:
+            self._local.set(key, stamp, row[1], data)
+        return value
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._delete_keys([key])
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_key(key, version=version) for key in keys]
+        for key in keys:
+            self.validate_key(key)
+        if keys:
+            self._delete_keys(keys)
+
+    def _delete_keys(self, keys):
+        placeholders = ', '.join('?' * len(keys))
+        self._write(
+            (f'DELETE FROM cache WHERE key IN ({placeholders})', keys)
+        )
+        with self._lock:
+            for key in keys:
+                self._local.delete(key)
+
+    def clear(self):
+        self._write(('DELETE FROM cache', ()))
+        with self._lock:
+            self._local.clear()
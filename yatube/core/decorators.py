@@ -0,0 +1,56 @@
+"""Бюджеты SQL-запросов для view-функций.
+
+Декоратор query_budget считает запросы, выполненные view-функцией
+(включая отрисовку шаблона), и сообщает о превышении объявленного
+бюджета: при QUERY_BUDGET_RAISE = True выбрасывает QueryBudgetExceeded,
+иначе пишет предупреждение в журнал core.decorators.
+"""
+
+import functools
+import logging
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(Exception):
+    """View-функция выполнила больше запросов, чем позволяет бюджет."""
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(limit):
+    """Ограничивает число SQL-запросов view-функции значением limit."""
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with connection.execute_wrapper(counter):
+                response = view(request, *args, **kwargs)
+            logger.debug(
+                '%s: %d из %d запросов', view.__name__, counter.count, limit
+            )
+            if counter.count > limit:
+                message = (
+                    f'{view.__name__} выполнила {counter.count} запросов '
+                    f'при бюджете {limit}'
+                )
+                if settings.QUERY_BUDGET_RAISE:
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+
+        wrapper.query_budget = limit
+        return wrapper
+
+    return decorator
@@ -0,0 +1,39 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from core.page_cache import reset_stats, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Показывает статистику попаданий в кэш полных страниц '
+        'и в уровни кэша TieredCache'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true',
+            help='Обнулить счётчики после вывода'
+        )
+
+    def handle(self, *args, **options):
+        values = stats()
+        self.stdout.write(
+            f'Попаданий: {values["hits"]}, промахов: {values["misses"]}, '
+            f'доля попаданий: {values["hit_ratio"]:.1%}'
+        )
+        if hasattr(cache, 'tier_stats'):
+            tiers = cache.tier_stats()
+            self.stdout.write(
+                f'Кэш в памяти: {tiers["local_hits"]} '
+                f'({tiers["local_hit_ratio"]:.1%}), '
+                f'общий кэш: {tiers["shared_hits"]} '
+                f'({tiers["shared_hit_ratio"]:.1%}), '
+                f'промахов: {tiers["misses"]}; '
+                f'в памяти {tiers["local_entries"]} записей, '
+                f'{tiers["local_bytes"]} байт'
+            )
+        if options['reset']:
+            reset_stats()
+            if hasattr(cache, 'reset_tier_stats'):
+                cache.reset_tier_stats()
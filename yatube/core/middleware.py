@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .page_cache import load_page, page_key, record, store_page
+
+
+class AnonymousPageCacheMiddleware:
+    """Отдаёт анонимным GET-запросам страницы из кэша core.page_cache.
+
+    Кэшируются только ответы 200, помеченные тегами и не устанавливающие
+    cookie. Сохранённые ETag и Last-Modified позволяют ответить 304
+    на условный запрос прямо из кэша. Должен стоять после
+    AuthenticationMiddleware. Включается настройкой PAGE_CACHE_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_cacheable_request(request):
+            return self.get_response(request)
+        key = page_key(request)
+        response = load_page(key)
+        if response is not None:
+            record('hit')
+            response = get_conditional_response(
+                request,
+                etag=response.get('ETag'),
+                last_modified=parse_http_date_safe(
+                    response.get('Last-Modified')
+                ),
+                response=response,
+            )
+            response['X-Page-Cache'] = 'HIT'
+            return response
+        record('miss')
+        response = self.get_response(request)
+        if self.is_cacheable_response(request, response):
+            store_page(key, response)
+        response['X-Page-Cache'] = 'MISS'
+        return response
+
+    def is_cacheable_request(self, request):
+        if not settings.PAGE_CACHE_ENABLED or request.method != 'GET':
+            return False
+        if settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            return True
+        return not request.user.is_authenticated
+
+    def is_cacheable_response(self, request, response):
+        return (
+            response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+            and not request.META.get('CSRF_COOKIE_USED')
+            and bool(getattr(response, 'page_cache_tags', None))
+        )
@@ -0,0 +1,177 @@
+"""Кэш полных страниц для анонимных GET-запросов.
+
+View-функция помечает ответ тегами (add_cache_tags), от которых зависит
+страница. Для каждого тега в кэше хранится версия; запись страницы
+запоминает версии своих тегов и считается действительной, пока они
+не изменились. invalidate() увеличивает версии тегов, поэтому страница
+устаревает ровно тогда, когда меняются её данные, а не по истечении TTL.
+
+Рядом с версией тега хранится время его последнего изменения;
+tags_modified() даёт по нему Last-Modified, который меняется вместе
+с ETag из versions_etag().
+"""
+
+import hashlib
+import threading
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.encoding import force_bytes
+
+from .cache import STATS_FLUSH_EVERY
+
+PAGE_TIMEOUT = 60 * 60
+TAG_PREFIX = 'page_cache:tag:'
+STAMP_PREFIX = 'page_cache:stamp:'
+PAGE_PREFIX = 'page_cache:page:'
+STATS_KEYS = {'hit': 'page_cache:hits', 'miss': 'page_cache:misses'}
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+_stats = dict.fromkeys(STATS_KEYS.values(), 0)
+_stats_lock = threading.Lock()
+
+
+def _initial_version():
+    # не совпадает с версиями, выданными до вытеснения ключа тега
+    return int(time.time() * 1000)
+
+
+def tag_versions(tags):
+    """Текущие версии тегов; отсутствующие теги получают новую версию."""
+    keys = {TAG_PREFIX + tag: tag for tag in tags}
+    stored = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys if key not in stored}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+            cache.add(STAMP_PREFIX + keys[key], time.time(), None)
+        stored.update(cache.get_many(missing))
+    return {keys[key]: version for key, version in stored.items()}
+
+
+def invalidate(*tags):
+    """Делает недействительными все страницы, помеченные тегами."""
+    for tag in tags:
+        try:
+            cache.incr(TAG_PREFIX + tag)
+        except ValueError:
+            cache.add(TAG_PREFIX + tag, _initial_version(), None)
+    if tags:
+        now = time.time()
+        cache.set_many({STAMP_PREFIX + tag: now for tag in tags}, None)
+
+
+def tags_modified(tags):
+    """Время (timestamp) последнего изменения данных тегов.
+
+    Тег без метки (новый или вытесненный из кэша) считается изменённым
+    сейчас: ответ на If-Modified-Since не окажется устаревшим.
+    """
+    keys = [STAMP_PREFIX + tag for tag in tags]
+    stamps = cache.get_many(keys)
+    now = time.time()
+    for key in keys:
+        if key not in stamps:
+            cache.add(key, now, None)
+            stamps[key] = now
+    return max(stamps.values(), default=None)
+
+
+def versions_etag(tags, *parts):
+    """ETag из текущих версий тегов и дополнительных частей."""
+    versions = tag_versions(tags)
+    raw = ';'.join(
+        [f'{tag}={versions[tag]}' for tag in sorted(versions)]
+        + [str(part) for part in parts]
+    )
+    return hashlib.md5(force_bytes(raw)).hexdigest()
+
+
+def add_cache_tags(response, *tags):
+    """Помечает ответ тегами, от которых зависит страница."""
+    response.page_cache_tags = getattr(
+        response, 'page_cache_tags', set()
+    ) | set(tags)
+    return response
+
+
+def page_key(request):
+    """Ключ страницы: путь и отсортированная строка запроса."""
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists()
+        for value in values if value
+    ))
+    raw = f'{request.path}?{query}'
+    return PAGE_PREFIX + hashlib.md5(force_bytes(raw)).hexdigest()
+
+
+def load_page(key):
+    entry = cache.get(key)
+    if entry is None or tag_versions(entry['tags']) != entry['tags']:
+        return None
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type']
+    )
+    for header, value in entry.get('headers', {}).items():
+        response[header] = value
+    return response
+
+
+def store_page(key, response):
+    cache.set(key, {
+        'tags': tag_versions(response.page_cache_tags),
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'headers': {
+            header: response[header]
+            for header in VALIDATOR_HEADERS if response.has_header(header)
+        },
+    }, PAGE_TIMEOUT)
+
+
+def _flush_stats():
+    pending = {key: value for key, value in _stats.items() if value}
+    _stats.update(dict.fromkeys(STATS_KEYS.values(), 0))
+    for key, value in pending.items():
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.add(key, 0, None)
+            cache.incr(key, value)
+
+
+def record(event):
+    """Учитывает попадание или промах.
+
+    Счётчики копятся в процессе и переносятся в общий кэш раз в
+    STATS_FLUSH_EVERY событий: запись в общий уровень берёт блокировку
+    базы, и делать её на каждый анонимный запрос слишком дорого.
+    """
+    with _stats_lock:
+        _stats[STATS_KEYS[event]] += 1
+        if sum(_stats.values()) >= STATS_FLUSH_EVERY:
+            _flush_stats()
+
+
+def stats():
+    """Число попаданий, промахов и доля попаданий."""
+    with _stats_lock:
+        _flush_stats()
+    values = cache.get_many(STATS_KEYS.values())
+    hits = values.get(STATS_KEYS['hit'], 0)
+    misses = values.get(STATS_KEYS['miss'], 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.update(dict.fromkeys(STATS_KEYS.values(), 0))
+    cache.delete_many(STATS_KEYS.values())
@@ -1,6 +1,14 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
 from django.test import TestCase
 from http import HTTPStatus
 
+from .cache import CULL_EVERY, LocalLRU, TieredCache
+
 
 class ViewTestClass(TestCase):
     def test_error_page(self):
@@ -14,3 +22,89 @@ class ViewTestClass(TestCase):
             HTTPStatus.NOT_FOUND
         )
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class TieredCacheTest(TestCase):
+    """Проверка двухуровневого кэша"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        location = os.path.join(directory, 'cache.sqlite3')
+        # два экземпляра с общим файлом — как два процесса сервера
+        self.first = TieredCache(location, {})
+        self.second = TieredCache(location, {})
+
+    def test_tests_use_own_shared_file(self):
+        """Тесты не очищают файл кэша сервера разработки"""
+        self.assertFalse(
+            cache.location.startswith(settings.BASE_DIR + os.sep)
+        )
+
+    def test_shared_tier_is_culled_to_max_entries(self):
+        """Общий уровень прореживается после MAX_ENTRIES записей"""
+        location = self.first.location
+        limited = TieredCache(location, {'OPTIONS': {'MAX_ENTRIES': 150}})
+        for number in range(2 * CULL_EVERY):
+            limited.set(f'key{number}', number)
+        count = limited._connection().execute(
+            'SELECT COUNT(*) FROM cache'
+        ).fetchone()[0]
+        self.assertLessEqual(count, 150)
+
+    def test_changes_are_visible_to_other_processes(self):
+        """Запись и удаление в одном процессе видны в другом"""
+        self.first.set('key', 'старое')
+        self.assertEqual(self.second.get('key'), 'старое')
+        self.first.set('key', 'новое')
+        self.assertEqual(self.second.get('key'), 'новое')
+        self.first.delete('key')
+        self.assertIsNone(self.second.get('key'))
+        self.assertTrue(self.second.add('key', 'снова'))
+        self.assertFalse(self.first.add('key', 'дубль'))
+
+    def test_incr_is_shared(self):
+        """incr увеличивает общее значение, а не локальную копию"""
+        self.first.set('counter', 1)
+        self.assertEqual(self.second.get('counter'), 1)
+        self.first.incr('counter')
+        self.assertEqual(self.second.incr('counter'), 3)
+        self.assertEqual(self.first.get('counter'), 3)
+        with self.assertRaises(ValueError):
+            self.first.incr('missing')
+
+    def test_tier_hit_ratios(self):
+        """Статистика различает попадания в локальный и общий уровни"""
+        self.first.set('key', 'значение')
+        self.first.get('key')
+        self.second.get('key')
+        self.second.get('missing')
+        # каждый процесс сбрасывает свои счётчики в общее хранилище
+        self.second.tier_stats()
+        stats = self.first.tier_stats()
+        self.assertEqual(
+            (stats['local_hits'], stats['shared_hits'], stats['misses']),
+            (1, 1, 1)
+        )
+        self.assertAlmostEqual(stats['local_hit_ratio'], 1 / 3)
+        self.first.reset_tier_stats()
+        self.assertEqual(self.second.tier_stats()['misses'], 0)
+
+    def test_expired_entries_are_missed(self):
+        """Просроченная запись не отдаётся ни одним уровнем"""
+        self.first.set('key', 'значение', timeout=-1)
+        self.assertIsNone(self.first.get('key'))
+        self.assertFalse(self.second.has_key('key'))
+
+    def test_local_lru_is_bounded_by_size(self):
+        """Локальный уровень вытесняет давние записи по размеру"""
+        lru = LocalLRU(max_entries=10, max_bytes=10)
+        lru.set('a', 1, None, b'1234')
+        lru.set('b', 2, None, b'1234')
+        lru.get('a')
+        lru.set('c', 3, None, b'1234')
+        self.assertIsNone(lru.get('b'))
+        self.assertIsNotNone(lru.get('a'))
+        self.assertEqual(lru.size, 8)
+        lru.set('big', 4, None, b'x' * 11)
+        self.assertIsNone(lru.get('big'))
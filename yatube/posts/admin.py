@@ -1,15 +1,181 @@
 """Здесь настраивается отображение админ-зоны приложения.
 Добавлены и зарегистрированы модели Post и Group.
 При регистрации модели Post источником конфигурации для неё назначаем
-класс PostAdmin, для модели Group - класс GroupAdmin соответствено."""
+класс PostAdmin, для модели Group - класс GroupAdmin соответствено.
 
+Списки записей и комментариев рассчитаны на миллионы строк: связанные
+объекты читаются тем же запросом, полный COUNT(*) не выполняется
+(EstimatedCountPaginator), иерархия дат строится поиском по индексу
+pub_date (шаблон admin/posts/post/change_list.html), а группа в
+list_editable редактируется полем id, а не <select> со всеми группами
+в каждой строке.
+
+Массовые действия (перенос в группу, удаление записей и комментариев)
+выполняются множественными UPDATE и DELETE по порциям, см. posts.bulk;
+штатное delete_selected, загружающее каждый объект, отключено."""
+
+import datetime
+
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.admin.widgets import ForeignKeyRawIdWidget
+from django.db.models import Min
+from django.template.response import TemplateResponse
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from django.utils.text import Truncator
 
+from . import bulk
 from .models import Comment, Follow, Group, Post
+from .paginators import EstimatedCountPaginator
+from .search import search_posts
+
+
+class RowObjectRawIdWidget(ForeignKeyRawIdWidget):
+    """Поле id связанного объекта с подписью из уже загруженной строки.
+
+    Обычный ForeignKeyRawIdWidget читает объект для подписи отдельным
+    запросом; здесь подпись берётся из obj, выбранного вместе со строкой
+    через list_select_related.
+    """
+
+    def __init__(self, rel, admin_site, obj=None, **kwargs):
+        super().__init__(rel, admin_site, **kwargs)
+        self.obj = obj
+
+    def label_and_url_for_value(self, value):
+        obj = self.obj
+        if obj is None or str(obj.pk) != str(value):
+            return super().label_and_url_for_value(value)
+        opts = obj._meta
+        try:
+            url = reverse(
+                f'{self.admin_site.name}:{opts.app_label}_'
+                f'{opts.model_name}_change',
+                args=(obj.pk,)
+            )
+        except NoReverseMatch:
+            url = ''
+        return Truncator(obj).words(14), url
+
+
+class IndexedDates:
+    """Выборка списка изменений для иерархии дат без полного просмотра.
+
+    Тег date_hierarchy Django вызывает aggregate(Min, Max) и dates(),
+    которые вычисляют функцию даты для каждой строки. Здесь крайние
+    значения читаются по индексу (ORDER BY … LIMIT 1), а dates()
+    перескакивает от одного непустого периода к следующему: один поиск
+    по индексу на каждый период, в котором есть строки.
+    """
+
+    def __init__(self, queryset):
+        self.queryset = queryset
+
+    def _first(self, field_name, queryset=None, descending=False):
+        queryset = self.queryset if queryset is None else queryset
+        order = f'-{field_name}' if descending else field_name
+        return queryset.order_by(order).values_list(
+            field_name, flat=True
+        ).first()
+
+    def aggregate(self, **aggregates):
+        return {
+            alias: self._first(
+                aggregate.source_expressions[0].name,
+                descending=not isinstance(aggregate, Min)
+            )
+            for alias, aggregate in aggregates.items()
+        }
+
+    def dates(self, field_name, kind, order='ASC'):
+        periods = []
+        value = self._first(field_name)
+        while value is not None:
+            start = period_start(value, kind)
+            periods.append(start.date())
+            value = self._first(field_name, self.queryset.filter(
+                **{f'{field_name}__gte': next_period(start, kind)}
+            ))
+        if order == 'DESC':
+            periods.reverse()
+        return periods
+
+
+def period_start(value, kind):
+    """Начало года, месяца или дня, в которое попадает value."""
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    start = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if kind in ('year', 'month'):
+        start = start.replace(day=1)
+    if kind == 'year':
+        start = start.replace(month=1)
+    return start
+
+
+def next_period(start, kind):
+    """Начало следующего года, месяца или дня после start."""
+    naive = timezone.make_naive(start) if timezone.is_aware(start) else start
+    if kind == 'year':
+        naive = naive.replace(year=naive.year + 1)
+    elif kind == 'month':
+        naive = (naive + datetime.timedelta(days=32)).replace(day=1)
+    else:
+        naive = naive + datetime.timedelta(days=1)
+    if settings.USE_TZ:
+        return timezone.make_aware(naive)
+    return naive
+
+
+def bulk_action_page(modeladmin, request, action, title, form=None,
+                     warning=''):
+    """Страница подтверждения массового действия action.
+
+    Отмеченные id и признак «все по фильтрам списка» передаются
+    скрытыми полями обратно в список изменений, который вызывает
+    действие повторно уже с полем apply.
+    """
+    media = modeladmin.media
+    if form is not None:
+        media += form.media
+    context = {
+        **modeladmin.admin_site.each_context(request),
+        'title': title,
+        'opts': modeladmin.model._meta,
+        'action': action,
+        'form': form,
+        'warning': warning,
+        'media': media,
+        'selected': request.POST.getlist(helpers.ACTION_CHECKBOX_NAME),
+        'select_across': request.POST.get('select_across') == '1',
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+    }
+    return TemplateResponse(request, 'admin/posts/bulk_action.html', context)
+
+
+class BulkActionsMixin:
+    """Отключает delete_selected, удаляющее объекты по одному."""
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+
+class PostGroupForm(forms.Form):
+    group = forms.ModelChoiceField(Group.objects.all(), label='Группа')
+
+    def __init__(self, *args, admin_site, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['group'].widget = ForeignKeyRawIdWidget(
+            Post._meta.get_field('group').remote_field, admin_site
+        )
 
 
 @admin.register(Post)
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BulkActionsMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -17,10 +183,79 @@ class PostAdmin(admin.ModelAdmin):
         'author',
         'group',
     )
+    list_select_related = ('author', 'group')
     list_editable = ('group',)
+    # поиск идёт по полнотекстовому индексу, см. get_search_results
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('set_group', 'clear_group', 'purge_posts')
+
+    def set_group(self, request, queryset):
+        form = PostGroupForm(
+            request.POST if 'apply' in request.POST else None,
+            admin_site=self.admin_site
+        )
+        if not form.is_valid():
+            return bulk_action_page(
+                self, request, 'set_group', 'Перенос записей в группу', form
+            )
+        group = form.cleaned_data['group']
+        count = bulk.set_group(queryset, group)
+        self.message_user(
+            request, f'Перенесено в группу «{group}» записей: {count}'
+        )
+
+    set_group.short_description = 'Перенести в группу'
+    set_group.allowed_permissions = ('change',)
+
+    def clear_group(self, request, queryset):
+        count = bulk.set_group(queryset, None)
+        self.message_user(request, f'Группа убрана у записей: {count}')
+
+    clear_group.short_description = 'Убрать группу'
+    clear_group.allowed_permissions = ('change',)
+
+    def purge_posts(self, request, queryset):
+        if 'apply' not in request.POST:
+            return bulk_action_page(
+                self, request, 'purge_posts', 'Удаление записей',
+                warning='Вместе с записями удаляются их комментарии.'
+            )
+        posts, comments = bulk.delete_posts(queryset)
+        self.message_user(
+            request,
+            f'Удалено записей: {posts}, комментариев: {comments}'
+        )
+
+    purge_posts.short_description = 'Удалить записи с комментариями'
+    purge_posts.allowed_permissions = ('delete',)
+
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE '%…%' по всей таблице."""
+        if not search_term:
+            return queryset, False
+        return search_posts(queryset, search_term), False
+
+    def get_changelist_form(self, request, **kwargs):
+        """Форма строки списка, в которой группа задаётся полем id."""
+        rel = Post._meta.get_field('group').remote_field
+        admin_site = self.admin_site
+
+        class PostChangeListForm(forms.ModelForm):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                field = self.fields['group']
+                field.widget = RowObjectRawIdWidget(
+                    rel, admin_site, obj=self.instance.group
+                )
+                field.widget.is_required = field.required
+
+        kwargs.setdefault('form', PostChangeListForm)
+        return super().get_changelist_form(request, **kwargs)
 
 
 @admin.register(Group)
@@ -34,15 +269,30 @@ class GroupAdmin(admin.ModelAdmin):
 
 
 @admin.register(Comment)
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(BulkActionsMixin, admin.ModelAdmin):
     list_display = (
         'post',
         'author',
         'text',
     )
+    list_select_related = ('post', 'author')
     search_fields = ('text',)
     list_editable = ('text',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     empty_value_display = '-пусто-'
+    actions = ('purge_comments',)
+
+    def purge_comments(self, request, queryset):
+        if 'apply' not in request.POST:
+            return bulk_action_page(
+                self, request, 'purge_comments', 'Удаление комментариев'
+            )
+        count = bulk.delete_comments(queryset)
+        self.message_user(request, f'Удалено комментариев: {count}')
+
+    purge_comments.short_description = 'Удалить комментарии'
+    purge_comments.allowed_permissions = ('delete',)
 
 
 @admin.register(Follow)
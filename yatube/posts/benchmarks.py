@@ -0,0 +1,229 @@
+"""Замеры скорости страниц на синтетических наборах данных.
+
+Для каждого набора из DATASETS во временной транзакции, которая затем
+откатывается, генерируются данные (posts.synthetic), а страницы
+запрашиваются тестовым клиентом от имени пользователя с наибольшим
+числом подписок. Кэш отключён, а DEBUG выключен: замеряется полный
+путь запроса без панели отладки, одинаковый при каждом повторе.
+
+Для каждой страницы записываются медиана и 95-й перцентиль времени
+ответа, число SQL-запросов и размер ответа в байтах. Результаты
+сравниваются с сохранённым JSON-файлом: время может расти не больше
+чем на заданную долю (и не меньше чем на MIN_TIME_DELTA_MS — ниже
+этого разница теряется в шуме), размер — не больше чем на
+BYTES_THRESHOLD, а число запросов расти не должно вовсе.
+"""
+
+import json
+import math
+import os
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from core.decorators import QueryCounter
+
+from .models import Group, Post, UserStats
+from .query_plans import NO_CACHE
+from .synthetic import DatasetGenerator
+
+DATASETS = {
+    'small': {'users': 50, 'groups': 5, 'posts': 500, 'comments': 1000,
+              'follows': 10},
+    'medium': {'users': 500, 'groups': 20, 'posts': 10000,
+               'comments': 20000, 'follows': 20},
+    'large': {'users': 5000, 'groups': 50, 'posts': 100000,
+              'comments': 200000, 'follows': 30},
+}
+VIEWS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'views.json')
+REPEAT = 20
+WARMUP = 3
+TIME_THRESHOLD = 0.25
+BYTES_THRESHOLD = 0.1
+MIN_TIME_DELTA_MS = 1.0
+PREFIX = 'benchmark'
+
+Regression = namedtuple(
+    'Regression', ('dataset', 'view', 'metric', 'baseline', 'current')
+)
+
+
+class BenchmarkError(Exception):
+    """Страница ответила не тем кодом, замер не имеет смысла."""
+
+
+def percentile(values, percent):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(percent / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def subjects(prefix=PREFIX):
+    """Читатель, автор, группа и запись, на которых идут замеры.
+
+    Выбираются самые тяжёлые страницы набора: читатель с наибольшим
+    числом подписок, самый плодовитый автор, самая обсуждаемая запись.
+    """
+    stats = UserStats.objects.filter(user__username__startswith=prefix)
+    reader = stats.order_by('-following_count', 'pk').first().user
+    author = stats.order_by('-posts_count', 'pk').first().user
+    post = Post.objects.filter(
+        author__username__startswith=prefix
+    ).order_by('-comments_count', 'pk').first()
+    group = Group.objects.filter(
+        slug__startswith=prefix, posts__isnull=False
+    ).order_by('pk').first()
+    return reader, author, group, post
+
+
+def view_requests(author, group, post):
+    """{страница: (метод, адрес, данные формы)}."""
+    return {
+        'index': ('get', reverse('posts:index'), None),
+        'group_posts': (
+            'get', reverse('posts:group_list', kwargs={'slug': group.slug}),
+            None
+        ),
+        'profile': (
+            'get',
+            reverse('posts:profile', kwargs={'username': author.username}),
+            None
+        ),
+        'post_detail': (
+            'get',
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            None
+        ),
+        'follow_index': ('get', reverse('posts:follow_index'), None),
+        'post_create': (
+            'post', reverse('posts:post_create'),
+            {'text': 'Запись для замера', 'group': group.pk}
+        ),
+        'add_comment': (
+            'post', reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+            {'text': 'Комментарий для замера'}
+        ),
+    }
+
+
+def _request(client, method, url, data):
+    if method == 'get':
+        response = client.get(url)
+    else:
+        response = client.post(url, data)
+    if response.status_code not in (200, 302):
+        raise BenchmarkError(f'{url}: ответ {response.status_code}')
+    return response
+
+
+def measure(client, method, url, data, repeat=REPEAT, warmup=WARMUP):
+    """Метрики одной страницы; первый запрос считается разогревом.
+
+    Запросы и размер берутся из первого ответа: CaptureQueriesContext
+    здесь не годится, журнал запросов очищается в начале каждого
+    запроса клиента.
+    """
+    counter = QueryCounter()
+    with connection.execute_wrapper(counter):
+        response = _request(client, method, url, data)
+    for _ in range(warmup - 1):
+        _request(client, method, url, data)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _request(client, method, url, data)
+        timings.append((time.perf_counter() - started) * 1000)
+    return {
+        'p50_ms': round(percentile(timings, 50), 2),
+        'p95_ms': round(percentile(timings, 95), 2),
+        'queries': counter.count,
+        'bytes': len(response.content),
+    }
+
+
+def run_dataset(sizes, views=VIEWS, repeat=REPEAT, seed=0):
+    """{страница: метрики} для набора данных sizes.
+
+    Данные и всё, что создали страницы, удаляются откатом транзакции.
+    GET-страницы замеряются раньше POST, чтобы созданные замером
+    записи не меняли размер лент.
+    """
+    results = {}
+    with override_settings(CACHES=NO_CACHE, DEBUG=False), \
+            transaction.atomic():
+        DatasetGenerator(prefix=PREFIX, seed=seed, **sizes).run()
+        reader, author, group, post = subjects()
+        client = Client()
+        client.force_login(reader)
+        requests = view_requests(author, group, post)
+        ordered = sorted(views, key=lambda name: requests[name][0] != 'get')
+        for name in ordered:
+            results[name] = measure(client, *requests[name], repeat=repeat)
+        transaction.set_rollback(True)
+    return {name: results[name] for name in views}
+
+
+def _time_regressed(baseline, current, threshold):
+    return (
+        current > baseline * (1 + threshold)
+        and current - baseline > MIN_TIME_DELTA_MS
+    )
+
+
+def compare(results, baseline, time_threshold=TIME_THRESHOLD,
+            bytes_threshold=BYTES_THRESHOLD):
+    """Регрессии results относительно baseline.
+
+    Оба аргумента — {набор: {страница: метрики}}; сравниваются только
+    страницы, которые есть в обоих.
+    """
+    regressions = []
+    for dataset, views in results.items():
+        for view, current in views.items():
+            stored = baseline.get(dataset, {}).get(view)
+            if stored is None:
+                continue
+            checks = {
+                'p50_ms': _time_regressed(
+                    stored['p50_ms'], current['p50_ms'], time_threshold
+                ),
+                'p95_ms': _time_regressed(
+                    stored['p95_ms'], current['p95_ms'], time_threshold
+                ),
+                'queries': current['queries'] > stored['queries'],
+                'bytes': (
+                    current['bytes'] > stored['bytes'] * (1 + bytes_threshold)
+                ),
+            }
+            regressions += [
+                Regression(dataset, view, metric, stored[metric],
+                           current[metric])
+                for metric, regressed in checks.items() if regressed
+            ]
+    return regressions
+
+
+def load_baseline(path):
+    """Сохранённые результаты и размеры наборов, на которых они сняты."""
+    with open(path, encoding='utf-8') as file:
+        data = json.load(file)
+    return data['results'], data['datasets']
+
+
+def save_baseline(path, results, datasets):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(
+            {'datasets': datasets, 'results': results}, file,
+            ensure_ascii=False, indent=2, sort_keys=True
+        )
+        file.write('\n')
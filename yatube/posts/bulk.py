@@ -0,0 +1,114 @@
+"""Массовые операции над записями и комментариями.
+
+Записи меняются и удаляются множественными UPDATE и DELETE по порциям
+первичных ключей (без OFFSET), каждая порция — в своей транзакции.
+Объекты моделей не создаются и сигналы не вызываются, поэтому то,
+что делают сигналы и каскадное удаление, обновляется здесь сразу для
+всей порции:
+
+* комментарии и строки Timeline удалённых записей;
+* счётчики записей авторов и комментариев записей;
+* кэшированные списки авторов (posts.feeds), поколение лент и версии
+  тегов кэша страниц;
+* ссылки на файлы картинок (posts.storage.release_image).
+
+Тесты сверяют эти действия с результатом штатного delete() с сигналами.
+"""
+
+from django.core.cache import cache
+from django.db import connection, transaction
+
+from core.page_cache import invalidate
+
+from .caching import POSTS_TAG, bump_feed_generation, post_tag, user_tag
+from .counters import CHUNK_SIZE, _chunks, _counts, subtract_counts
+from .feeds import author_timeline_key
+from .models import Comment, Post, Timeline, UserStats
+from .storage import release_image
+
+
+def _values(queryset, field):
+    return set(queryset.order_by().values_list(field, flat=True).distinct())
+
+
+def _delete(model, field, values):
+    """DELETE строк model, у которых field из values, без сигналов.
+
+    Возвращает число удалённых строк.
+    """
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE {column} IN ({placeholders})',
+            list(values)
+        )
+        return cursor.rowcount
+
+
+def _invalidate_posts(post_ids, author_ids):
+    invalidate(
+        POSTS_TAG,
+        *[post_tag(pk) for pk in post_ids],
+        *[user_tag(pk) for pk in author_ids]
+    )
+
+
+def set_group(queryset, group, chunk_size=CHUNK_SIZE):
+    """Назначает записям queryset группу group, None убирает группу.
+
+    Возвращает число изменённых записей.
+    """
+    total = 0
+    for post_ids in _chunks(queryset, chunk_size):
+        posts = Post.objects.filter(pk__in=post_ids)
+        with transaction.atomic():
+            author_ids = _values(posts, 'author_id')
+            total += posts.update(group=group)
+        _invalidate_posts(post_ids, author_ids)
+    if total:
+        bump_feed_generation()
+    return total
+
+
+def delete_posts(queryset, chunk_size=CHUNK_SIZE):
+    """Удаляет записи queryset вместе с их комментариями и лентами.
+
+    Возвращает пару (число записей, число комментариев).
+    """
+    posts_total = comments_total = 0
+    for post_ids in _chunks(queryset, chunk_size):
+        posts = Post.objects.filter(pk__in=post_ids)
+        with transaction.atomic():
+            authors = _counts(posts, 'author_id')
+            images = _values(posts.exclude(image=''), 'image')
+            comments_total += _delete(Comment, 'post', post_ids)
+            _delete(Timeline, 'post', post_ids)
+            posts_total += _delete(Post, 'id', post_ids)
+            subtract_counts(
+                UserStats.objects.all(), 'user_id', 'posts_count', authors
+            )
+            for name in images:
+                release_image(name)
+        cache.delete_many([author_timeline_key(pk) for pk in authors])
+        _invalidate_posts(post_ids, authors)
+    if posts_total:
+        bump_feed_generation()
+    return posts_total, comments_total
+
+
+def delete_comments(queryset, chunk_size=CHUNK_SIZE):
+    """Удаляет комментарии queryset и уменьшает счётчики записей.
+
+    Возвращает число удалённых комментариев.
+    """
+    total = 0
+    for comment_ids in _chunks(queryset, chunk_size):
+        comments = Comment.objects.filter(pk__in=comment_ids)
+        with transaction.atomic():
+            posts = _counts(comments, 'post_id')
+            total += _delete(Comment, 'id', comment_ids)
+            subtract_counts(Post.objects.all(), 'pk', 'comments_count', posts)
+        invalidate(*[post_tag(pk) for pk in posts])
+    return total
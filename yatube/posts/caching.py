@@ -0,0 +1,157 @@
+"""Кэширование фрагментов лент и теги кэша страниц.
+
+Ключ фрагмента включает позицию страницы (номер или курсор), а вместе
+со значением хранится поколение лент. Сигналы сохранения и удаления
+Post и Group, а также смена имени пользователя увеличивают поколение,
+поэтому фрагменты живут долго, но устаревают сразу после изменения
+записей и их авторов.
+
+От лавины пересчётов фрагмент защищает cached_fragment: устаревшее
+значение пересчитывает только запрос, взявший блокировку, остальные
+получают прежнее значение; незадолго до истечения срока значение
+с растущей вероятностью пересчитывается заранее.
+
+Теги core.page_cache описывают, от чего зависит страница целиком:
+ленты — от всех записей и групп, страницы автора и записи — от своих
+объектов. Сигналы сбрасывают ровно те теги, чьи данные изменились.
+"""
+
+import hashlib
+import math
+import random
+import time
+
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+
+FEED_GENERATION_KEY = 'posts:feed_generation'
+FRAGMENT_TIMEOUT = 60 * 60
+FRAGMENT_PREFIX = 'posts:fragment:'
+# сколько устаревшее значение хранится сверх срока жизни фрагмента
+STALE_TIMEOUT = 60 * 60
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 2.0
+LOCK_POLL = 0.05
+EARLY_RECOMPUTE_BETA = 1.0
+
+
+def feed_generation():
+    """Текущее поколение лент.
+
+    Начальное значение берётся из времени, чтобы после вытеснения ключа
+    поколение не совпало с одним из прежних.
+    """
+    generation = cache.get(FEED_GENERATION_KEY)
+    if generation is None:
+        cache.add(FEED_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(FEED_GENERATION_KEY)
+    return generation
+
+
+def bump_feed_generation():
+    try:
+        cache.incr(FEED_GENERATION_KEY)
+    except ValueError:
+        feed_generation()
+
+
+def page_cache_key(request, page_obj):
+    """Позиция страницы для ключа фрагмента."""
+    if not getattr(page_obj, 'is_cursor', False):
+        return f'page:{page_obj.number}'
+    for direction in ('after', 'before'):
+        cursor = request.GET.get(direction)
+        if cursor:
+            return f'{direction}:{cursor}'
+    return 'first'
+
+
+def fragment_key(name, *vary_on):
+    raw = ':'.join(str(value) for value in vary_on)
+    digest = hashlib.md5(force_bytes(raw)).hexdigest()
+    return f'{FRAGMENT_PREFIX}{name}:{digest}'
+
+
+def _is_fresh(entry, generation, now):
+    """Свежесть значения с вероятностным досрочным пересчётом.
+
+    Чем ближе срок и чем дольше считалось значение, тем вероятнее
+    пересчёт: now - delta * beta * ln(rand) >= expires.
+    """
+    _, expires, delta, entry_generation = entry
+    if entry_generation != generation:
+        return False
+    jitter = -delta * EARLY_RECOMPUTE_BETA * math.log(1 - random.random())
+    return now + jitter < expires
+
+
+def _recompute(key, compute, timeout, generation):
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    entry = (value, time.time() + timeout, delta, generation)
+    cache.set(key, entry, timeout + STALE_TIMEOUT)
+    return value
+
+
+def cached_fragment(key, compute, timeout, generation):
+    """Значение фрагмента из кэша или compute() с защитой от лавины.
+
+    Свежее значение отдаётся сразу. Устаревшее (истёк срок или сменилось
+    поколение) пересчитывает один запрос, взявший блокировку cache.add,
+    остальные получают прежнее значение. Если значения нет совсем,
+    запросы без блокировки до LOCK_WAIT секунд ждут результата владельца
+    блокировки и только потом считают сами.
+    """
+    entry = cache.get(key)
+    if entry is not None and _is_fresh(entry, generation, time.time()):
+        return entry[0]
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _recompute(key, compute, timeout, generation)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        return entry[0]
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _recompute(key, compute, timeout, generation)
+
+
+def fragment_context(request, page_obj):
+    """Параметры тега {% feed_fragment %} для ленты."""
+    return {
+        'timeout': FRAGMENT_TIMEOUT,
+        'generation': feed_generation(),
+        'page': page_cache_key(request, page_obj),
+    }
+
+
+POSTS_TAG = 'posts'
+GROUPS_TAG = 'groups'
+
+
+def post_tag(pk):
+    return f'post:{pk}'
+
+
+def user_tag(pk):
+    return f'user:{pk}'
+
+
+def followers_tag(pk):
+    """Счётчики подписок выводятся только на странице автора."""
+    return f'followers:{pk}'
+
+
+def group_tag(pk):
+    return f'group:{pk}'
+
+
+def page_author_tags(page_obj):
+    return {user_tag(post.author_id) for post in page_obj}
@@ -0,0 +1,91 @@
+"""Валидаторы условных GET-запросов для лент и страницы записи.
+
+ETag строится из версий тегов core.page_cache, которые сигналы
+увеличивают при каждом изменении данных страницы, и из пользователя:
+от него зависят шапка, кнопки подписки и формы. Для страницы записи
+Last-Modified — наибольшее из времени изменения записи, времени
+последнего комментария и времени изменения тех же тегов, что входят
+в ETag: переименование автора или комментатора, удаление комментария
+и обновление картинки без сигналов меняют оба валидатора. Декоратор
+condition отвечает 304 до основных запросов view-функции и отрисовки
+шаблона.
+"""
+
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db.models import OuterRef, Subquery
+
+from core.page_cache import tags_modified, versions_etag
+
+from .caching import (GROUPS_TAG, POSTS_TAG, followers_tag, group_tag,
+                      post_tag, user_tag)
+from .models import Comment, Post
+
+User = get_user_model()
+
+
+def _viewer(request):
+    user = request.user
+    return f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+
+
+def feed_etag(request, *args, **kwargs):
+    """ETag главной ленты и ленты группы.
+
+    Авторы записей страницы до запроса неизвестны, поэтому их теги
+    в ETag не входят.
+    """
+    return versions_etag((POSTS_TAG, GROUPS_TAG), _viewer(request))
+
+
+def profile_etag(request, username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if author_id is None:
+        return None
+    tags = (user_tag(author_id), followers_tag(author_id), GROUPS_TAG)
+    return versions_etag(tags, _viewer(request))
+
+
+def _post_state(request, post_id):
+    """Время изменения, автор, группа и последний комментарий записи.
+
+    Последний комментарий читается подзапросом по индексу (post, created)
+    без группировки. Результат запоминается в запросе: его читают
+    оба валидатора.
+    """
+    if not hasattr(request, '_post_state'):
+        last_comment = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-created').values('created')[:1]
+        request._post_state = Post.objects.filter(pk=post_id).annotate(
+            last_comment=Subquery(last_comment)
+        ).values('updated', 'author_id', 'group_id', 'last_comment').first()
+    return request._post_state
+
+
+def _post_tags(post_id, state):
+    tags = [post_tag(post_id), user_tag(state['author_id'])]
+    if state['group_id']:
+        tags.append(group_tag(state['group_id']))
+    return tags
+
+
+def post_etag(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return versions_etag(_post_tags(post_id, state), _viewer(request))
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    modified = datetime.datetime.fromtimestamp(
+        tags_modified(_post_tags(post_id, state)), datetime.timezone.utc
+    )
+    dates = (state['updated'], state['last_comment'], modified)
+    return max(date for date in dates if date is not None)
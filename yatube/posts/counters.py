@@ -0,0 +1,145 @@
+"""Денормализованные счётчики записей, комментариев и подписок.
+
+Счётчики изменяются атомарно выражениями F() при записи постов,
+комментариев и подписок (см. signals), поэтому страницы показывают
+их без COUNT. Массовые операции сигналы обходят — расхождения
+исправляет reconcile_counters, обрабатывающий таблицы порциями.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db.models import (Case, Count, F, PositiveIntegerField, Value,
+                              When)
+from django.db.models.functions import Greatest
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+CHUNK_SIZE = 1000
+USER_COUNTERS = ('posts_count', 'followers_count', 'following_count')
+
+
+def _not_below_zero(deltas):
+    # счётчик, уже ушедший в расхождение, не уменьшается ниже нуля
+    return {
+        f'{name}__gte': -delta for name, delta in deltas.items() if delta < 0
+    }
+
+
+def change_user_stats(user_id, **deltas):
+    """Прибавляет deltas к счётчикам пользователя одним UPDATE."""
+    updated = UserStats.objects.filter(
+        user_id=user_id, **_not_below_zero(deltas)
+    ).update(**{name: F(name) + delta for name, delta in deltas.items()})
+    if not updated and User.objects.filter(pk=user_id).exists():
+        UserStats.objects.get_or_create(
+            user_id=user_id, defaults=count_user_stats([user_id])[user_id]
+        )
+
+
+def change_comments_count(post_id, delta):
+    Post.objects.filter(
+        pk=post_id, **_not_below_zero({'comments_count': delta})
+    ).update(comments_count=F('comments_count') + delta)
+
+
+def subtract_counts(queryset, field, counter, counts):
+    """Вычитает counts из счётчика counter одним UPDATE.
+
+    counts — словарь {значение field: сколько вычесть}; счётчик
+    не опускается ниже нуля. Возвращает число изменённых строк.
+    """
+    if not counts:
+        return 0
+    delta = Case(
+        *[When(**{field: key}, then=Value(value))
+          for key, value in counts.items()],
+        output_field=PositiveIntegerField()
+    )
+    return queryset.filter(**{f'{field}__in': list(counts)}).update(
+        **{counter: Greatest(F(counter) - delta, Value(0))}
+    )
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; при отсутствии строки — посчитанные заново."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user, **count_user_stats([user.pk])[user.pk])
+
+
+def _counts(queryset, field):
+    rows = queryset.order_by().values(field).annotate(total=Count('pk'))
+    return {row[field]: row['total'] for row in rows}
+
+
+def count_user_stats(user_ids):
+    """Точные значения счётчиков для пользователей user_ids."""
+    posts = _counts(Post.objects.filter(author_id__in=user_ids), 'author_id')
+    followers = _counts(
+        Follow.objects.filter(author_id__in=user_ids), 'author_id'
+    )
+    following = _counts(Follow.objects.filter(user_id__in=user_ids), 'user_id')
+    return {
+        user_id: {
+            'posts_count': posts.get(user_id, 0),
+            'followers_count': followers.get(user_id, 0),
+            'following_count': following.get(user_id, 0),
+        }
+        for user_id in user_ids
+    }
+
+
+def _chunks(queryset, chunk_size):
+    """Порции первичных ключей по возрастанию без OFFSET."""
+    last_pk = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=last_pk).order_by('pk').values_list(
+            'pk', flat=True
+        )[:chunk_size])
+        if not pks:
+            return
+        yield pks
+        last_pk = pks[-1]
+
+
+def reconcile_user_stats(chunk_size=CHUNK_SIZE):
+    """Исправляет счётчики пользователей порциями.
+
+    Для каждой порции возвращает (обработано, исправлено).
+    """
+    for user_ids in _chunks(User.objects.all(), chunk_size):
+        actual = count_user_stats(user_ids)
+        stored = UserStats.objects.in_bulk(user_ids)
+        missing, drifted = [], []
+        for user_id, values in actual.items():
+            stats = stored.get(user_id)
+            if stats is None:
+                missing.append(UserStats(user_id=user_id, **values))
+                continue
+            current = {name: getattr(stats, name) for name in USER_COUNTERS}
+            if current != values:
+                for name, value in values.items():
+                    setattr(stats, name, value)
+                drifted.append(stats)
+        UserStats.objects.bulk_create(missing)
+        UserStats.objects.bulk_update(drifted, USER_COUNTERS)
+        yield len(user_ids), len(missing) + len(drifted)
+
+
+def reconcile_comments_count(chunk_size=CHUNK_SIZE):
+    """Исправляет счётчики комментариев порциями записей."""
+    for post_ids in _chunks(Post.objects.all(), chunk_size):
+        actual = _counts(
+            Comment.objects.filter(post_id__in=post_ids), 'post_id'
+        )
+        posts = Post.objects.filter(pk__in=post_ids).only('comments_count')
+        drifted = []
+        for post in posts:
+            value = actual.get(post.pk, 0)
+            if post.comments_count != value:
+                post.comments_count = value
+                drifted.append(post)
+        Post.objects.bulk_update(drifted, ['comments_count'])
+        yield len(post_ids), len(drifted)
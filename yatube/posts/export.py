@@ -0,0 +1,187 @@
+"""Потоковая выгрузка записей, комментариев, подписок и групп.
+
+dumpdata собирает в памяти весь список объектов. Здесь строки таблицы
+читаются QuerySet.iterator(chunk_size=…) по возрастанию id и сразу
+превращаются в строки NDJSON или CSV, так что память не зависит от
+размера выгрузки. Порядок по id позволяет продолжить прерванную
+выгрузку: after — последний уже выгруженный id.
+"""
+
+import csv
+import datetime
+import json
+from collections import namedtuple
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Comment, Follow, Group, Post
+
+CHUNK_SIZE = 2000
+# строки отдаются блоками, а не по одной: меньше вызовов write()
+BLOCK_SIZE = 64 * 1024
+
+Export = namedtuple('Export', ('model', 'fields', 'date_field'))
+
+EXPORTS = {
+    'posts': Export(
+        Post,
+        ('id', 'author_id', 'group_id', 'text', 'pub_date', 'image'),
+        'pub_date'
+    ),
+    'comments': Export(
+        Comment, ('id', 'post_id', 'author_id', 'text', 'created'), 'created'
+    ),
+    'follows': Export(Follow, ('id', 'user_id', 'author_id'), None),
+    'groups': Export(Group, ('id', 'title', 'slug', 'description'), None),
+}
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class ExportError(ValueError):
+    """Параметры выгрузки не подходят для выбранной таблицы."""
+
+
+class Echo:
+    """Файл для csv.writer, который возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def _day_start(day):
+    start = datetime.datetime.combine(day, datetime.time())
+    return timezone.make_aware(start) if timezone.is_naive(start) else start
+
+
+def export_queryset(name, since=None, until=None, after=None):
+    """Строки таблицы name по возрастанию id в виде кортежей полей.
+
+    since и until — даты, обе включительно; after — id, после которого
+    продолжается выгрузка.
+    """
+    export = EXPORTS[name]
+    queryset = export.model.objects.order_by('pk')
+    if after is not None:
+        queryset = queryset.filter(pk__gt=after)
+    if since is not None or until is not None:
+        if export.date_field is None:
+            raise ExportError(f'У таблицы {name} нет даты для отбора')
+        if since is not None:
+            queryset = queryset.filter(
+                **{f'{export.date_field}__gte': _day_start(since)}
+            )
+        if until is not None:
+            queryset = queryset.filter(**{
+                f'{export.date_field}__lt':
+                    _day_start(until + datetime.timedelta(days=1))
+            })
+    return queryset.values_list(*export.fields)
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def _records(queryset, fields, fmt, header, chunk_size):
+    rows = queryset.iterator(chunk_size=chunk_size)
+    if fmt == 'ndjson':
+        for row in rows:
+            yield row[0], json.dumps(
+                dict(zip(fields, row)), cls=DjangoJSONEncoder,
+                ensure_ascii=False
+            ) + '\n'
+        return
+    writer = csv.writer(Echo(), lineterminator='\n')
+    if header:
+        yield None, writer.writerow(fields)
+    for row in rows:
+        yield row[0], writer.writerow([_csv_value(value) for value in row])
+
+
+def export_records(name, fmt, since=None, until=None, after=None,
+                   header=True, chunk_size=CHUNK_SIZE):
+    """Пары (id, строка выгрузки) для таблицы name в формате fmt.
+
+    Для CSV первой идёт строка заголовка с id None, если header.
+    Неподходящие параметры вызывают ExportError сразу, а не при
+    чтении первой строки.
+    """
+    queryset = export_queryset(name, since, until, after)
+    return _records(queryset, EXPORTS[name].fields, fmt, header, chunk_size)
+
+
+def as_blocks(records, block_size=BLOCK_SIZE):
+    """Склеивает строки выгрузки в блоки примерно по block_size символов."""
+    block, size = [], 0
+    for _, line in records:
+        block.append(line)
+        size += len(line)
+        if size >= block_size:
+            yield ''.join(block)
+            block, size = [], 0
+    if block:
+        yield ''.join(block)
+
+
+class _Lines:
+    """Строки двоичного файла и позиция конца последней прочитанной."""
+
+    def __init__(self, file):
+        self.file = file
+        self.offset = 0
+        self.complete = True
+
+    def __iter__(self):
+        for line in self.file:
+            # оборванная строка может кончаться посреди многобайтного
+            # символа, поэтому она не декодируется
+            if not line.endswith(b'\n'):
+                self.complete = False
+                return
+            self.offset += len(line)
+            yield line.decode('utf-8')
+
+
+def _ndjson_ids(lines):
+    for line in lines:
+        if not lines.complete:
+            return
+        yield json.loads(line)['id']
+
+
+def _csv_ids(lines):
+    # None — строка заголовка
+    reader = csv.reader(lines, strict=True)
+    try:
+        for number, row in enumerate(reader):
+            yield int(row[0]) if number else None
+    except csv.Error:
+        # файл оборвался внутри поля в кавычках
+        return
+
+
+def last_exported(file, fmt):
+    """Позиция конца последней целой строки в файле выгрузки и её id.
+
+    file открыт в двоичном режиме. Файл читается построчно, поэтому
+    память не зависит от его размера; оборванная при остановке строка
+    в конце файла не считается выгруженной. Если в файле нет строк
+    данных, id равен None.
+    """
+    lines = _Lines(file)
+    ids = _ndjson_ids(lines) if fmt == 'ndjson' else _csv_ids(lines)
+    end, last_id = 0, None
+    for pk in ids:
+        if not lines.complete:
+            break
+        end = lines.offset
+        if pk is not None:
+            last_id = pk
+    return end, last_id
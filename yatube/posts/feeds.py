@@ -0,0 +1,304 @@
+"""Ленты подписок.
+
+Способ построения ленты выбирается настройкой FOLLOW_FEED_ENGINE:
+
+* 'timeline' — лента материализована в модели Timeline (fan-out on
+  write): новая запись автора копируется в ленты всех его подписчиков,
+  подписка дозаполняет ленту записями автора, отписка их удаляет.
+  Страница читается одним диапазоном индекса (user, pub_date).
+* 'merge' — fan-out on read: для каждого автора в кэше хранится
+  ограниченный список последних записей, а лента собирается k-way
+  слиянием списков авторов, на которых подписан пользователь;
+  страницы глубже кэшированных списков читаются запросом, как в 'join'.
+  Запись автора с миллионом подписчиков стоит одной операции с кэшем.
+* 'join' — прямой запрос с JOIN между Follow и Post.
+"""
+
+import heapq
+from collections import deque, namedtuple
+from itertools import chain, islice, takewhile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.models import Q
+
+from .models import Follow, Post, Timeline
+
+BATCH_SIZE = 500
+TIMELINE_KEYS = ('pub_date', 'post_id')
+AUTHOR_TIMELINE_LENGTH = 200
+AUTHOR_TIMELINE_TIMEOUT = 60 * 60
+
+FeedItem = namedtuple('FeedItem', ('pub_date', 'pk'))
+
+
+def timeline_enabled():
+    return settings.FOLLOW_FEED_ENGINE == 'timeline'
+
+
+def fan_out_post(post):
+    """Раскладывает новую запись по лентам подписчиков автора."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id, user__isnull=False
+    ).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        [
+            Timeline(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def _timeline_tables():
+    return (
+        connection.ops.quote_name(model._meta.db_table)
+        for model in (Timeline, Follow, Post)
+    )
+
+
+def backfill_timeline(user_id, author_id):
+    """Дозаполняет ленту пользователя записями автора.
+
+    Один INSERT … SELECT: число запросов и память не зависят от того,
+    сколько записей у автора.
+    """
+    timeline, _, post = _timeline_tables()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'{connection.ops.insert_statement(ignore_conflicts=True)} '
+            f'{timeline} (user_id, post_id, pub_date) '
+            f'SELECT %s, id, pub_date FROM {post} WHERE author_id = %s '
+            f'{connection.ops.ignore_conflicts_suffix_sql(True)}',
+            [user_id, author_id]
+        )
+
+
+def prune_timeline(user_id, author_id):
+    """Убирает записи автора из ленты пользователя."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def rebuild_timelines():
+    """Пересобирает все ленты по текущим подпискам.
+
+    Ленты заполняются одним INSERT … SELECT по соединению подписок
+    с записями, без выборки строк в Python. Возвращает число
+    обработанных подписок.
+    """
+    Timeline.objects.all().delete()
+    follows = Follow.objects.filter(user__isnull=False, author__isnull=False)
+    timeline, follow, post = _timeline_tables()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {timeline} (user_id, post_id, pub_date) '
+            f'SELECT {follow}.user_id, {post}.id, {post}.pub_date '
+            f'FROM {follow} INNER JOIN {post} '
+            f'ON {post}.author_id = {follow}.author_id '
+            f'WHERE {follow}.user_id IS NOT NULL'
+        )
+    return follows.count()
+
+
+def author_timeline_key(author_id):
+    return f'author_timeline:{author_id}'
+
+
+def _latest_posts(author_ids):
+    """Последние AUTHOR_TIMELINE_LENGTH записей каждого из авторов.
+
+    Один запрос на BATCH_SIZE авторов. Номер записи от самой новой
+    считает оконный COUNT по возрастанию даты — в том же порядке, что
+    и индекс (author, pub_date), поэтому SQLite не сортирует строки.
+    """
+    post = connection.ops.quote_name(Post._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(author_ids))
+    return Post.objects.raw(
+        f'SELECT id, author_id, pub_date FROM ('
+        f'SELECT id, author_id, pub_date, COUNT(*) OVER ('
+        f'PARTITION BY author_id ORDER BY pub_date, id '
+        f'ROWS BETWEEN CURRENT ROW AND UNBOUNDED FOLLOWING'
+        f') AS position FROM {post} WHERE author_id IN ({placeholders})'
+        f') WHERE position <= %s',
+        [*author_ids, AUTHOR_TIMELINE_LENGTH]
+    )
+
+
+def load_author_timelines(author_ids):
+    """Списки последних записей авторов: из кэша, промахи — из базы."""
+    keys = {author_timeline_key(author_id): author_id
+            for author_id in author_ids}
+    timelines = {keys[key]: items
+                 for key, items in cache.get_many(keys).items()}
+    missing = sorted(set(author_ids) - set(timelines))
+    loaded = {author_id: [] for author_id in missing}
+    for start in range(0, len(missing), BATCH_SIZE):
+        for post in _latest_posts(missing[start:start + BATCH_SIZE]):
+            loaded[post.author_id].append(FeedItem(post.pub_date, post.pk))
+    for items in loaded.values():
+        items.sort(reverse=True)
+    if loaded:
+        cache.set_many(
+            {author_timeline_key(author_id): items
+             for author_id, items in loaded.items()},
+            AUTHOR_TIMELINE_TIMEOUT
+        )
+    timelines.update(loaded)
+    return timelines
+
+
+def reset_author_timeline(post):
+    """Сбрасывает кэшированный список автора новой или удалённой записи.
+
+    Список не правится на месте: чтение и запись списка не атомарны,
+    и две одновременные правки затирали бы друг друга. Следующее
+    чтение ленты загрузит список из базы.
+    """
+    cache.delete(author_timeline_key(post.author_id))
+
+
+def _beyond(position, reverse):
+    # записи новее position при reverse, иначе старше
+    lookup = 'gt' if reverse else 'lt'
+    pub_date, pk = position
+    return (
+        Q(**{f'pub_date__{lookup}': pub_date})
+        | Q(pub_date=pub_date, **{f'pk__{lookup}': pk})
+    )
+
+
+class MergedTimeline:
+    """Лента как k-way слияние отсортированных списков авторов.
+
+    Поддерживает срезы и count() для режима ?page=N и seek() для
+    курсорной паджинации; элементы — FeedItem в порядке убывания.
+
+    В кэше лежат только последние AUTHOR_TIMELINE_LENGTH записей
+    автора, поэтому слияние точно лишь до горизонта — самой старой
+    кэшированной записи среди обрезанных списков. Дальше горизонта
+    лента читается запросом posts по всем записям подписок.
+    """
+
+    def __init__(self, author_ids, posts):
+        self.timelines = list(load_author_timelines(author_ids).values())
+        self.posts = posts
+        truncated = [
+            items[-1] for items in self.timelines
+            if len(items) >= AUTHOR_TIMELINE_LENGTH
+        ]
+        self.horizon = max(truncated, default=None)
+
+    def _cached(self):
+        merged = heapq.merge(*self.timelines, reverse=True)
+        if self.horizon is None:
+            return merged
+        return takewhile(lambda item: item >= self.horizon, merged)
+
+    def _query(self, position, reverse=False):
+        posts = self.posts.filter(_beyond(position, reverse))
+        ordering = ('pub_date', 'pk') if reverse else ('-pub_date', '-pk')
+        return posts.order_by(*ordering).values_list('pub_date', 'pk')
+
+    def _beyond_horizon(self):
+        return (
+            FeedItem(*row)
+            for row in self._query(self.horizon).iterator()
+        )
+
+    def __iter__(self):
+        if self.horizon is None:
+            return self._cached()
+        return chain(self._cached(), self._beyond_horizon())
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return next(islice(self, index, None))
+        start, stop = index.start or 0, index.stop
+        cached = self.horizon and sum(1 for _ in self._cached())
+        if self.horizon is None or start < cached:
+            return list(islice(self, start, stop, index.step))
+        # срез целиком за горизонтом: OFFSET в запросе вместо перебора
+        # всех записей до него
+        rows = self._query(self.horizon)[
+            start - cached:None if stop is None else stop - cached
+        ]
+        return [FeedItem(*row) for row in rows][::index.step]
+
+    def count(self):
+        if self.horizon is None:
+            return sum(len(items) for items in self.timelines)
+        return self.posts.count()
+
+    def seek(self, position, reverse, limit):
+        """Не более limit элементов после position (или перед ним)."""
+        if position is None:
+            return self[:limit]
+        position = FeedItem(*position)
+        if self.horizon is not None and position < self.horizon:
+            rows = self._query(position, reverse)[:limit]
+            return [FeedItem(*row) for row in rows]
+        if reverse:
+            newer = takewhile(lambda item: item > position, self)
+            return list(deque(newer, maxlen=limit))[::-1]
+        return list(islice(
+            (item for item in self if item < position), limit
+        ))
+
+
+def timeline_posts(entries):
+    return [entry.post for entry in entries]
+
+
+def merged_posts(items):
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [item.pk for item in items]
+    )
+    return [posts[item.pk] for item in items if item.pk in posts]
+
+
+def join_feed(user):
+    posts = Post.objects.filter(
+        author__following__user=user
+    ).select_related('author', 'group')
+    return posts, {}
+
+
+def timeline_feed(user):
+    entries = Timeline.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+    return entries, {'keys': TIMELINE_KEYS, 'transform': timeline_posts}
+
+
+def merge_feed(user):
+    author_ids = Follow.objects.filter(
+        user=user, author__isnull=False
+    ).values_list('author_id', flat=True)
+    posts, _ = join_feed(user)
+    return (
+        MergedTimeline(list(author_ids), posts.order_by()),
+        {'transform': merged_posts},
+    )
+
+
+FEED_ENGINES = {
+    'join': join_feed,
+    'timeline': timeline_feed,
+    'merge': merge_feed,
+}
+
+
+def follow_feed(user):
+    """Лента подписок пользователя и параметры её паджинации."""
+    try:
+        engine = FEED_ENGINES[settings.FOLLOW_FEED_ENGINE]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f'Неизвестный FOLLOW_FEED_ENGINE: {settings.FOLLOW_FEED_ENGINE}'
+        )
+    return engine(user)
@@ -1,6 +1,11 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
 
+from .export import FORMATS
 from .models import Post, Comment
+from .storage import release_image
+from .thumbnails import schedule_thumbnails
+from .uploads import normalize_image
 
 
 class PostForm(forms.ModelForm):
@@ -8,8 +13,58 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        """Уменьшает новую картинку и убирает из неё метаданные.
+
+        Размеры и цвет заглушки картинки сохраняются в записи.
+        """
+        image = self.cleaned_data.get('image')
+        post = self.instance
+        if isinstance(image, UploadedFile):
+            self.normalized_image = normalize_image(image)
+            post.image_width, post.image_height = (
+                self.normalized_image.image_size
+            )
+            post.image_placeholder = self.normalized_image.placeholder
+            return self.normalized_image
+        if not image:
+            post.image_width = post.image_height = None
+            post.image_placeholder = ''
+        return image
+
+    def save(self, commit=True):
+        """Сохраняет запись и ставит в очередь миниатюры новой картинки.
+
+        Ссылка на прежнюю картинку снимается: её файл удаляется, если
+        других записей с ней нет.
+        """
+        previous = getattr(self.initial.get('image'), 'name', None)
+        post = super().save(commit)
+        if not commit:
+            return post
+        if hasattr(self, 'normalized_image'):
+            # хранилище уже перенесло временный файл, его можно закрыть
+            self.normalized_image.close()
+        if 'image' in self.changed_data:
+            if post.image:
+                schedule_thumbnails(post.image.name)
+            if previous != post.image.name:
+                release_image(previous)
+        return post
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
         fields = ('text',)
+
+
+class ExportForm(forms.Form):
+    """Параметры потоковой выгрузки из строки запроса."""
+
+    format = forms.ChoiceField(
+        choices=[(fmt, fmt) for fmt in FORMATS], required=False
+    )
+    since = forms.DateField(required=False)
+    until = forms.DateField(required=False)
+    after = forms.IntegerField(min_value=0, required=False)
@@ -0,0 +1,288 @@
+"""Быстрая загрузка фикстур в формате dump.json.
+
+loaddata читает весь файл в память и сохраняет объекты по одному,
+с сигналами и запросами на каждую строку. Здесь файл читается
+потоково (JsonArrayReader держит в памяти только текущий объект),
+строки вставляются пачками многострочных INSERT в одной транзакции,
+а внешние ключи переводятся через словари id в памяти.
+
+Файл читается дважды. Первый проход только распределяет id: строкам
+пустой таблицы остаются их id из фикстуры, иначе id сдвигаются за
+максимальный id таблицы; пользователи и группы, уже существующие
+с тем же username или slug, не вставляются, а ссылки на них ведут
+к существующим строкам. Второй проход вставляет строки.
+
+Сигналы не вызываются, поэтому счётчики, ленты, поисковый индекс
+и кэш страниц перестраиваются один раз после загрузки.
+"""
+
+import json
+from collections import Counter, defaultdict, namedtuple
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.page_cache import invalidate
+
+from .caching import (GROUPS_TAG, POSTS_TAG, bump_feed_generation,
+                      followers_tag, user_tag)
+from .counters import reconcile_comments_count, reconcile_user_stats
+from .feeds import author_timeline_key, rebuild_timelines, timeline_enabled
+from .search import drop_index, install_index
+
+READ_SIZE = 64 * 1024
+BATCH_SIZE = 1000
+INCOMPLETE = object()
+
+# natural_key — поле, по которому строка совпадает с уже существующей;
+# ignore_conflicts — пропускать строки, нарушающие уникальность
+Import = namedtuple('Import', ('natural_key', 'ignore_conflicts'))
+
+IMPORTS = {
+    settings.AUTH_USER_MODEL.lower(): Import('username', False),
+    'posts.group': Import('slug', False),
+    'posts.post': Import(None, False),
+    'posts.comment': Import(None, False),
+    'posts.follow': Import(None, True),
+}
+
+
+class JsonArrayReader:
+    """Элементы JSON-массива верхнего уровня из файла по одному.
+
+    Файл читается блоками по read_size символов, в памяти находится
+    только непрочитанный остаток блока и текущий элемент.
+    """
+
+    def __init__(self, file, read_size=READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer, self.position, self.eof = '', 0, False
+
+    def read(self):
+        chunk = self.file.read(self.read_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def skip(self, characters):
+        """Пропускает characters; возвращает следующий символ или ''."""
+        while True:
+            while (self.position < len(self.buffer)
+                   and self.buffer[self.position] in characters):
+                self.position += 1
+            if self.position < len(self.buffer) or self.eof:
+                return self.buffer[self.position:self.position + 1]
+            self.read()
+
+    def decode(self):
+        """Следующий элемент или INCOMPLETE, если он прочитан не целиком."""
+        try:
+            item, end = self.decoder.raw_decode(self.buffer, self.position)
+        except json.JSONDecodeError:
+            if self.eof:
+                raise
+            return INCOMPLETE
+        # число в конце блока могло прочитаться не полностью
+        if end == len(self.buffer) and not self.eof:
+            return INCOMPLETE
+        self.position = end
+        return item
+
+    def __iter__(self):
+        if self.skip(' \t\r\n') != '[':
+            raise ValueError('Ожидался JSON-массив')
+        self.position += 1
+        while True:
+            character = self.skip(' \t\r\n,')
+            if not character:
+                raise ValueError('Массив не закрыт')
+            if character == ']':
+                return
+            item = self.decode()
+            if item is INCOMPLETE:
+                self.read()
+                continue
+            yield item
+
+
+class DumpImporter:
+    """Загрузка фикстуры path; счётчики строк — в inserted и skipped."""
+
+    def __init__(self, path, batch_size=BATCH_SIZE, using=DEFAULT_DB_ALIAS):
+        self.path = path
+        self.batch_size = batch_size
+        self.using = using
+        # id строки в фикстуре -> id строки в базе
+        self.ids = defaultdict(dict)
+        # строки, уже существующие в базе
+        self.matched = defaultdict(set)
+        self.inserted = Counter()
+        self.skipped = Counter()
+
+    def items(self):
+        with open(self.path, encoding='utf-8') as file:
+            yield from JsonArrayReader(file)
+
+    def run(self):
+        """Загружает фикстуру и перестраивает производные данные."""
+        self.map_ids()
+        with transaction.atomic(using=self.using):
+            connection = connections[self.using]
+            # поисковый индекс дешевле перестроить целиком в конце,
+            # чем обновлять триггером на каждую строку
+            drop_index(connection)
+            self.insert()
+            install_index(connection)
+        self.rebuild()
+
+    def map_ids(self):
+        natural = defaultdict(dict)
+        for item in self.items():
+            label = item['model']
+            if label not in IMPORTS:
+                continue
+            self.ids[label][item['pk']] = None
+            key = IMPORTS[label].natural_key
+            if key:
+                natural[label][item['fields'][key]] = item['pk']
+        for label, ids in self.ids.items():
+            model = apps.get_model(label)
+            manager = model._base_manager.db_manager(self.using)
+            offset = manager.aggregate(last=Max('pk'))['last'] or 0
+            for pk in ids:
+                ids[pk] = offset + pk
+            values = list(natural[label])
+            key = IMPORTS[label].natural_key
+            for start in range(0, len(values), self.batch_size):
+                existing = manager.filter(**{
+                    f'{key}__in': values[start:start + self.batch_size]
+                }).values_list(key, 'pk')
+                for value, pk in existing:
+                    fixture_pk = natural[label][value]
+                    ids[fixture_pk] = pk
+                    self.matched[label].add(fixture_pk)
+
+    def build(self, model, item):
+        """Объект модели по элементу фикстуры или None при висячей ссылке."""
+        values = {}
+        for name, value in item['fields'].items():
+            try:
+                field = model._meta.get_field(name)
+            except FieldDoesNotExist:
+                continue
+            if field.many_to_many:
+                continue
+            if field.is_relation:
+                related = field.related_model._meta.label_lower
+                if value is not None and related in self.ids:
+                    value = self.ids[related].get(value)
+                    if value is None and not field.null:
+                        return None
+                values[field.attname] = value
+            else:
+                values[field.attname] = field.to_python(value)
+        obj = model(pk=self.ids[item['model']][item['pk']], **values)
+        for field in model._meta.concrete_fields:
+            # даты auto_now, которых нет в фикстуре
+            auto = getattr(field, 'auto_now', False) or getattr(
+                field, 'auto_now_add', False
+            )
+            if auto and getattr(obj, field.attname) is None:
+                setattr(obj, field.attname, timezone.now())
+        return obj
+
+    def insert(self):
+        batches = defaultdict(list)
+        for item in self.items():
+            label = item['model']
+            if label not in IMPORTS:
+                self.skipped[label] += 1
+                continue
+            if item['pk'] in self.matched[label]:
+                self.skipped[label] += 1
+                continue
+            obj = self.build(apps.get_model(label), item)
+            if obj is None:
+                self.skipped[label] += 1
+                continue
+            batch = batches[label]
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                self.flush(label, batch)
+                batch.clear()
+        for label, batch in batches.items():
+            self.flush(label, batch)
+
+    def flush(self, label, objs):
+        if objs:
+            insert_rows(
+                apps.get_model(label), objs, self.using,
+                IMPORTS[label].ignore_conflicts
+            )
+            self.inserted[label] += len(objs)
+
+    def rebuild(self):
+        rebuild_derived(
+            self.ids[settings.AUTH_USER_MODEL.lower()].values(), self.using
+        )
+
+
+def insert_rows(model, objs, using=DEFAULT_DB_ALIAS, ignore_conflicts=False):
+    """Вставляет объекты objs одним подготовленным INSERT (executemany).
+
+    bulk_create заменил бы даты auto_now_add текущим временем, а на
+    SQLite дробит пачку на запросы по 999 параметров и собирает SQL
+    для каждого из них. Здесь значения вставляются как есть (raw, как
+    в loaddata), а запрос один на всю пачку. id строк должны быть
+    заданы заранее.
+    """
+    connection = connections[using]
+    ops = connection.ops
+    fields = model._meta.concrete_fields
+    sql = '{} {} ({}) VALUES ({}) {}'.format(
+        ops.insert_statement(ignore_conflicts=ignore_conflicts),
+        ops.quote_name(model._meta.db_table),
+        ', '.join(ops.quote_name(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+        ops.ignore_conflicts_suffix_sql(ignore_conflicts=ignore_conflicts),
+    )
+    rows = [
+        [
+            field.get_db_prep_save(getattr(obj, field.attname), connection)
+            for field in fields
+        ]
+        for obj in objs
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def rebuild_derived(user_ids, using=DEFAULT_DB_ALIAS):
+    """Счётчики, ленты и кэш страниц после вставки строк без сигналов.
+
+    user_ids — пользователи, чьи страницы и списки записей сбрасываются.
+    """
+    for reconcile in (reconcile_user_stats, reconcile_comments_count):
+        chunks = reconcile()
+        while True:
+            with transaction.atomic(using=using):
+                if next(chunks, None) is None:
+                    break
+    if timeline_enabled():
+        with transaction.atomic(using=using):
+            rebuild_timelines()
+    user_ids = list(user_ids)
+    cache.delete_many([author_timeline_key(pk) for pk in user_ids])
+    invalidate(
+        POSTS_TAG, GROUPS_TAG,
+        *[user_tag(pk) for pk in user_ids],
+        *[followers_tag(pk) for pk in user_ids]
+    )
+    bump_feed_generation()
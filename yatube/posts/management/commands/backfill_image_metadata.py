@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.page_cache import invalidate
+from posts.caching import (POSTS_TAG, bump_feed_generation, post_tag,
+                           user_tag)
+from posts.models import Post
+from posts.uploads import image_metadata
+
+CHUNK_SIZE = 200
+FIELDS = ('image_width', 'image_height', 'image_placeholder')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и цвет заглушки картинок записей, '
+        'загруженных до появления этих полей'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько записей обновлять одним запросом'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересчитать и уже заполненные записи'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').only(
+            'pk', 'author_id', 'image'
+        )
+        if not options['force']:
+            posts = posts.filter(
+                Q(image_width__isnull=True) | Q(image_placeholder='')
+            )
+        total = posts.count()
+        done = failed = last_pk = 0
+        while True:
+            chunk = list(
+                posts.filter(pk__gt=last_pk).order_by('pk')
+                [:options['chunk_size']]
+            )
+            if not chunk:
+                break
+            last_pk = chunk[-1].pk
+            updated = []
+            for post in chunk:
+                try:
+                    with post.image.open('rb') as file:
+                        (post.image_width, post.image_height,
+                         post.image_placeholder) = image_metadata(file)
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{post.image.name}: {error}')
+                    continue
+                updated.append(post)
+            Post.objects.bulk_update(updated, FIELDS)
+            # bulk_update не вызывает сигналы, кэш страниц сбрасывается здесь
+            invalidate(*{
+                tag for post in updated
+                for tag in (post_tag(post.pk), user_tag(post.author_id))
+            })
+            done += len(chunk)
+            self.stdout.write(f'Обработано {done} из {total}')
+        invalidate(POSTS_TAG)
+        bump_feed_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей: {total}, с ошибками: {failed}'
+        ))
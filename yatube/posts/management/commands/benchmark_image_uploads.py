@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from posts.thumbnails import init_worker
+from posts.uploads import normalize_image
+
+DEFAULT_SIZES = ('2000x1500', '4000x3000', '8000x6000')
+DEFAULT_FORMATS = ('JPEG', 'PNG')
+MIB = 1024 * 1024
+
+
+def make_image(path, width, height, image_format):
+    """Файл с шумом: сжимается так же плохо, как фотография."""
+    noise = Image.effect_noise((width, height), 64)
+    Image.merge('RGB', (noise, noise.rotate(180), noise)).save(
+        path, image_format
+    )
+
+
+def peak_rss():
+    """Пиковый размер резидентной памяти процесса в килобайтах.
+
+    VmHWM из /proc сбрасывается при exec, а ru_maxrss наследует пик
+    родителя, поэтому ru_maxrss используется только без /proc.
+    """
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(path):
+    """Время и прирост пиковой памяти процесса при нормализации файла.
+
+    Выполняется в отдельном процессе: пик памяти только растёт, поэтому
+    для каждого случая нужен свежий процесс.
+    """
+    before = peak_rss()
+    started = time.perf_counter()
+    with open(path, 'rb') as source:
+        output = normalize_image(File(source, name=os.path.basename(path)))
+    elapsed = time.perf_counter() - started
+    peak = peak_rss()
+    with Image.open(output) as result:
+        size = result.size
+    output_bytes = output.size
+    output.close()
+    return elapsed, (peak - before) * 1024, size, output_bytes
+
+
+class Command(BaseCommand):
+    help = (
+        'Измеряет время и пиковую память нормализации загружаемых '
+        'картинок разных размеров'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', default=DEFAULT_SIZES,
+            help='Размеры исходных картинок, например 4000x3000'
+        )
+        parser.add_argument(
+            '--formats', nargs='+', default=DEFAULT_FORMATS,
+            help='Форматы исходных картинок'
+        )
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        context = multiprocessing.get_context('spawn')
+        try:
+            with context.Pool(1, initializer=init_worker,
+                              maxtasksperchild=1) as pool:
+                for size in options['sizes']:
+                    for image_format in options['formats']:
+                        self.run_case(
+                            pool, directory, size, image_format.upper()
+                        )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def run_case(self, pool, directory, size, image_format):
+        try:
+            width, height = (int(side) for side in size.split('x'))
+        except ValueError:
+            raise CommandError(f'Неверный размер: {size}')
+        path = os.path.join(
+            directory, f'{size}.{image_format.lower()}'
+        )
+        make_image(path, width, height, image_format)
+        elapsed, memory, result, output_bytes = pool.apply(measure, (path,))
+        # Pillow хранит пиксель RGB в 4 байтах
+        full_frame = width * height * 4
+        self.stdout.write(
+            f'{image_format} {size}: '
+            f'{os.path.getsize(path) / MIB:.1f} МиБ → '
+            f'{result[0]}x{result[1]}, {output_bytes / MIB:.2f} МиБ; '
+            f'{elapsed * 1000:.0f} мс; '
+            f'память +{memory / MIB:.1f} МиБ '
+            f'(весь кадр в памяти {full_frame / MIB:.1f} МиБ)'
+        )
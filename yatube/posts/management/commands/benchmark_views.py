@@ -0,0 +1,98 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.benchmarks import (BASELINE, DATASETS, REPEAT, TIME_THRESHOLD,
+                              VIEWS, compare, load_baseline, run_dataset,
+                              save_baseline)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа, число запросов и размер страниц на '
+        'синтетических наборах данных и сравнивает с сохранёнными '
+        'результатами'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--datasets', nargs='+', choices=DATASETS,
+            default=['small', 'medium'],
+            help='Наборы данных, на которых идут замеры'
+        )
+        parser.add_argument(
+            '--views', nargs='+', choices=VIEWS, default=list(VIEWS),
+            help='Страницы, которые замеряются'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=REPEAT,
+            help='Сколько раз запрашивать каждую страницу'
+        )
+        parser.add_argument(
+            '--baseline', default=BASELINE,
+            help='JSON-файл с сохранёнными результатами'
+        )
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Записать результаты в файл вместо сравнения'
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=TIME_THRESHOLD,
+            help='Допустимый рост времени ответа, доля от сохранённого'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1')
+        baseline, sizes = {}, {}
+        if os.path.exists(options['baseline']):
+            baseline, sizes = load_baseline(options['baseline'])
+        results = {}
+        for name in options['datasets']:
+            self.stdout.write(f'Набор {name}: {DATASETS[name]}')
+            results[name] = run_dataset(
+                DATASETS[name], options['views'], options['repeat']
+            )
+            self.report(results[name])
+        if options['update_baseline']:
+            self.update(options['baseline'], results, baseline, sizes)
+        else:
+            self.compare_baseline(
+                results, baseline, sizes, options['threshold']
+            )
+
+    def report(self, results):
+        for view, metrics in results.items():
+            self.stdout.write(
+                f'  {view}: p50 {metrics["p50_ms"]:.1f} мс, '
+                f'p95 {metrics["p95_ms"]:.1f} мс, '
+                f'запросов {metrics["queries"]}, байт {metrics["bytes"]}'
+            )
+
+    def update(self, path, results, baseline, sizes):
+        for name, views in results.items():
+            # результаты на наборе другого размера уже не сравнимы
+            stored = baseline.get(name, {})
+            if sizes.get(name) != DATASETS[name]:
+                stored = {}
+            baseline[name] = {**stored, **views}
+            sizes[name] = DATASETS[name]
+        save_baseline(path, baseline, sizes)
+        self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {path}'))
+
+    def compare_baseline(self, results, baseline, sizes, threshold):
+        for name in results:
+            if name in sizes and sizes[name] != DATASETS[name]:
+                self.stdout.write(self.style.WARNING(
+                    f'Набор {name} изменился, сравнение пропущено'
+                ))
+                baseline.pop(name, None)
+        regressions = compare(results, baseline, threshold)
+        for item in regressions:
+            self.stdout.write(self.style.ERROR(
+                f'{item.dataset} {item.view}: {item.metric} '
+                f'{item.baseline} -> {item.current}'
+            ))
+        if regressions:
+            raise CommandError(f'Регрессий: {len(regressions)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,125 @@
+import os
+import shutil
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from sorl.thumbnail import delete
+
+from core.page_cache import invalidate
+from posts.caching import (POSTS_TAG, bump_feed_generation, post_tag,
+                           user_tag)
+from posts.models import Post
+from posts.storage import (content_hash, content_name, delete_unreferenced,
+                           image_storage, is_content_name)
+
+MIB = 1024 * 1024
+
+
+def link_or_copy(source, target):
+    """Жёсткая ссылка на файл, а на другой файловой системе — копия."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class Command(BaseCommand):
+    help = (
+        'Переводит картинки записей на имена по хэшу содержимого, '
+        'объединяет одинаковые файлы и удаляет файлы без ссылок'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет сделано'
+        )
+
+    def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        names = list(
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        referenced = set(names)
+        legacy = [name for name in names if not is_content_name(name)]
+        renamed = merged = missing = freed = 0
+        for name in legacy:
+            if not image_storage.exists(name):
+                missing += 1
+                self.stderr.write(f'{name}: файл не найден')
+                continue
+            size = image_storage.size(name)
+            with image_storage.open(name) as file:
+                target = content_name(name, content_hash(file))
+            if target in referenced or image_storage.exists(target):
+                merged += 1
+                freed += size
+            else:
+                renamed += 1
+            referenced.add(target)
+            if not self.dry_run:
+                self.move(name, target)
+        pruned, pruned_bytes = self.prune(referenced)
+        if not self.dry_run and legacy:
+            invalidate(POSTS_TAG)
+            bump_feed_generation()
+        self.stdout.write(self.style.SUCCESS(
+            f'Переименовано: {renamed}, объединено с копиями: {merged}, '
+            f'без ссылок: {pruned}, не найдено: {missing}; '
+            f'освобождено {(freed + pruned_bytes) / MIB:.1f} МиБ'
+        ))
+        if renamed and not self.dry_run:
+            self.stdout.write(
+                'Миниатюры для новых имён создаёт команда generate_thumbnails'
+            )
+
+    def move(self, name, target):
+        """Переводит записи с картинкой name на файл target.
+
+        Новый файл появляется раньше, чем записи на него переключаются,
+        а старый удаляется после, поэтому страницы не видят пропавших
+        файлов.
+        """
+        if not image_storage.exists(target):
+            link_or_copy(image_storage.path(name), image_storage.path(target))
+        with transaction.atomic():
+            posts = list(
+                Post.objects.filter(image=name).values_list('pk', 'author_id')
+            )
+            Post.objects.filter(image=name).update(image=target)
+        # update() не вызывает сигналы, кэш страниц сбрасывается здесь
+        invalidate(*{
+            tag for pk, author_id in posts
+            for tag in (post_tag(pk), user_tag(author_id))
+        })
+        # миниатюры старого имени созданы с хранилищем по умолчанию
+        delete(name)
+
+    def prune(self, referenced):
+        """Удаляет файлы с именами по содержимому, на которые нет ссылок.
+
+        Возвращает число таких файлов и их общий размер.
+        """
+        directory = Post._meta.get_field('image').upload_to
+        root = image_storage.path(directory)
+        count = size = 0
+        for path, _, filenames in os.walk(root):
+            for filename in filenames:
+                name = os.path.relpath(
+                    os.path.join(path, filename), image_storage.location
+                ).replace(os.sep, '/')
+                if not is_content_name(name) or name in referenced:
+                    continue
+                file_size = image_storage.size(name)
+                if self.dry_run:
+                    deleted = not image_storage.recently_used(name)
+                else:
+                    deleted = delete_unreferenced(name)
+                if deleted:
+                    count += 1
+                    size += file_size
+        return count, size
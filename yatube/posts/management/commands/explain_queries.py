@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts.query_plans import (NO_CACHE, collect_plans, plan_problems,
+                               seed_dataset)
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет запросы лент и страницы записи через EXPLAIN QUERY PLAN '
+        'и сообщает о полных просмотрах таблиц и сортировках в B-дереве'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--posts', type=int, default=50,
+            help='Сколько записей создать во временном наборе данных'
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только проблемных'
+        )
+
+    def handle(self, *args, **options):
+        # кэш отключается до создания данных: иначе сигналы меняли бы
+        # версии тегов и поколения лент в общем кэше, а откат транзакции
+        # их не вернёт
+        with override_settings(CACHES=NO_CACHE), transaction.atomic():
+            user, post = seed_dataset(options['posts'])
+            plans = collect_plans(user, post)
+            transaction.set_rollback(True)
+        problems = 0
+        for (url, sql), details in plans.items():
+            found = plan_problems(details)
+            problems += bool(found)
+            if not found and not options['verbose_plans']:
+                continue
+            style = self.style.WARNING if found else self.style.SUCCESS
+            self.stdout.write(style(url))
+            self.stdout.write(f'  {sql}')
+            for detail in details:
+                marker = '!' if detail in found else ' '
+                self.stdout.write(f'  {marker} {detail}')
+        summary = f'Запросов: {len(plans)}, с проблемами: {problems}'
+        if problems:
+            self.stdout.write(self.style.ERROR(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
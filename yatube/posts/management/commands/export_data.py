@@ -0,0 +1,93 @@
+import datetime
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import (CHUNK_SIZE, EXPORTS, FORMATS, ExportError,
+                          export_records, last_exported)
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает записи, комментарии, подписки или группы в NDJSON '
+        'или CSV потоком, не собирая выгрузку в памяти'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument(
+            '--output', help='Файл выгрузки; по умолчанию стандартный вывод'
+        )
+        parser.add_argument(
+            '--since', type=datetime.date.fromisoformat,
+            help='Первый день выгрузки, ГГГГ-ММ-ДД'
+        )
+        parser.add_argument(
+            '--until', type=datetime.date.fromisoformat,
+            help='Последний день выгрузки, ГГГГ-ММ-ДД'
+        )
+        parser.add_argument(
+            '--after-id', type=int,
+            help='Выгружать строки с id больше указанного'
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Дописать файл --output с последней выгруженной строки'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк читать из базы за один раз'
+        )
+
+    def handle(self, *args, **options):
+        fmt = options['format']
+        path = options['output']
+        after = options['after_id']
+        header = True
+        if options['resume']:
+            if not path:
+                raise CommandError('--resume работает только с --output')
+            if os.path.exists(path):
+                after, header = self.truncate(path, fmt, after)
+        output = open(path, 'a', encoding='utf-8') if path else None
+        try:
+            count, last_id = self.write(
+                output or self.stdout, options, after, header
+            )
+        except ExportError as error:
+            raise CommandError(error)
+        finally:
+            if output is not None:
+                output.close()
+        # отчёт идёт в stderr, чтобы не смешиваться с выгрузкой в stdout
+        self.stderr.write(
+            f'{options["table"]}: выгружено строк {count}, '
+            f'последний id {last_id}'
+        )
+
+    def truncate(self, path, fmt, after):
+        """Отрезает оборванную строку в конце файла.
+
+        Возвращает id, с которого продолжить, и нужен ли заголовок.
+        """
+        with open(path, 'r+b') as file:
+            end, last_id = last_exported(file, fmt)
+            file.truncate(end)
+        if last_id is not None:
+            after = max(after or 0, last_id)
+        return after, end == 0
+
+    def write(self, output, options, after, header):
+        records = export_records(
+            options['table'], options['format'],
+            since=options['since'], until=options['until'], after=after,
+            header=header, chunk_size=options['chunk_size']
+        )
+        count, last_id = 0, after
+        for pk, line in records:
+            output.write(line)
+            if pk is not None:
+                count += 1
+                last_id = pk
+        return count, last_id
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from posts.importer import BATCH_SIZE
+from posts.synthetic import DatasetGenerator
+
+
+def fraction(value):
+    value = float(value)
+    if not 0 <= value <= 1:
+        raise ValueError(value)
+    return value
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт синтетических пользователей, группы, записи, комментарии '
+        'и подписки; одинаковый --seed даёт одинаковые данные'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя'
+        )
+        parser.add_argument(
+            '--images', type=fraction, default=0.0,
+            help='Доля записей с картинкой, от 0 до 1'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='user',
+            help='Начало имён пользователей и адресов групп'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределены даты записей'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.0,
+            help='Показатель степенного закона популярности'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['days'] < 1:
+            raise CommandError('--days должен быть не меньше 1')
+        generator = DatasetGenerator(
+            options['users'], options['groups'], options['posts'],
+            options['comments'], options['follows'],
+            images=options['images'], seed=options['seed'],
+            prefix=options['prefix'], password=options['password'],
+            days=options['days'], exponent=options['exponent'],
+            batch_size=options['batch_size'],
+        )
+        started = time.monotonic()
+        try:
+            generator.run()
+        except IntegrityError as error:
+            raise CommandError(
+                f'Имена уже заняты, выберите другой --prefix: {error}'
+            )
+        elapsed = time.monotonic() - started
+        for label, count in sorted(generator.inserted.items()):
+            self.stdout.write(f'{label}: создано {count}')
+        total = sum(generator.inserted.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {total} за {elapsed:.1f} с, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с'
+        ))
@@ -0,0 +1,69 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate_thumbnails, init_worker
+
+PROGRESS_EVERY = 50
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры картинок записей '
+        'в нескольких процессах'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов; 1 — без пула, в текущем процессе'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать уже существующие миниатюры'
+        )
+
+    def handle(self, *args, **options):
+        names = list(
+            Post.objects.exclude(image='').order_by('image')
+            .values_list('image', flat=True).distinct()
+        )
+        total = len(names)
+        done = failed = 0
+        for name, error in self.generate(names, options):
+            done += 1
+            if error is not None:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+            if done % PROGRESS_EVERY == 0 or done == total:
+                self.stdout.write(f'Обработано {done} из {total}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок: {total}, с ошибками: {failed}'
+        ))
+
+    def generate(self, names, options):
+        """Пары (картинка, ошибка) по мере готовности миниатюр."""
+        force = options['force']
+        if options['workers'] <= 1:
+            for name in names:
+                try:
+                    generate_thumbnails(name, force)
+                except Exception as error:
+                    yield name, error
+                else:
+                    yield name, None
+            return
+        # дочерние процессы не должны наследовать открытые соединения
+        connections.close_all()
+        with ProcessPoolExecutor(
+            options['workers'], initializer=init_worker
+        ) as pool:
+            futures = {
+                pool.submit(generate_thumbnails, name, force): name
+                for name in names
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.exception()
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.importer import BATCH_SIZE, DumpImporter
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает фикстуру в формате dump.json пачками INSERT без '
+        'сигналов, затем один раз пересчитывает счётчики, ленты и кэш'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл фикстуры, JSON-массив')
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Сколько строк вставлять одним запросом'
+        )
+
+    def handle(self, *args, **options):
+        importer = DumpImporter(options['path'], options['batch_size'])
+        started = time.monotonic()
+        importer.run()
+        elapsed = time.monotonic() - started
+        for label, count in sorted(importer.inserted.items()):
+            self.stdout.write(f'{label}: загружено {count}')
+        for label, count in sorted(importer.skipped.items()):
+            self.stdout.write(f'{label}: пропущено {count}')
+        total = sum(importer.inserted.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено строк: {total} за {elapsed:.1f} с, '
+            f'{total / max(elapsed, 1e-6):.0f} строк/с'
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from posts.search import install_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Восстанавливает таблицу и триггеры полнотекстового индекса '
+        'записей и заново заполняет индекс'
+    )
+
+    def handle(self, *args, **options):
+        install_index()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
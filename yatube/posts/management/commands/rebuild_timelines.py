@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.feeds import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает материализованные ленты подписок с нуля'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = rebuild_timelines()
+        self.stdout.write(
+            self.style.SUCCESS(f'Ленты пересобраны, подписок: {count}')
+        )
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import (CHUNK_SIZE, reconcile_comments_count,
+                            reconcile_user_stats)
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики записей, подписок и комментариев '
+        'и исправляет расхождения порциями'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help='Сколько строк обрабатывать в одной транзакции'
+        )
+
+    def handle(self, *args, **options):
+        reconcilers = (
+            ('пользователи', reconcile_user_stats),
+            ('записи', reconcile_comments_count),
+        )
+        for name, reconcile in reconcilers:
+            processed = fixed = 0
+            chunks = reconcile(options['chunk_size'])
+            while True:
+                # каждая порция пересчитывается в отдельной транзакции
+                with transaction.atomic():
+                    result = next(chunks, None)
+                if result is None:
+                    break
+                processed += result[0]
+                fixed += result[1]
+            self.stdout.write(self.style.SUCCESS(
+                f'{name}: проверено {processed}, исправлено {fixed}'
+            ))
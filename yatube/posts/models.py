@@ -4,6 +4,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import image_storage
+
 CUT_TEXT = 15
 
 User = get_user_model()
@@ -36,6 +38,9 @@ class Post(models.Model):
     pub_date = models.DateTimeField(
         'Дата публикации',
         auto_now_add=True)
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -51,16 +56,57 @@ class Post(models.Model):
         verbose_name='Группа',
         help_text='Укажите название вашей группы'
     )
+    # одинаковые картинки хранятся одним файлом, см. posts.storage
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
-        blank=True
+        storage=image_storage,
+        blank=True,
+        db_index=True
+    )
+    # заполняются при загрузке (PostForm) или командой
+    # backfill_image_metadata, чтобы шаблоны не открывали файл
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        null=True,
+        blank=True,
+        editable=False
+    )
+    image_placeholder = models.CharField(
+        'Цвет заглушки картинки',
+        max_length=7,
+        blank=True,
+        editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False
     )
 
     class Meta:
         ordering = ('-pub_date', )
         verbose_name = 'запись'
         verbose_name_plural = 'записи'
+        # индексы по возрастанию pub_date: SQLite читает их в обратном
+        # порядке и получает сортировку (-pub_date, -id) без B-дерева
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:CUT_TEXT]
@@ -94,6 +140,12 @@ class Comment(models.Model):
         ordering = ('-created', )
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', 'created'],
+                name='comment_post_created_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:CUT_TEXT]
@@ -130,3 +182,75 @@ class Follow(models.Model):
 
     def __str__(self):
         return self.author.username[:CUT_TEXT]
+
+
+class UserStats(models.Model):
+    """Класс UserStats — счётчики пользователя.
+
+    Поддерживаются сигналами при записи постов и подписок, чтобы страницы
+    не выполняли COUNT; расхождения исправляет reconcile_counters.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Число записей', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField(
+        'Число подписок', default=0
+    )
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class Timeline(models.Model):
+    """Класс Timeline — материализованная лента подписок пользователя.
+
+    Каждая запись автора копируется в ленты его подписчиков, поэтому
+    страница ленты читается одним диапазоном индекса (user, pub_date).
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Подписчик'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Запись'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post_id')
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_timeline_post'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_pub_date_idx'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} — {self.post}'
@@ -0,0 +1,250 @@
+"""Паджинаторы для лент записей.
+
+CursorPaginator выбирает страницу условием по ключу (pub_date, id)
+вместо OFFSET: любая страница читается по индексу за постоянное время,
+а её содержимое не сдвигается, когда в ленте появляются новые записи.
+
+CachedCountPaginator обслуживает классический режим ?page=N: общее число
+записей берётся из подсказки или из кэша, а навигация строится
+по сокращённому диапазону страниц вместо полного page_range.
+
+EstimatedCountPaginator нужен спискам админки на больших таблицах:
+точный COUNT(*) в SQLite читает весь индекс, поэтому число строк
+оценивается или считается только до предела.
+"""
+
+import hashlib
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Max, Q
+from django.utils.dateparse import parse_datetime
+from django.utils.encoding import force_bytes
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+CURSOR_SEPARATOR = '|'
+COUNT_CACHE_TIMEOUT = 60
+
+
+def encode_cursor(pub_date, pk):
+    """Упаковывает ключ записи в строку, пригодную для URL."""
+    raw = f'{pub_date.isoformat()}{CURSOR_SEPARATOR}{pk}'
+    return urlsafe_base64_encode(force_bytes(raw))
+
+
+def decode_cursor(cursor):
+    """Распаковывает курсор; для повреждённого значения возвращает None."""
+    if not cursor:
+        return None
+    try:
+        raw = urlsafe_base64_decode(cursor).decode()
+        pub_date, pk = raw.split(CURSOR_SEPARATOR)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if pub_date is None:
+        return None
+    return pub_date, pk
+
+
+class FeedPaginator(Paginator):
+    """Базовый паджинатор лент.
+
+    keys — имена полей даты и id, задающих порядок ленты; они же читаются
+    как атрибуты объектов. transform — функция, превращающая объекты
+    страницы в записи (например, элементы Timeline в посты).
+    """
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'pk'),
+                 transform=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.keys = keys
+        self.transform = transform
+
+    def _get_page(self, object_list, *args, **kwargs):
+        if self.transform is not None:
+            object_list = self.transform(list(object_list))
+        return super()._get_page(object_list, *args, **kwargs)
+
+
+class CursorPaginator(FeedPaginator):
+    """Паджинатор по ключу (дата, id) в порядке убывания.
+
+    Общее число записей неизвестно, поэтому страницы нумеруются
+    относительно текущей: первая страница — 1, любая следующая — 2,
+    а num_pages показывает, есть ли страница после текущей.
+    """
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def _position(self, obj):
+        date_key, id_key = self.keys
+        return encode_cursor(getattr(obj, date_key), getattr(obj, id_key))
+
+    def _seek(self, position, reverse):
+        # Первое условие ограничивает диапазон индекса по дате,
+        # остальные отсекают записи с той же датой до позиции.
+        date_key, id_key = self.keys
+        pub_date, pk = position
+        lookup = 'gt' if reverse else 'lt'
+        return Q(**{f'{date_key}__{lookup}e': pub_date}) & (
+            Q(**{f'{date_key}__{lookup}': pub_date})
+            | Q(**{date_key: pub_date, f'{id_key}__{lookup}': pk})
+        )
+
+    def _ordering(self, reverse):
+        prefix = '' if reverse else '-'
+        return [prefix + key for key in self.keys]
+
+    def _fetch(self, position, reverse, limit):
+        """Не более limit объектов за позицией в порядке обхода.
+
+        Вместо QuerySet можно передать объект с методом seek() — например,
+        ленту, собранную в памяти.
+        """
+        if hasattr(self.object_list, 'seek'):
+            return self.object_list.seek(position, reverse, limit)
+        queryset = self.object_list.order_by(*self._ordering(reverse))
+        if position is not None:
+            queryset = queryset.filter(self._seek(position, reverse))
+        return list(queryset[:limit])
+
+    def get_cursor_page(self, after=None, before=None):
+        """Возвращает страницу после курсора after или перед before.
+
+        Без курсоров (или с повреждённым курсором) отдаётся первая страница.
+        """
+        position = decode_cursor(before or after)
+        reverse = bool(before) and position is not None
+        items = self._fetch(position, reverse, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if position is not None and not items:
+            return self.get_cursor_page()
+        if reverse:
+            items.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, position is not None
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        next_cursor = self._position(items[-1]) if has_next else None
+        previous_cursor = self._position(items[0]) if has_previous else None
+        page = self._get_page(items, number, self)
+        page.is_cursor = True
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        return page
+
+
+class CachedCountPaginator(FeedPaginator):
+    """Паджинатор с кэшируемым COUNT и сокращённым диапазоном страниц.
+
+    count — заранее известное число записей; если он не передан,
+    результат COUNT(*) кэшируется по тексту SQL на COUNT_CACHE_TIMEOUT
+    секунд. Диапазон страниц содержит первую и последнюю страницы
+    и ON_EACH_SIDE страниц вокруг текущей, пропуски заменяет ELLIPSIS.
+    """
+
+    ELLIPSIS = '…'
+    ON_EACH_SIDE = 2
+    ON_ENDS = 1
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        if count is not None:
+            self.count = count
+
+    @cached_property
+    def count(self):
+        try:
+            sql = str(self.object_list.query)
+        except (AttributeError, EmptyResultSet):
+            return self._exact_count()
+        key = 'paginator_count:' + hashlib.md5(force_bytes(sql)).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = self._exact_count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+
+    def _exact_count(self):
+        try:
+            return self.object_list.count()
+        except (AttributeError, TypeError):
+            return len(self.object_list)
+
+    def get_elided_page_range(self, number=1):
+        """Номера страниц вокруг number с многоточиями на месте пропусков."""
+        number = self.validate_number(number)
+        on_each_side, on_ends = self.ON_EACH_SIDE, self.ON_ENDS
+        if self.num_pages <= (on_each_side + on_ends) * 2:
+            return list(self.page_range)
+        pages = []
+        if number > on_each_side + on_ends + 2:
+            pages += range(1, on_ends + 1)
+            pages.append(self.ELLIPSIS)
+            pages += range(number - on_each_side, number + 1)
+        else:
+            pages += range(1, number + 1)
+        if number < self.num_pages - on_each_side - on_ends - 1:
+            pages += range(number + 1, number + on_each_side + 1)
+            pages.append(self.ELLIPSIS)
+            pages += range(self.num_pages - on_ends + 1, self.num_pages + 1)
+        else:
+            pages += range(number + 1, self.num_pages + 1)
+        return pages
+
+    def _get_page(self, *args, **kwargs):
+        page = super()._get_page(*args, **kwargs)
+        page.elided_page_range = self.get_elided_page_range(page.number)
+        return page
+
+
+class EstimatedCountPaginator(Paginator):
+    """Паджинатор с оценкой числа строк вместо полного COUNT(*).
+
+    Для выборки без условий число строк берётся из статистики
+    sqlite_stat1 (её заполняет ANALYZE), а без статистики — по
+    наибольшему id. С условиями строки считаются точно, но не больше
+    COUNT_LIMIT: этого хватает для первых страниц, а подсчёт не читает
+    всю выборку.
+    """
+
+    COUNT_LIMIT = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            return self._table_estimate(queryset)
+        return queryset[:self.COUNT_LIMIT].count()
+
+    @staticmethod
+    def _table_estimate(queryset):
+        table = queryset.model._meta.db_table
+        # без ANALYZE таблицы sqlite_stat1 нет, ошибка не должна
+        # прерывать внешнюю транзакцию
+        try:
+            with transaction.atomic(using=queryset.db), \
+                    connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table]
+                )
+                row = cursor.fetchone()
+        except DatabaseError:
+            row = None
+        if row is not None:
+            return int(row[0].split()[0])
+        return queryset.aggregate(last=Max('pk'))['last'] or 0
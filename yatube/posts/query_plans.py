@@ -0,0 +1,113 @@
+"""Анализ планов запросов лент и страниц записей.
+
+Страницы приложения запрашиваются тестовым клиентом, все выполненные
+SELECT прогоняются через EXPLAIN QUERY PLAN, а в планах ищутся полные
+просмотры таблиц и временные B-деревья для сортировки.
+"""
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+def explain(sql):
+    """Строки плана SQLite для запроса."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def plan_problems(details):
+    """Шаги плана с полным просмотром таблицы или сортировкой в B-дереве.
+
+    Просмотр по индексу (SCAN ... USING INDEX) проблемой не считается:
+    так SQLite читает упорядоченную ленту с LIMIT. Не считается и
+    SCAN (subquery-N) — чтение строк подзапроса, а не таблицы.
+    """
+    problems = []
+    for detail in details:
+        full_scan = (
+            detail.startswith('SCAN') and 'USING' not in detail
+            and not detail.startswith('SCAN (subquery')
+        )
+        if full_scan or 'TEMP B-TREE' in detail:
+            problems.append(detail)
+    return problems
+
+
+def seed_dataset(posts=50):
+    """Минимальный набор данных для страниц ленты и записи."""
+    author = User.objects.create_user(username='plan_author')
+    reader = User.objects.create_user(username='plan_reader')
+    group = Group.objects.create(
+        title='План', slug='plan-group', description='Анализ планов'
+    )
+    Post.objects.bulk_create([
+        Post(author=author, group=group, text=f'Запись {i}')
+        for i in range(posts)
+    ])
+    post = Post.objects.filter(author=author).first()
+    Comment.objects.create(post=post, author=reader, text='Комментарий')
+    Follow.objects.create(user=reader, author=author)
+    return reader, post
+
+
+def page_urls(post):
+    """Адреса лент и страницы записи, которые нужно проанализировать."""
+    feeds = (
+        reverse('posts:index'),
+        reverse('posts:group_list', kwargs={'slug': post.group.slug}),
+        reverse('posts:profile', kwargs={'username': post.author.username}),
+        reverse('posts:follow_index'),
+    )
+    urls = [reverse('posts:post_detail', kwargs={'post_id': post.pk})]
+    for url in feeds:
+        urls += [url, f'{url}?page=2']
+    return urls
+
+
+def _explain_page(client, url, plans):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    for query in queries:
+        if query['sql'].startswith('SELECT'):
+            plans[(url, query['sql'])] = explain(query['sql'])
+    if response.context and 'page_obj' in response.context:
+        return getattr(response.context['page_obj'], 'next_cursor', None)
+    return None
+
+
+def collect_plans(user, post):
+    """Запрашивает страницы и возвращает {(url, sql): строки плана}.
+
+    Для курсорных лент дополнительно анализируется вторая страница.
+    """
+    client = Client()
+    client.force_login(user)
+    plans = {}
+    with override_settings(CACHES=NO_CACHE):
+        for url in page_urls(post):
+            next_cursor = _explain_page(client, url, plans)
+            if next_cursor:
+                _explain_page(client, f'{url}?after={next_cursor}', plans)
+    return plans
+
+
+def find_problems(user, post):
+    """{(url, sql): проблемные шаги плана} для запросов с проблемами."""
+    problems = {}
+    for key, details in collect_plans(user, post).items():
+        found = plan_problems(details)
+        if found:
+            problems[key] = found
+    return problems
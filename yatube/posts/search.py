@@ -0,0 +1,93 @@
+"""Полнотекстовый поиск по записям на SQLite FTS5.
+
+Текст записей индексируется во внешней таблице FTS5 posts_post_fts,
+которая хранит только индекс, а сам текст читает из posts_post.
+Триггеры на posts_post обновляют индекс при добавлении, изменении
+и удалении записей, в том числе через update(), bulk_create() и
+удаление в админке, где сигналы моделей не вызываются.
+
+Django на SQLite пересоздаёт таблицу при некоторых изменениях полей
+в миграциях, и триггеры при этом пропадают. Такие миграции должны
+заново создать их своим RunSQL, как 0017_post_search (миграции не
+импортируют этот модуль), а вручную триггеры и индекс восстанавливает
+команда rebuild_search_index.
+"""
+
+import re
+
+from django.db import connection
+
+TABLE = 'posts_post_fts'
+MAX_TERMS = 10
+TERM = re.compile(r'\w+')
+
+SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_insert "
+    f"AFTER INSERT ON posts_post BEGIN "
+    f"INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_delete "
+    f"AFTER DELETE ON posts_post BEGIN "
+    f"INSERT INTO {TABLE} ({TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {TABLE}_update "
+    f"AFTER UPDATE OF text ON posts_post BEGIN "
+    f"INSERT INTO {TABLE} ({TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {TABLE} (rowid, text) VALUES (new.id, new.text); "
+    f"END",
+)
+DROP = (
+    f'DROP TRIGGER IF EXISTS {TABLE}_insert',
+    f'DROP TRIGGER IF EXISTS {TABLE}_delete',
+    f'DROP TRIGGER IF EXISTS {TABLE}_update',
+    f'DROP TABLE IF EXISTS {TABLE}',
+)
+
+
+def install_index(using=connection):
+    """Создаёт таблицу индекса и триггеры, если их нет, и заполняет индекс."""
+    with using.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('rebuild')")
+
+
+def drop_index(using=connection):
+    with using.cursor() as cursor:
+        for statement in DROP:
+            cursor.execute(statement)
+
+
+def match_expression(query):
+    """Выражение MATCH: все слова запроса, каждое как префикс.
+
+    Слова берутся в кавычки, поэтому операторы и спецсимволы FTS5
+    из пользовательского ввода не меняют смысл запроса. Для пустого
+    запроса возвращает пустую строку.
+    """
+    terms = TERM.findall(query)[:MAX_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def search_posts(queryset, query):
+    """Записи queryset, подходящие под query, от наиболее релевантных.
+
+    Релевантность — bm25 из FTS5 (атрибут search_rank, чем меньше,
+    тем лучше), при равенстве выше более новые записи.
+    """
+    expression = match_expression(query)
+    if not expression:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        select={'search_rank': f'{TABLE}.rank'},
+        tables=[TABLE],
+        where=[f'{TABLE}.rowid = {table}.id', f'{TABLE} MATCH %s'],
+        params=[expression],
+        order_by=['search_rank', '-pub_date'],
+    )
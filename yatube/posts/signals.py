@@ -0,0 +1,108 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.page_cache import invalidate
+
+from .caching import (GROUPS_TAG, POSTS_TAG, bump_feed_generation,
+                      followers_tag, group_tag, post_tag, user_tag)
+from .counters import change_comments_count, change_user_stats
+from .feeds import (backfill_timeline, fan_out_post, prune_timeline,
+                    reset_author_timeline, timeline_enabled)
+from .models import Comment, Follow, Group, Post, UserStats
+from .storage import release_image
+
+User = get_user_model()
+
+# поля пользователя, которые выводятся в лентах
+AUTHOR_FIELDS = frozenset({'username', 'first_name', 'last_name'})
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    invalidate(user_tag(instance.pk))
+    if created:
+        if not raw:
+            UserStats.objects.get_or_create(user=instance)
+        return
+    # имя автора выводится во фрагментах лент, а теги авторов в ETag
+    # лент не входят; вход (update_fields={'last_login'}) их не трогает
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        bump_feed_generation()
+        invalidate(POSTS_TAG)
+        # имя комментатора выводится на страницах записей
+        commented = Comment.objects.filter(author=instance).order_by(
+        ).values_list('post_id', flat=True).distinct()
+        invalidate(*[post_tag(pk) for pk in commented.iterator()])
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    bump_feed_generation()
+    invalidate(GROUPS_TAG, group_tag(instance.pk))
+
+
+def invalidate_post_pages(post):
+    invalidate(POSTS_TAG, post_tag(post.pk), user_tag(post.author_id))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    bump_feed_generation()
+    invalidate_post_pages(instance)
+    if not created or raw:
+        return
+    change_user_stats(instance.author_id, posts_count=1)
+    reset_author_timeline(instance)
+    if timeline_enabled():
+        fan_out_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_feed_generation()
+    invalidate_post_pages(instance)
+    change_user_stats(instance.author_id, posts_count=-1)
+    reset_author_timeline(instance)
+    release_image(instance.image.name)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    invalidate(post_tag(instance.post_id))
+    if created and not raw:
+        change_comments_count(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    invalidate(post_tag(instance.post_id))
+    change_comments_count(instance.post_id, -1)
+
+
+def change_follow_stats(follow, delta):
+    """Меняет счётчики подписок и сбрасывает кэш страниц пользователей."""
+    if follow.user_id and follow.author_id:
+        change_user_stats(follow.author_id, followers_count=delta)
+        change_user_stats(follow.user_id, following_count=delta)
+        invalidate(
+            followers_tag(follow.author_id), followers_tag(follow.user_id)
+        )
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if not created or raw:
+        return
+    change_follow_stats(instance, 1)
+    if timeline_enabled() and instance.user_id and instance.author_id:
+        backfill_timeline(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_follow_stats(instance, -1)
+    if timeline_enabled() and instance.user_id and instance.author_id:
+        prune_timeline(instance.user_id, instance.author_id)
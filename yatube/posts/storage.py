@@ -0,0 +1,112 @@
+"""Хранилище картинок записей с именами по содержимому.
+
+Файл сохраняется под именем posts/<ab>/<sha256>.<расширение>, где ab —
+первые символы хэша содержимого. Одинаковые загрузки получают одно
+имя: второй файл не пишется, а записи ссылаются на общий файл и общий
+набор миниатюр sorl-thumbnail, ключи которых строятся по имени.
+
+Счётчик ссылок на файл — число записей с этим именем в поле image
+(по нему есть индекс). Когда запись удаляется или меняет картинку,
+release_image() после фиксации транзакции проверяет, остались ли
+ссылки, и удаляет файл с миниатюрами только если их нет.
+
+Между проверкой ссылок и удалением файла параллельная загрузка может
+переиспользовать тот же файл. Поэтому переиспользование обновляет время
+изменения файла, а файл, который менялся за последние
+POSTS_IMAGE_REUSE_GRACE секунд, не удаляется; оставшиеся без ссылок
+файлы подбирает команда dedupe_media.
+"""
+
+import hashlib
+import os
+import posixpath
+import re
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+from sorl.thumbnail import delete
+from sorl.thumbnail.images import ImageFile
+
+CONTENT_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$')
+
+
+def content_hash(content):
+    """SHA-256 содержимого файла; файл читается по частям."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+def content_name(name, digest):
+    """Имя файла с хэшем digest в каталоге и с расширением имени name."""
+    directory, filename = posixpath.split(name)
+    extension = os.path.splitext(filename)[1].lower()
+    return posixpath.join(directory, digest[:2], digest + extension)
+
+
+def is_content_name(name):
+    return bool(CONTENT_NAME.search(name))
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, которое называет файлы хэшем содержимого."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = content_name(name, content_hash(content))
+        if self.exists(name):
+            # отметка для release_image: файл только что понадобился
+            os.utime(self.path(name))
+            return name
+        return super().save(name, content, max_length)
+
+    def recently_used(self, name):
+        age = time.time() - os.path.getmtime(self.path(name))
+        return age < settings.POSTS_IMAGE_REUSE_GRACE
+
+
+image_storage = ContentAddressedStorage()
+
+
+def image_file(name):
+    """Картинка name для sorl-thumbnail с хранилищем записей.
+
+    Ключи миниатюр sorl зависят от класса хранилища, поэтому картинка
+    должна передаваться с тем же хранилищем, что у поля Post.image.
+    """
+    return ImageFile(name, image_storage)
+
+
+def delete_unreferenced(name):
+    """Удаляет файл name с миниатюрами, если на него нет ссылок.
+
+    Возвращает True, если файл удалён.
+    """
+    from .models import Post
+
+    if Post.objects.filter(image=name).exists():
+        return False
+    if image_storage.exists(name) and image_storage.recently_used(name):
+        return False
+    delete(image_file(name))
+    return True
+
+
+def release_image(name):
+    """Снимает ссылку на файл name после фиксации текущей транзакции.
+
+    Файлы со старыми именами (до перехода на имена по содержимому)
+    не трогаются: их переименовывает команда dedupe_media.
+    """
+    if name and is_content_name(name):
+        transaction.on_commit(lambda: delete_unreferenced(name))
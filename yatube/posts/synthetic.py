@@ -0,0 +1,259 @@
+"""Синтетические данные для проверки производительности на объёме.
+
+Все значения выбираются из random.Random(seed), поэтому одинаковые
+параметры дают одинаковый набор строк. Распределения близки к живому
+сообществу: число записей у авторов, комментариев у записей и
+подписчиков у пользователей подчиняется степенному закону (немногие
+авторы пишут и читаются больше всех остальных вместе взятых).
+
+Строки вставляются пачками многострочных INSERT с заранее выбранными
+id (posts.importer.insert_rows), без сигналов; поисковый индекс,
+счётчики и ленты перестраиваются один раз в конце.
+"""
+
+import datetime
+import io
+import itertools
+import random
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Max
+from PIL import Image
+
+from .importer import BATCH_SIZE, insert_rows, rebuild_derived
+from .models import Comment, Follow, Group, Post
+from .search import drop_index, install_index
+from .storage import image_storage
+from .uploads import dominant_color
+
+User = get_user_model()
+
+# даты отсчитываются назад от постоянного момента, а не от текущего,
+# чтобы набор не зависел от дня запуска
+END = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+IMAGE_SIZES = ((960, 640), (640, 960), (800, 800))
+WORDS = (
+    'день утро вечер город дорога дом письмо книга дневник мысль '
+    'работа друг море лес река поле небо снег дождь солнце '
+    'сегодня вчера снова долго тихо рано поздно вместе опять '
+    'пишу читаю думаю помню вижу жду иду еду слушаю люблю '
+    'новый старый тёплый холодный долгий короткий светлый тёмный'
+).split()
+
+
+def power_law_weights(count, exponent):
+    """Накопленные веса Ципфа для count элементов в случайном порядке."""
+    return list(itertools.accumulate(
+        1 / (rank + 1) ** exponent for rank in range(count)
+    ))
+
+
+class DatasetGenerator:
+    """Генерирует пользователей, группы, записи, комментарии и подписки.
+
+    Число вставленных строк по моделям — в inserted.
+    """
+
+    def __init__(self, users, groups, posts, comments, follows,
+                 images=0.0, seed=0, prefix='user', password='password',
+                 days=365, exponent=1.0, batch_size=BATCH_SIZE,
+                 using=DEFAULT_DB_ALIAS):
+        self.users = users
+        self.groups = groups
+        self.posts = posts
+        self.comments = comments
+        self.follows = follows
+        self.images = images
+        self.prefix = prefix
+        self.password = password
+        self.days = days
+        self.exponent = exponent
+        self.batch_size = batch_size
+        self.using = using
+        self.random = random.Random(seed)
+        self.inserted = Counter()
+
+    def first_id(self, model):
+        manager = model._base_manager.db_manager(self.using)
+        return (manager.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def run(self):
+        with transaction.atomic(using=self.using):
+            connection = connections[self.using]
+            drop_index(connection)
+            user_ids = self.create_users()
+            group_ids = self.create_groups()
+            post_dates = self.create_posts(user_ids, group_ids)
+            self.create_comments(user_ids, post_dates)
+            self.create_follows(user_ids)
+            install_index(connection)
+        # новые пользователи ещё нигде не закэшированы
+        rebuild_derived([], self.using)
+
+    def insert(self, model, rows):
+        """Вставляет объекты из rows пачками по batch_size."""
+        rows = iter(rows)
+        while True:
+            batch = list(itertools.islice(rows, self.batch_size))
+            if not batch:
+                return
+            insert_rows(
+                model, batch, self.using, ignore_conflicts=model is Follow
+            )
+            self.inserted[model._meta.label_lower] += len(batch)
+
+    def text(self, low, high):
+        words = self.random.choices(WORDS, k=self.random.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def create_users(self):
+        first = self.first_id(User)
+        ids = range(first, first + self.users)
+        # хэш пароля считается один раз: он общий для всех
+        password = make_password(self.password)
+        joined = END - datetime.timedelta(days=self.days)
+        self.insert(User, (
+            User(
+                pk=pk, username=f'{self.prefix}{pk}', password=password,
+                first_name=self.random.choice(WORDS).capitalize(),
+                date_joined=joined, is_active=True
+            )
+            for pk in ids
+        ))
+        return ids
+
+    def create_groups(self):
+        first = self.first_id(Group)
+        ids = range(first, first + self.groups)
+        self.insert(Group, (
+            Group(
+                pk=pk, title=f'Группа {pk}', slug=f'{self.prefix}-group-{pk}',
+                description=self.text(5, 20)
+            )
+            for pk in ids
+        ))
+        return ids
+
+    def image_pool(self):
+        """Несколько картинок: записи с картинками ссылаются на них.
+
+        Хранилище называет файлы по содержимому, поэтому повторный
+        запуск с тем же seed не пишет файлы заново.
+        """
+        pool = []
+        for number in range(min(self.posts, 16)):
+            width, height = self.random.choice(IMAGE_SIZES)
+            color = tuple(self.random.randrange(256) for _ in range(3))
+            image = Image.new('RGB', (width, height), color)
+            content = io.BytesIO()
+            image.save(content, 'JPEG', quality=80)
+            name = image_storage.save(
+                f'posts/synthetic-{number}.jpg',
+                ContentFile(content.getvalue())
+            )
+            pool.append((name, width, height, dominant_color(image)))
+        return pool
+
+    def create_posts(self, user_ids, group_ids):
+        """Создаёт записи; возвращает {id записи: дата публикации}."""
+        first = self.first_id(Post)
+        ids = range(first, first + self.posts)
+        authors = list(user_ids)
+        dates = {}
+        if not authors:
+            return dates
+        pool = self.image_pool() if self.images and self.posts else []
+        self.random.shuffle(authors)
+        weights = power_law_weights(len(authors), self.exponent)
+        # id растут вместе с датой, как у записей, созданных по очереди.
+        # Отсортированные равномерные моменты — тот же пуассоновский
+        # поток, что и экспоненциальные промежутки, но без выхода за
+        # начало интервала; выборка без повторов даёт различные даты,
+        # и порядок страниц не зависит от того, как SQLite разрешит
+        # равенство pub_date.
+        span = self.days * 24 * 60 * 60 * 10 ** 6
+        offsets = iter(sorted(
+            self.random.sample(range(1, span + 1), self.posts), reverse=True
+        ))
+
+        def post(pk):
+            pub_date = END - datetime.timedelta(microseconds=next(offsets))
+            dates[pk] = pub_date
+            values = {}
+            if pool and self.random.random() < self.images:
+                name, width, height, placeholder = self.random.choice(pool)
+                values = {
+                    'image': name, 'image_width': width,
+                    'image_height': height, 'image_placeholder': placeholder,
+                }
+            group_id = None
+            if group_ids and self.random.random() < 0.7:
+                group_id = self.random.choice(group_ids)
+            return Post(
+                pk=pk, text=self.text(10, 120), pub_date=pub_date,
+                updated=pub_date, group_id=group_id,
+                author_id=self.random.choices(authors, cum_weights=weights)[0],
+                **values
+            )
+
+        self.insert(Post, map(post, ids))
+        return dates
+
+    def create_comments(self, user_ids, post_dates):
+        """Комментарии к записям; каждый не старше своей записи."""
+        if not user_ids or not post_dates:
+            return
+        posts = list(post_dates)
+        self.random.shuffle(posts)
+        weights = power_law_weights(len(posts), self.exponent)
+        first = self.first_id(Comment)
+
+        def comment(pk):
+            post_id = self.random.choices(posts, cum_weights=weights)[0]
+            pub_date = post_dates[post_id]
+            span = int((END - pub_date).total_seconds())
+            return Comment(
+                pk=pk, text=self.text(3, 30), post_id=post_id,
+                created=pub_date + datetime.timedelta(
+                    seconds=self.random.randint(0, span)
+                ),
+                author_id=self.random.choice(user_ids)
+            )
+
+        self.insert(Comment, map(comment, range(first, first + self.comments)))
+
+    def following(self, user_id, authors, weights):
+        """Авторы, на которых подписан user_id.
+
+        Число подписок распределено по Парето со средним self.follows,
+        авторы выбираются пропорционально популярности.
+        """
+        wanted = min(
+            int(self.random.paretovariate(2.0) * self.follows / 2),
+            len(authors) - 1
+        )
+        chosen = set()
+        for _ in range(wanted * 3):
+            if len(chosen) >= wanted:
+                break
+            author_id = self.random.choices(authors, cum_weights=weights)[0]
+            if author_id != user_id:
+                chosen.add(author_id)
+        return sorted(chosen)
+
+    def create_follows(self, user_ids):
+        if len(user_ids) < 2 or not self.follows:
+            return
+        authors = list(user_ids)
+        self.random.shuffle(authors)
+        weights = power_law_weights(len(authors), self.exponent)
+        pks = itertools.count(self.first_id(Follow))
+        self.insert(Follow, (
+            Follow(pk=next(pks), user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in self.following(user_id, authors, weights)
+        ))
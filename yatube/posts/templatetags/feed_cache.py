@@ -0,0 +1,50 @@
+from django import template
+
+from ..caching import cached_fragment, fragment_key
+
+register = template.Library()
+
+
+class FeedFragmentNode(template.Node):
+    def __init__(self, nodelist, params, name, vary_on):
+        self.nodelist = nodelist
+        self.params = params
+        self.name = name
+        self.vary_on = vary_on
+
+    def render(self, context):
+        params = self.params.resolve(context)
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        key = fragment_key(self.name, *vary_on, params['page'])
+        return cached_fragment(
+            key,
+            lambda: self.nodelist.render(context),
+            params['timeout'],
+            params['generation'],
+        )
+
+
+@register.tag('feed_fragment')
+def do_feed_fragment(parser, token):
+    """Кэширует фрагмент ленты с защитой от лавины пересчётов.
+
+    {% feed_fragment feed_cache index_page [vary_on ...] %}
+        ...
+    {% endfeed_fragment %}
+
+    feed_cache — словарь из posts.caching.fragment_context: срок жизни,
+    поколение лент и позиция страницы.
+    """
+    nodelist = parser.parse(('endfeed_fragment',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires at least 2 arguments."
+        )
+    return FeedFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
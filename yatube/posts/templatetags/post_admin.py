@@ -0,0 +1,19 @@
+import copy
+
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+
+from ..admin import IndexedDates
+
+register = template.Library()
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """{% date_hierarchy cl %}, который находит периоды поиском по индексу.
+
+    {% indexed_date_hierarchy cl %}
+    """
+    cl = copy.copy(cl)
+    cl.queryset = IndexedDates(cl.queryset)
+    return date_hierarchy(cl)
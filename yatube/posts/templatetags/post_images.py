@@ -0,0 +1,41 @@
+from django import template
+
+from ..thumbnails import resolve_thumbnails
+from ..thumbnails import responsive_image as image_variants
+
+register = template.Library()
+
+PREFETCHED = 'prefetched_thumbnails'
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_thumbnails(context, posts, preset):
+    """Находит миниатюры картинок всех записей страницы разом.
+
+    {% prefetch_thumbnails page_obj 'feed' %}
+
+    Следующие за ним {% responsive_image %} с тем же пресетом берут
+    миниатюры отсюда, а не читают кэш sorl по одной.
+    """
+    images = [post.image for post in posts if post.image]
+    prefetched = context.get(PREFETCHED) or {}
+    prefetched[preset] = resolve_thumbnails(images, preset)
+    context[PREFETCHED] = prefetched
+    return ''
+
+
+@register.inclusion_tag('includes/responsive_image.html', takes_context=True)
+def responsive_image(context, image, preset, css_class=''):
+    """Картинка записи с вариантами по ширине и формату.
+
+    {% responsive_image post.image 'feed' css_class='card-img' %}
+    """
+    if not image:
+        return {}
+    thumbnails = (
+        context.get(PREFETCHED, {}).get(preset, {}).get(image.name)
+    )
+    data = image_variants(image, preset, thumbnails)
+    if data is None:
+        return {}
+    return dict(data, css_class=css_class)
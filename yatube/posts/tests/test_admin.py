@@ -0,0 +1,383 @@
+import datetime
+from unittest import mock
+
+from django.contrib.admin.helpers import ACTION_CHECKBOX_NAME
+from django.contrib.auth import get_user_model
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.page_cache import tag_versions
+
+from ..bulk import delete_comments, delete_posts
+from ..caching import POSTS_TAG, feed_generation, post_tag, user_tag
+from ..feeds import author_timeline_key
+from ..models import Comment, Follow, Group, Post, Timeline, UserStats
+from ..paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class AdminChangeListTests(TestCase):
+    """Проверка списков записей и комментариев в админке"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Описание'
+        )
+        dates = [
+            datetime.datetime(2021, 3, 5, 12), datetime.datetime(2021, 3, 9),
+            datetime.datetime(2021, 7, 1), datetime.datetime(2022, 1, 2),
+        ]
+        for number, date in enumerate(dates):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Запись {number}'
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(date)
+            )
+            Comment.objects.create(
+                post=post, author=cls.author, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, 200)
+        return response, [query['sql'] for query in queries]
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """Число запросов списка не зависит от числа строк"""
+        url = reverse('admin:posts_post_changelist')
+        _, before = self.get(url)
+        for number in range(10):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Ещё {number}'
+            )
+            # в уже существующем дне иерархии дат
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(datetime.datetime(2021, 3, 5))
+            )
+        _, after = self.get(url)
+        self.assertEqual(len(before), len(after))
+        _, comments_before = self.get(
+            reverse('admin:posts_comment_changelist')
+        )
+        Comment.objects.bulk_create([
+            Comment(post_id=post_id, author=self.author, text='Ещё')
+            for post_id in Post.objects.values_list('pk', flat=True)
+        ])
+        _, comments_after = self.get(
+            reverse('admin:posts_comment_changelist')
+        )
+        self.assertEqual(len(comments_before), len(comments_after))
+
+    def test_full_count_is_skipped(self):
+        """Список без фильтров не считает все строки"""
+        _, queries = self.get(reverse('admin:posts_post_changelist'))
+        self.assertFalse(
+            [sql for sql in queries if 'COUNT(' in sql.upper()]
+        )
+
+    def test_date_hierarchy_uses_index_lookups(self):
+        """Иерархия дат строится без функции даты по всем строкам"""
+        url = reverse('admin:posts_post_changelist')
+        response, queries = self.get(url)
+        self.assertContains(response, '?pub_date__year=2021')
+        self.assertContains(response, '?pub_date__year=2022')
+        response, queries = self.get(url, {'pub_date__year': 2021})
+        self.assertContains(response, 'pub_date__month=3')
+        self.assertContains(response, 'pub_date__month=7')
+        self.assertNotContains(response, 'pub_date__month=1"')
+        self.assertEqual(response.context['cl'].result_count, 3)
+        response, queries = self.get(
+            url, {'pub_date__year': 2021, 'pub_date__month': 3}
+        )
+        self.assertContains(response, 'pub_date__day=5')
+        self.assertContains(response, 'pub_date__day=9')
+        self.assertFalse(
+            [sql for sql in queries if 'django_datetime_trunc' in sql]
+        )
+
+    def test_group_is_edited_without_select(self):
+        """Группа в строке списка — поле id с подписью, без <select>"""
+        response, _ = self.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, '<select name="form-0-group"')
+        self.assertContains(
+            response, f'name="form-0-group" value="{self.group.pk}"'
+        )
+        self.assertContains(response, self.group.title)
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    """Проверка оценки числа строк"""
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create([
+            Post(author=author, text=f'Запись {number}')
+            for number in range(15)
+        ])
+
+    def test_table_count_is_estimated(self):
+        """Без условий число строк берётся из статистики или по id"""
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(
+            paginator.count, Post.objects.order_by('-pk').first().pk
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        paginator = EstimatedCountPaginator(Post.objects.all(), 10)
+        self.assertEqual(paginator.count, 15)
+
+    def test_filtered_count_is_capped(self):
+        """С условиями строки считаются не дальше предела"""
+        queryset = Post.objects.filter(text__startswith='Запись')
+        self.assertEqual(EstimatedCountPaginator(queryset, 10).count, 15)
+        paginator = EstimatedCountPaginator(queryset, 10)
+        paginator.COUNT_LIMIT = 12
+        self.assertEqual(paginator.count, 12)
+
+
+class AdminBulkActionsTests(TestCase):
+    """Проверка массовых действий над записями и комментариями"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Описание'
+        )
+        cls.target = Group.objects.create(
+            title='Кулинария', slug='food', description='Описание'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.admin)
+        self.posts = [
+            Post.objects.create(
+                author=author, group=self.group, text=f'Запись {number}'
+            )
+            for number, author in enumerate(
+                [self.author, self.author, self.other]
+            )
+        ]
+        for post in self.posts:
+            for number in range(2):
+                Comment.objects.create(
+                    post=post, author=self.other, text=f'Ответ {number}'
+                )
+
+    def run_action(self, model, action, pks, **data):
+        url = reverse(f'admin:posts_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {
+                'action': action, ACTION_CHECKBOX_NAME: pks, **data
+            })
+        self.assertIn(response.status_code, (200, 302))
+        return response, [query['sql'] for query in queries]
+
+    def message(self, response):
+        return ' '.join(
+            str(message) for message in get_messages(response.wsgi_request)
+        )
+
+    def test_set_group_asks_for_group(self):
+        """Перенос в группу сначала показывает форму выбора группы"""
+        response, _ = self.run_action(
+            'post', 'set_group', [self.posts[0].pk], index=0
+        )
+        self.assertTemplateUsed(response, 'admin/posts/bulk_action.html')
+        self.assertContains(response, 'name="group"')
+        self.assertEqual(
+            Post.objects.filter(group=self.group).count(), 3
+        )
+
+    def test_set_and_clear_group(self):
+        """Группа меняется одним UPDATE и число строк выводится"""
+        pks = [post.pk for post in self.posts[:2]]
+        response, queries = self.run_action(
+            'post', 'set_group', pks, apply='1', group=self.target.pk
+        )
+        self.assertIn('записей: 2', self.message(response))
+        self.assertEqual(
+            set(Post.objects.filter(group=self.target).values_list(
+                'pk', flat=True
+            )),
+            set(pks)
+        )
+        updates = [
+            sql for sql in queries if sql.startswith('UPDATE "posts_post"')
+        ]
+        self.assertEqual(len(updates), 1)
+        response, _ = self.run_action(
+            'post', 'clear_group', pks + [self.posts[2].pk], index=0
+        )
+        self.assertIn('Группа убрана у записей: 3', self.message(response))
+        self.assertFalse(Post.objects.filter(group__isnull=False).exists())
+
+    def test_purge_posts(self):
+        """Записи удаляются вместе с комментариями, счётчики уменьшаются"""
+        pks = [post.pk for post in self.posts[:2]]
+        response, _ = self.run_action('post', 'purge_posts', pks, index=0)
+        self.assertTemplateUsed(response, 'admin/posts/bulk_action.html')
+        self.assertEqual(Post.objects.count(), 3)
+        response, queries = self.run_action(
+            'post', 'purge_posts', pks, apply='1'
+        )
+        self.assertIn(
+            'Удалено записей: 2, комментариев: 4', self.message(response)
+        )
+        self.assertEqual(
+            list(Post.objects.values_list('pk', flat=True)),
+            [self.posts[2].pk]
+        )
+        self.assertEqual(Comment.objects.count(), 2)
+        stats = dict(UserStats.objects.values_list('user', 'posts_count'))
+        self.assertEqual(stats[self.author.pk], 0)
+        self.assertEqual(stats[self.other.pk], 1)
+        selects = [
+            sql for sql in queries
+            if sql.startswith('SELECT') and 'posts_post"."text' in sql
+        ]
+        self.assertFalse(selects)
+
+    def test_purge_selected_across_filters(self):
+        """«Выбрать все» удаляет все строки под фильтрами списка"""
+        response, _ = self.run_action(
+            'post', 'purge_posts', [self.posts[0].pk],
+            apply='1', select_across='1'
+        )
+        self.assertIn('Удалено записей: 3', self.message(response))
+        self.assertFalse(Post.objects.exists())
+
+    def test_purge_comments(self):
+        """Комментарии удаляются, счётчики записей уменьшаются"""
+        post = self.posts[0]
+        pks = list(post.comments.values_list('pk', flat=True))
+        pks.append(self.posts[1].comments.first().pk)
+        response, _ = self.run_action(
+            'comment', 'purge_comments', pks, apply='1'
+        )
+        self.assertIn('Удалено комментариев: 3', self.message(response))
+        counts = dict(Post.objects.values_list('pk', 'comments_count'))
+        self.assertEqual(counts[post.pk], 0)
+        self.assertEqual(counts[self.posts[1].pk], 1)
+        self.assertEqual(counts[self.posts[2].pk], 2)
+
+    def test_delete_selected_is_disabled(self):
+        """Штатное удаление по одному объекту недоступно"""
+        response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertNotContains(response, 'value="delete_selected"')
+        self.assertContains(response, 'value="purge_posts"')
+
+
+class BulkDeleteSideEffectsTests(TestCase):
+    """Массовое удаление повторяет всё, что делает штатный delete()"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(2)
+        ]
+        cls.reader = User.objects.create_user(username='reader')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+        cls.posts = [
+            Post.objects.create(author=author, text=f'Запись {number}')
+            for number, author in enumerate(cls.authors * 2)
+        ]
+        for post in cls.posts[:3]:
+            Post.objects.filter(pk=post.pk).update(
+                image=f'posts/{post.pk}.gif'
+            )
+            for number in range(2):
+                Comment.objects.create(
+                    post=post, author=cls.reader, text=f'Ответ {number}'
+                )
+
+    def state(self):
+        return {
+            'posts_count': dict(
+                UserStats.objects.values_list('user', 'posts_count')
+            ),
+            'comments_count': dict(
+                Post.objects.values_list('pk', 'comments_count')
+            ),
+            'comments': set(Comment.objects.values_list('pk', flat=True)),
+            'timeline': set(Timeline.objects.values_list('user', 'post')),
+        }
+
+    def effects(self, delete):
+        """Состояние базы и кэша после delete() в откатываемой транзакции."""
+        cache.clear()
+        keys = [author_timeline_key(author.pk) for author in self.authors]
+        cache.set_many(dict.fromkeys(keys, []))
+        tags = [
+            POSTS_TAG, *[post_tag(post.pk) for post in self.posts],
+            *[user_tag(author.pk) for author in self.authors],
+        ]
+        versions = tag_versions(tags)
+        generation = feed_generation()
+        with mock.patch('posts.signals.release_image') as by_signals, \
+                mock.patch('posts.bulk.release_image') as by_bulk, \
+                transaction.atomic():
+            delete()
+            result = self.state()
+            transaction.set_rollback(True)
+        calls = by_signals.call_args_list + by_bulk.call_args_list
+        changed = tag_versions(tags)
+        result.update(
+            released=sorted(filter(None, (call[0][0] for call in calls))),
+            invalidated={tag for tag in tags if changed[tag] != versions[tag]},
+            cached_timelines=set(cache.get_many(keys)),
+            feed_generation_bumped=feed_generation() != generation,
+        )
+        return result
+
+    def test_related_models_are_handled(self):
+        """На записи и комментарии ссылаются только модели, которые
+        удаляет posts.bulk; новая ссылка требует правки posts.bulk"""
+        self.assertEqual(
+            {rel.related_model for rel in Post._meta.related_objects},
+            {Comment, Timeline}
+        )
+        self.assertEqual(Comment._meta.related_objects, ())
+
+    def test_delete_posts(self):
+        """Записи с комментариями, лентами и картинками"""
+        pks = [post.pk for post in self.posts[1:]]
+        posts = Post.objects.filter(pk__in=pks)
+        self.assertEqual(
+            self.effects(lambda: delete_posts(posts)),
+            self.effects(lambda: posts.delete())
+        )
+
+    def test_delete_comments(self):
+        """Комментарии разных записей"""
+        comments = Comment.objects.exclude(post=self.posts[0])
+        pks = list(comments.values_list('pk', flat=True))[1:]
+        comments = Comment.objects.filter(pk__in=pks)
+        self.assertEqual(
+            self.effects(lambda: delete_comments(comments)),
+            self.effects(lambda: comments.delete())
+        )
@@ -0,0 +1,102 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..benchmarks import (VIEWS, compare, load_baseline, percentile,
+                          run_dataset, save_baseline)
+from ..models import Post
+
+TINY = {'users': 10, 'groups': 2, 'posts': 30, 'comments': 20,
+        'follows': 3}
+METRICS = {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4, 'bytes': 1000}
+
+
+def metrics(**values):
+    return {**METRICS, **values}
+
+
+class CompareTests(TestCase):
+    """Проверка поиска регрессий"""
+
+    def test_percentile(self):
+        """Перцентиль по ближайшему рангу"""
+        values = [5, 1, 4, 2, 3]
+        self.assertEqual(percentile(values, 50), 3)
+        self.assertEqual(percentile(values, 95), 5)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_thresholds(self):
+        """Время и размер сравниваются с допуском, запросы — строго"""
+        baseline = {'small': {'index': metrics()}}
+        cases = (
+            (metrics(p50_ms=12.4, bytes=1100), []),
+            (metrics(p50_ms=12.6), ['p50_ms']),
+            (metrics(queries=5), ['queries']),
+            (metrics(bytes=1101), ['bytes']),
+            (metrics(p50_ms=2.0, p95_ms=2.9), []),
+        )
+        for current, expected in cases:
+            with self.subTest(current=current):
+                regressions = compare({'small': {'index': current}}, baseline)
+                self.assertEqual(
+                    [item.metric for item in regressions], expected
+                )
+
+    def test_time_noise_is_ignored(self):
+        """Рост меньше миллисекунды не считается регрессией"""
+        baseline = {'small': {'index': metrics(p50_ms=1.0, p95_ms=1.0)}}
+        results = {'small': {'index': metrics(p50_ms=1.9, p95_ms=2.1)}}
+        self.assertEqual(
+            [item.metric for item in compare(results, baseline)], ['p95_ms']
+        )
+
+    def test_missing_views_are_skipped(self):
+        """Страницы без сохранённых результатов не сравниваются"""
+        results = {'small': {'index': metrics()}, 'large': {}}
+        self.assertEqual(compare(results, {'small': {}}), [])
+
+
+class RunDatasetTests(TestCase):
+    """Проверка замеров на маленьком наборе"""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'baseline.json')
+
+    def test_all_views_are_measured_and_rolled_back(self):
+        """Все страницы замерены, данные набора не остаются в базе"""
+        results = run_dataset(TINY, repeat=2)
+        self.assertEqual(list(results), list(VIEWS))
+        for view, values in results.items():
+            self.assertGreater(values['queries'], 0, view)
+            self.assertLessEqual(values['p50_ms'], values['p95_ms'], view)
+        self.assertGreater(results['post_detail']['bytes'], 0)
+        self.assertEqual(results['post_create']['bytes'], 0)
+        self.assertFalse(Post.objects.exists())
+
+    def test_command_updates_and_checks_baseline(self):
+        """Команда записывает результаты и падает при регрессии"""
+        out = StringIO()
+        options = {
+            'datasets': ['small'], 'views': ['index'], 'repeat': 1,
+            'baseline': self.path, 'stdout': out,
+        }
+        datasets = {'small': TINY}
+        with mock.patch('posts.management.commands.benchmark_views.DATASETS',
+                        datasets):
+            call_command('benchmark_views', update_baseline=True, **options)
+            results, sizes = load_baseline(self.path)
+            self.assertEqual(sizes, datasets)
+            self.assertIn('index', results['small'])
+            results['small']['index']['queries'] = 0
+            save_baseline(self.path, results, sizes)
+            with self.assertRaises(CommandError):
+                call_command('benchmark_views', **options)
+        self.assertIn('index: queries 0 ->', out.getvalue())
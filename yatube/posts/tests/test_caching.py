@@ -0,0 +1,151 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..caching import cached_fragment, feed_generation
+from ..models import Group, Post
+
+User = get_user_model()
+
+NUM_OF_POSTS = 13
+
+
+class FeedFragmentCacheTests(TestCase):
+    """Проверка кэша фрагментов лент"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.author, group=cls.group, text=f'Пост номер {i}')
+            for i in range(NUM_OF_POSTS)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+
+    def test_pages_are_cached_separately(self):
+        """Разные страницы ленты не делят одну запись кэша"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                second = self.client.get(url, {'page': 2})
+                cursor = self.client.get(
+                    url, {'after': first.context['page_obj'].next_cursor}
+                )
+                self.assertContains(second, 'Пост номер 0')
+                self.assertNotContains(first, 'Пост номер 0<')
+                self.assertEqual(
+                    second.context['page_obj'][0],
+                    cursor.context['page_obj'][0]
+                )
+                self.assertContains(cursor, 'Пост номер 0')
+
+    def test_writes_invalidate_fragments(self):
+        """Сохранение записи или группы сразу обновляет ленты"""
+        for url in self.urls:
+            self.client.get(url)
+        generation = feed_generation()
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Свежая запись'
+        )
+        self.assertGreater(feed_generation(), generation)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежая запись')
+        generation = feed_generation()
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assertGreater(feed_generation(), generation)
+        post.delete()
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.client.get(url), 'Свежая запись')
+
+
+class StampedeProtectionTests(TestCase):
+    """Проверка защиты фрагментов от лавины пересчётов"""
+
+    key = 'posts:fragment:test'
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        return f'значение {self.calls}'
+
+    def store(self, expires_in, delta=0.01, generation=1):
+        entry = ('старое', time.time() + expires_in, delta, generation)
+        cache.set(self.key, entry)
+
+    def test_fresh_value_is_not_recomputed(self):
+        """Свежее значение отдаётся без пересчёта"""
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+        )
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+        )
+        self.assertEqual(self.calls, 1)
+
+    def test_stale_value_is_served_while_locked(self):
+        """Пока другой запрос пересчитывает, отдаётся прежнее значение"""
+        self.store(expires_in=60, generation=1)
+        cache.add(f'{self.key}:lock', 1)
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 2), 'старое'
+        )
+        self.store(expires_in=-1)
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'старое'
+        )
+        self.assertEqual(self.calls, 0)
+
+    def test_lock_owner_recomputes_and_releases_lock(self):
+        """Владелец блокировки пересчитывает значение и снимает её"""
+        self.store(expires_in=-1)
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+        )
+        self.assertIsNone(cache.get(f'{self.key}:lock'))
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+        )
+
+    def test_early_recompute_near_expiry(self):
+        """Долгий пересчёт незадолго до срока запускается заранее"""
+        self.store(expires_in=5, delta=10)
+        with mock.patch('posts.caching.random.random', return_value=0.99):
+            self.assertEqual(
+                cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+            )
+        self.store(expires_in=5, delta=10)
+        with mock.patch('posts.caching.random.random', return_value=0.0):
+            self.assertEqual(
+                cached_fragment(self.key, self.compute, 60, 1), 'старое'
+            )
+
+    @mock.patch('posts.caching.LOCK_WAIT', 0.1)
+    def test_missing_value_waits_for_lock_owner(self):
+        """Без значения запрос ждёт владельца блокировки, затем считает"""
+        cache.add(f'{self.key}:lock', 1)
+        self.assertEqual(
+            cached_fragment(self.key, self.compute, 60, 1), 'значение 1'
+        )
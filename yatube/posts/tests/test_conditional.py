@@ -0,0 +1,163 @@
+import datetime
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalGetTests(TestCase):
+    """Проверка ответов 304 по ETag и Last-Modified"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.index_url = reverse('posts:index')
+        self.profile_url = reverse(
+            'posts:profile', kwargs={'username': self.author}
+        )
+        self.detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+
+    def revalidate(self, url, response, client=None):
+        client = client or self.guest_client
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_answer_not_modified(self):
+        """Повторный запрос с ETag получает 304 без основных запросов"""
+        urls = {
+            self.index_url: 0,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 0,
+            self.profile_url: 1,
+            self.detail_url: 1,
+        }
+        for url, queries in urls.items():
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('ETag', response)
+                with self.assertNumQueries(queries):
+                    again = self.revalidate(url, response)
+                self.assertEqual(again.status_code, 304)
+                self.assertEqual(again.content, b'')
+
+    def test_new_post_changes_feed_etag(self):
+        """Новая запись меняет ETag ленты"""
+        response = self.guest_client.get(self.index_url)
+        Post.objects.create(author=self.reader, text='Новая запись')
+        again = self.revalidate(self.index_url, response)
+        self.assertEqual(again.status_code, 200)
+        self.assertContains(again, 'Новая запись')
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag страницы автора"""
+        response = self.guest_client.get(self.profile_url)
+        Follow.objects.create(user=self.reader, author=self.author)
+        again = self.revalidate(self.profile_url, response)
+        self.assertEqual(again.status_code, 200)
+
+    def test_post_detail_validators(self):
+        """Страница записи учитывает изменение записи и комментарии"""
+        response = self.guest_client.get(self.detail_url)
+        self.assertIn('Last-Modified', response)
+        again = self.guest_client.get(
+            self.detail_url,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(again.status_code, 304)
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        again = self.revalidate(self.detail_url, response)
+        self.assertContains(again, 'Комментарий')
+
+    def stale_validators(self):
+        """Ответ, снятый час назад: записи и метки тегов старше часа."""
+        cache.clear()
+        hour_ago = timezone.now() - datetime.timedelta(hours=1)
+        with mock.patch(
+            'core.page_cache.time.time', return_value=hour_ago.timestamp()
+        ):
+            Post.objects.filter(pk=self.post.pk).update(updated=hour_ago)
+            comment = Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )
+            Comment.objects.filter(pk=comment.pk).update(created=hour_ago)
+            response = self.guest_client.get(self.detail_url)
+        return response, comment
+
+    def revalidate_by_date(self, response):
+        return self.guest_client.get(
+            self.detail_url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+
+    def test_last_modified_of_unchanged_post(self):
+        """Без изменений If-Modified-Since получает 304"""
+        response, _ = self.stale_validators()
+        self.assertEqual(self.revalidate_by_date(response).status_code, 304)
+
+    def test_deleted_comment_moves_last_modified_forward(self):
+        """Удаление последнего комментария не даёт ложного 304"""
+        response, comment = self.stale_validators()
+        comment.delete()
+        again = self.revalidate_by_date(response)
+        self.assertEqual(again.status_code, 200)
+        self.assertNotContains(again, 'Комментарий')
+
+    def test_renames_move_last_modified_forward(self):
+        """Новое имя автора или комментатора не даёт ложного 304"""
+        for user, name in ((self.author, 'author2'), (self.reader, 'reader2')):
+            with self.subTest(user=user.username):
+                response, _ = self.stale_validators()
+                user = User.objects.get(pk=user.pk)
+                user.username = name
+                user.save()
+                self.assertContains(self.revalidate_by_date(response), name)
+                self.assertContains(self.revalidate(self.detail_url, response),
+                                    name)
+
+    def test_etag_depends_on_user(self):
+        """ETag гостя не подходит авторизованному пользователю"""
+        response = self.guest_client.get(self.index_url)
+        again = self.revalidate(self.index_url, response, self.reader_client)
+        self.assertEqual(again.status_code, 200)
+
+    def test_missing_objects_are_not_found(self):
+        """Без объекта валидаторы не мешают ответу 404"""
+        urls = (
+            reverse('posts:profile', kwargs={'username': 'nobody'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(PAGE_CACHE_ENABLED=True)
+    def test_page_cache_answers_not_modified(self):
+        """Кэш полных страниц сохраняет валидаторы и отвечает 304"""
+        response = self.guest_client.get(self.detail_url)
+        again = self.revalidate(self.detail_url, response)
+        self.assertEqual(again['X-Page-Cache'], 'HIT')
+        self.assertEqual(again.status_code, 304)
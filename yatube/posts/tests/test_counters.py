@@ -0,0 +1,85 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CounterTests(TestCase):
+    """Проверка денормализованных счётчиков"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        self.assertEqual(post.comments_count, 1)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+        post.delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_reconcile_repairs_drift(self):
+        """reconcile_counters исправляет счётчики после массовой вставки"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(5)
+        ])
+        post = Post.objects.first()
+        Comment.objects.bulk_create([
+            Comment(post=post, author=self.reader, text='Комментарий')
+        ])
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('reconcile_counters', chunk_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(self.stats(self.author).posts_count, 5)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+        self.assertEqual(post.comments_count, 1)
+
+    def test_decrement_does_not_go_below_zero(self):
+        """Уменьшение счётчика, ушедшего в расхождение, не ломает запись"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост без сигнала')
+        ])
+        Post.objects.get(text='Пост без сигнала').delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_pages_do_not_count(self):
+        """Профиль и страница записи не выполняют COUNT"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        urls = (
+            reverse('posts:profile', kwargs={'username': self.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertContains(response, 'Всего постов')
+                for query in queries:
+                    self.assertNotIn('COUNT(', query['sql'])
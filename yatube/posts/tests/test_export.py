@@ -0,0 +1,170 @@
+import csv
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def export(*args, **options):
+    out = StringIO()
+    call_command('export_data', *args, stdout=out, stderr=StringIO(),
+                 **options)
+    return out.getvalue()
+
+
+class ExportDataTests(TestCase):
+    """Проверка потоковой выгрузки данных"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Путешествия', slug='travel', description='Описание'
+        )
+        cls.posts = []
+        for day in (1, 2, 3):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group,
+                text=f'Запись, "день" {day}\nвторая строка'
+            )
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=timezone.make_aware(datetime.datetime(2022, 5, day))
+            )
+            cls.posts.append(post)
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='Комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def test_ndjson(self):
+        """NDJSON: одна строка JSON на запись, по возрастанию id"""
+        rows = [json.loads(line) for line in export('posts').splitlines()]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts]
+        )
+        self.assertEqual(rows[0]['text'], self.posts[0].text)
+        self.assertEqual(rows[0]['group_id'], self.group.pk)
+        self.assertTrue(rows[0]['pub_date'].startswith('2022-05-01'))
+        follows = [json.loads(line) for line in export('follows').splitlines()]
+        self.assertEqual(
+            follows[0],
+            {'id': follows[0]['id'], 'user_id': self.reader.pk,
+             'author_id': self.author.pk}
+        )
+
+    def test_csv(self):
+        """CSV: заголовок и строки с экранированием кавычек и переводов"""
+        rows = list(csv.reader(StringIO(export('posts', format='csv'))))
+        self.assertEqual(
+            rows[0],
+            ['id', 'author_id', 'group_id', 'text', 'pub_date', 'image']
+        )
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][3], self.posts[0].text)
+
+    def test_date_range_and_after(self):
+        """Отбор по датам включительно и продолжение после id"""
+        output = export(
+            'posts', since=datetime.date(2022, 5, 2),
+            until=datetime.date(2022, 5, 3)
+        )
+        ids = [json.loads(line)['id'] for line in output.splitlines()]
+        self.assertEqual(ids, [self.posts[1].pk, self.posts[2].pk])
+        output = export('posts', after_id=self.posts[1].pk)
+        ids = [json.loads(line)['id'] for line in output.splitlines()]
+        self.assertEqual(ids, [self.posts[2].pk])
+        with self.assertRaises(CommandError):
+            export('groups', since=datetime.date(2022, 5, 2))
+
+    def test_resume_drops_broken_line(self):
+        """--resume дописывает файл после последней целой строки"""
+        for fmt in ('ndjson', 'csv'):
+            path = os.path.join(self.directory, f'posts.{fmt}')
+            export('posts', format=fmt, output=path)
+            with open(path, encoding='utf-8') as file:
+                complete = file.read()
+            with open(path, 'w', encoding='utf-8') as file:
+                # остановка посреди третьей записи
+                file.write(complete[:complete.rindex('вторая')])
+            export('posts', format=fmt, output=path, resume=True)
+            with open(path, encoding='utf-8') as file:
+                self.assertEqual(file.read(), complete)
+
+    def test_resume_after_cut_inside_character(self):
+        """Обрыв посреди многобайтного символа не мешает продолжению"""
+        for fmt in ('ndjson', 'csv'):
+            path = os.path.join(self.directory, f'posts.{fmt}')
+            export('posts', format=fmt, output=path)
+            with open(path, 'rb') as file:
+                complete = file.read()
+            cut = complete.rindex('вторая'.encode('utf-8')) + 1
+            with open(path, 'wb') as file:
+                file.write(complete[:cut])
+            export('posts', format=fmt, output=path, resume=True)
+            with open(path, 'rb') as file:
+                self.assertEqual(file.read(), complete)
+
+
+class ExportViewTests(TestCase):
+    """Проверка выгрузки через страницу для персонала"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.staff = User.objects.create_user(username='staff', is_staff=True)
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Запись {number}')
+            for number in range(5)
+        ])
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_staff_only(self):
+        """Выгрузка недоступна обычным пользователям"""
+        self.client.force_login(self.user)
+        url = reverse('posts:export', kwargs={'table': 'posts'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(getattr(response, 'streaming', False))
+
+    def test_streaming_response(self):
+        """Строки отдаются потоком, параметры берутся из запроса"""
+        self.client.force_login(self.staff)
+        first = Post.objects.order_by('pk').first()
+        response = self.client.get(
+            reverse('posts:export', kwargs={'table': 'posts'}),
+            {'format': 'csv', 'after': first.pk}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('posts.csv', response['Content-Disposition'])
+        content = b''.join(response.streaming_content).decode()
+        self.assertEqual(len(content.splitlines()), 5)
+        response = self.client.get(
+            reverse('posts:export', kwargs={'table': 'follows'}),
+            {'since': '2022-01-01'}
+        )
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse('posts:export', kwargs={'table': 'users'})
+        )
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,192 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..feeds import AUTHOR_TIMELINE_LENGTH, author_timeline_key
+from ..models import Follow, Post, Timeline
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    """Проверка материализованной ленты подписок"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+
+    def setUp(self):
+        self.user_client = Client()
+        self.user_client.force_login(TimelineTests.user)
+        self.author_client = Client()
+        self.author_client.force_login(TimelineTests.author)
+
+    def feed(self):
+        response = self.user_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает её"""
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        self.user_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.feed(), [old_post])
+        self.user_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        self.assertFalse(Timeline.objects.filter(user=self.user).exists())
+        self.assertEqual(self.feed(), [])
+
+    def test_follow_cost_does_not_depend_on_posts(self):
+        """Подписка на автора с тысячами записей укладывается в бюджет"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(1600)
+        ])
+        Timeline.objects.create(
+            user=self.user, post=Post.objects.first(),
+            pub_date=Post.objects.first().pub_date
+        )
+        with override_settings(QUERY_BUDGET_RAISE=True):
+            self.user_client.get(reverse(
+                'posts:profile_follow', kwargs={'username': self.author}
+            ))
+        self.assertEqual(Timeline.objects.filter(user=self.user).count(), 1600)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Запись, созданная через post_create, попадает в ленты подписчиков"""
+        Follow.objects.create(user=self.user, author=self.author)
+        self.author_client.post(
+            reverse('posts:post_create'), {'text': 'Новая запись'}
+        )
+        post = Post.objects.get(text='Новая запись')
+        self.assertTrue(
+            Timeline.objects.filter(user=self.user, post=post).exists()
+        )
+        self.assertFalse(Timeline.objects.filter(user=self.other).exists())
+        self.assertEqual(self.feed(), [post])
+
+    def test_feed_reads_only_timeline(self):
+        """Страница ленты не обращается к таблице подписок"""
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        ])
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(Timeline.objects.filter(user=self.user).count(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.feed()), 3)
+        feed_queries = [
+            query['sql'] for query in queries
+            if 'posts_timeline' in query['sql']
+        ]
+        self.assertEqual(len(feed_queries), 1)
+        self.assertNotIn('posts_follow', feed_queries[0])
+
+
+@override_settings(FOLLOW_FEED_ENGINE='merge')
+class MergedFeedTests(TestCase):
+    """Проверка ленты, собранной слиянием кэшированных лент авторов"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(3)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.user_client = Client()
+        self.user_client.force_login(MergedFeedTests.user)
+        for i in range(12):
+            Post.objects.create(
+                author=self.authors[i % len(self.authors)], text=f'Пост {i}'
+            )
+        Post.objects.create(author=self.stranger, text='Чужой пост')
+
+    def get_page(self, **params):
+        response = self.user_client.get(
+            reverse('posts:follow_index'), params
+        )
+        return response.context['page_obj']
+
+    def test_merge_keeps_feed_order(self):
+        """Слияние отдаёт записи подписок в порядке публикации"""
+        expected = list(Post.objects.filter(
+            author__in=self.authors
+        ).order_by('-pub_date', '-pk'))
+        first = self.get_page()
+        second = self.get_page(after=first.next_cursor)
+        self.assertEqual(list(first) + list(second), expected)
+        back = self.get_page(before=second.previous_cursor)
+        self.assertEqual(list(back), expected[:10])
+        self.assertEqual(list(self.get_page(page=2)), expected[10:])
+
+    def test_deep_pages_past_cached_author_timelines(self):
+        """Записи старше кэшированных списков авторов не теряются"""
+        Post.objects.bulk_create(
+            Post(author=self.authors[0], text=f'Поток {i}')
+            for i in range(AUTHOR_TIMELINE_LENGTH + 50)
+        )
+        expected = list(Post.objects.filter(
+            author__in=self.authors
+        ).order_by('-pub_date', '-pk'))
+        walked, page = [], self.get_page()
+        while True:
+            walked += page
+            if page.next_cursor is None:
+                break
+            page = self.get_page(after=page.next_cursor)
+        self.assertEqual(walked, expected)
+        back = self.get_page(before=page.previous_cursor)
+        first = expected.index(page[0])
+        self.assertEqual(list(back), expected[first - 10:first])
+        last = self.get_page(page=len(expected) // 10 + 1)
+        self.assertEqual(last.paginator.count, len(expected))
+        self.assertEqual(list(last), expected[-(len(expected) % 10):])
+
+    def test_signals_reset_cached_author_timelines(self):
+        """Создание и удаление записи сбрасывают список автора в кэше"""
+        self.get_page()
+        author = self.authors[0]
+        self.assertIsNotNone(cache.get(author_timeline_key(author.pk)))
+        post = Post.objects.create(author=author, text='Свежий пост')
+        self.assertIsNone(cache.get(author_timeline_key(author.pk)))
+        self.assertEqual(self.get_page()[0], post)
+        post.delete()
+        self.assertNotIn(post, self.get_page())
+
+    def test_cold_cache_fits_query_budget(self):
+        """Промах кэша по многим авторам не выходит за бюджет запросов"""
+        authors = [
+            User.objects.create_user(username=f'many{i}') for i in range(20)
+        ]
+        for author in authors:
+            Follow.objects.create(user=self.user, author=author)
+            Post.objects.create(author=author, text='Пост')
+        cache.clear()
+        with override_settings(QUERY_BUDGET_RAISE=True):
+            page = self.get_page()
+        self.assertEqual(len(page), 10)
+        for author in authors:
+            self.assertEqual(
+                len(cache.get(author_timeline_key(author.pk))), 1
+            )
+
+    def test_merge_does_not_fill_timeline_table(self):
+        """В режиме merge записи не раскладываются по лентам"""
+        self.assertFalse(Timeline.objects.exists())
@@ -0,0 +1,130 @@
+import datetime
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from ..importer import DumpImporter, JsonArrayReader
+from ..models import Comment, Follow, Group, Post, UserStats
+from ..search import search_posts
+
+User = get_user_model()
+
+FIXTURE = [
+    {'model': 'auth.user', 'pk': 1, 'fields': {
+        'username': 'leo', 'password': '!', 'is_active': True,
+        'date_joined': '2019-10-01T14:34:56Z', 'groups': [],
+    }},
+    {'model': 'auth.user', 'pk': 2, 'fields': {
+        'username': 'existing', 'password': '!',
+        'date_joined': '2019-10-01T14:34:56Z',
+    }},
+    {'model': 'contenttypes.contenttype', 'pk': 1, 'fields': {
+        'app_label': 'posts', 'model': 'post',
+    }},
+    {'model': 'posts.comment', 'pk': 1, 'fields': {
+        'post': 7, 'author': 2, 'text': 'Ответ',
+        'created': '2022-11-15T21:12:37Z',
+    }},
+    {'model': 'posts.comment', 'pk': 2, 'fields': {
+        'post': 404, 'author': 2, 'text': 'Без записи',
+        'created': '2022-11-15T21:12:37Z',
+    }},
+    {'model': 'posts.post', 'pk': 7, 'fields': {
+        'text': 'Съ Кавказа я пріѣхалъ въ Тулу', 'author': 1, 'group': 3,
+        'pub_date': '1854-03-14T00:00:00Z', 'image': '',
+    }},
+    {'model': 'posts.post', 'pk': 8, 'fields': {
+        'text': 'Вторая запись', 'author': 2, 'group': None,
+        'pub_date': '1854-03-15T00:00:00Z', 'image': '',
+    }},
+    {'model': 'posts.group', 'pk': 3, 'fields': {
+        'title': 'Дневник', 'slug': 'diary', 'description': 'Записи',
+    }},
+    {'model': 'posts.follow', 'pk': 1, 'fields': {'user': 2, 'author': 1}},
+]
+
+
+class JsonArrayReaderTests(TestCase):
+    """Проверка потокового чтения JSON-массива"""
+
+    def test_items_across_blocks(self):
+        """Элементы читаются независимо от границ блоков"""
+        items = [{'a': 'x' * 10, 'b': [1, 2]}, 12345, 'строка', None, []]
+        text = ' [\n' + ',\n '.join(json.dumps(item) for item in items) + ']'
+        for read_size in (1, 3, 7, 1000):
+            self.assertEqual(
+                list(JsonArrayReader(StringIO(text), read_size)), items
+            )
+
+    def test_broken_input(self):
+        """Обрезанный файл и не массив вызывают ошибку"""
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(StringIO('[{"a": 1}, {"b"'), 4))
+        with self.assertRaises(ValueError):
+            list(JsonArrayReader(StringIO('{"a": 1}')))
+
+
+class ImportDumpTests(TestCase):
+    """Проверка загрузки фикстуры пачками"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.existing = User.objects.create_user(username='existing')
+        # id из фикстуры уже заняты
+        Group.objects.create(title='Другая', slug='other')
+        Post.objects.create(author=cls.existing, text='Старая запись')
+
+    def setUp(self):
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.path = os.path.join(directory, 'dump.json')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            json.dump(FIXTURE, file, ensure_ascii=False)
+
+    def test_rows_are_inserted_with_mapped_keys(self):
+        """Внешние ключи ведут к новым id и существующим строкам"""
+        importer = DumpImporter(self.path, batch_size=1)
+        importer.run()
+        self.assertEqual(importer.inserted['posts.post'], 2)
+        self.assertEqual(importer.skipped['posts.comment'], 1)
+        self.assertEqual(importer.skipped['auth.user'], 1)
+        self.assertEqual(importer.skipped['contenttypes.contenttype'], 1)
+        leo = User.objects.get(username='leo')
+        group = Group.objects.get(slug='diary')
+        post = Post.objects.get(author=leo)
+        self.assertEqual(post.group, group)
+        self.assertEqual(
+            post.pub_date,
+            timezone.make_aware(datetime.datetime(1854, 3, 14))
+        )
+        comment = Comment.objects.get(text='Ответ')
+        self.assertEqual(comment.post, post)
+        self.assertEqual(comment.author, self.existing)
+        self.assertTrue(
+            Follow.objects.filter(user=self.existing, author=leo).exists()
+        )
+        self.assertEqual(Post.objects.count(), 3)
+
+    def test_derived_data_is_rebuilt(self):
+        """Счётчики и поисковый индекс пересчитаны после загрузки"""
+        out = StringIO()
+        call_command('import_dump', self.path, stdout=out)
+        self.assertIn('Загружено строк: 6', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
+        stats = dict(
+            UserStats.objects.values_list('user__username', 'posts_count')
+        )
+        self.assertEqual(stats, {'leo': 1, 'existing': 2})
+        post = Post.objects.get(text__startswith='Съ')
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(
+            list(search_posts(Post.objects.all(), 'Кавказа')), [post]
+        )
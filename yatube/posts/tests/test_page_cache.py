@@ -0,0 +1,165 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.cache import STATS_FLUSH_EVERY
+from core.page_cache import STATS_KEYS, record, reset_stats, stats
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE_ENABLED=True)
+class AnonymousPageCacheTests(TestCase):
+    """Проверка кэша полных страниц для анонимных посетителей"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Тестовый пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        reset_stats()
+        self.guest_client = Client()
+        self.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list',
+                             kwargs={'slug': self.group.slug}),
+            'profile': reverse('posts:profile',
+                               kwargs={'username': self.author}),
+            'detail': reverse('posts:post_detail',
+                              kwargs={'post_id': self.post.pk}),
+        }
+
+    def cache_status(self, url):
+        return self.guest_client.get(url)['X-Page-Cache']
+
+    def assert_invalidated(self, names):
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                expected = 'MISS' if name in names else 'HIT'
+                self.assertEqual(self.cache_status(url), expected)
+
+    def warm_up(self):
+        for url in self.urls.values():
+            self.assertEqual(self.cache_status(url), 'MISS')
+            self.assertEqual(self.cache_status(url), 'HIT')
+
+    def test_query_string_is_normalized(self):
+        """Порядок и пустые параметры не порождают новых записей"""
+        url = self.urls['index']
+        self.guest_client.get(url, {'page': 1, 'b': 2})
+        self.assertEqual(
+            self.guest_client.get(url + '?b=2&page=1&empty=')['X-Page-Cache'],
+            'HIT'
+        )
+
+    def test_authenticated_users_bypass_cache(self):
+        """Авторизованным пользователям страницы не кэшируются"""
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(self.urls['index'])
+        self.assertNotIn('X-Page-Cache', response)
+
+    def test_comment_invalidates_only_post_detail(self):
+        """Комментарий сбрасывает только страницу записи"""
+        self.warm_up()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.assert_invalidated({'detail'})
+
+    def test_follow_invalidates_only_profile(self):
+        """Подписка сбрасывает только страницу автора"""
+        self.warm_up()
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assert_invalidated({'profile'})
+
+    def test_post_and_group_changes_invalidate_pages(self):
+        """Изменения записи и группы сбрасывают зависящие страницы"""
+        self.warm_up()
+        self.post.text = 'Изменённый текст'
+        self.post.save()
+        self.assert_invalidated(set(self.urls))
+        self.assertContains(
+            self.guest_client.get(self.urls['detail']), 'Изменённый текст'
+        )
+        self.group.title = 'Новое название'
+        self.group.save()
+        self.assert_invalidated({'index', 'group', 'profile', 'detail'})
+
+    def test_author_rename_refreshes_feeds(self):
+        """Новое имя автора сразу видно в лентах, вход их не сбрасывает"""
+        self.warm_up()
+        etag = self.guest_client.get(self.urls['index'])['ETag']
+        self.author.first_name = 'Новое'
+        self.author.last_name = 'Имя'
+        self.author.save()
+        self.assert_invalidated(set(self.urls))
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                self.assertContains(self.guest_client.get(url), 'Новое Имя')
+        response = self.guest_client.get(
+            self.urls['index'], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.author.save(update_fields=['last_login'])
+        response = self.guest_client.get(
+            self.urls['index'], HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_commenter_rename_refreshes_post_detail(self):
+        """Новое имя комментатора сразу видно на странице записи"""
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        self.warm_up()
+        etag = self.guest_client.get(self.urls['detail'])['ETag']
+        self.reader.username = 'renamed_reader'
+        self.reader.save()
+        self.assertEqual(self.cache_status(self.urls['detail']), 'MISS')
+        response = self.guest_client.get(
+            self.urls['detail'], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'renamed_reader')
+
+    def test_unrelated_post_keeps_detail_cached(self):
+        """Новая запись другого автора не сбрасывает чужие страницы"""
+        self.warm_up()
+        Post.objects.create(author=self.reader, text='Другая запись')
+        self.assert_invalidated({'index', 'group'})
+
+    def test_stats_are_reported(self):
+        """Статистика попаданий доступна из кода и команды"""
+        self.warm_up()
+        values = stats()
+        self.assertEqual(values['hits'], len(self.urls))
+        self.assertEqual(values['misses'], len(self.urls))
+        out = StringIO()
+        call_command('page_cache_stats', '--reset', stdout=out)
+        self.assertIn('50.0%', out.getvalue())
+        self.assertEqual(stats()['hits'], 0)
+
+    def test_stats_are_flushed_in_batches(self):
+        """Счётчики переносятся в общий кэш пачками"""
+        for _ in range(STATS_FLUSH_EVERY - 1):
+            record('hit')
+        self.assertIsNone(cache.get(STATS_KEYS['hit']))
+        record('miss')
+        self.assertEqual(cache.get(STATS_KEYS['hit']), STATS_FLUSH_EVERY - 1)
+        self.assertEqual(cache.get(STATS_KEYS['miss']), 1)
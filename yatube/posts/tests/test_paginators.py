@@ -0,0 +1,163 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Group, Post
+from ..paginators import (CachedCountPaginator, CursorPaginator,
+                          decode_cursor, encode_cursor)
+
+User = get_user_model()
+
+NUM_OF_POSTS = 13
+POSTS_LIMIT = 10
+
+
+class CursorPaginatorTest(TestCase):
+    """Проверка курсорной паджинации лент"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            description='Тестовое описание',
+            slug='test-slug',
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.author, text=f'Тестовый пост {i}',
+                 group=cls.group) for i in range(NUM_OF_POSTS)
+        ])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.paginator = CursorPaginator(Post.objects.all(), POSTS_LIMIT)
+
+    def test_cursor_round_trip(self):
+        """Курсор кодируется и декодируется без потерь"""
+        post = Post.objects.first()
+        cursor = encode_cursor(post.pub_date, post.pk)
+        self.assertEqual(decode_cursor(cursor), (post.pub_date, post.pk))
+        self.assertIsNone(decode_cursor('не-курсор'))
+
+    def test_pages_follow_each_other(self):
+        """Страницы по курсорам покрывают ленту без пропусков и повторов"""
+        first = self.paginator.get_cursor_page()
+        second = self.paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(len(first), POSTS_LIMIT)
+        self.assertEqual(len(second), NUM_OF_POSTS - POSTS_LIMIT)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(second.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        self.assertEqual(list(first) + list(second), expected)
+        back = self.paginator.get_cursor_page(before=second.previous_cursor)
+        self.assertEqual(list(back), list(first))
+
+    def test_page_is_stable_when_new_posts_arrive(self):
+        """Новые записи не сдвигают содержимое следующей страницы"""
+        first = self.paginator.get_cursor_page()
+        second = list(self.paginator.get_cursor_page(after=first.next_cursor))
+        Post.objects.create(author=self.author, text='Свежий пост')
+        again = self.paginator.get_cursor_page(after=first.next_cursor)
+        self.assertEqual(list(again), second)
+
+    def test_cursor_page_skips_count_and_offset(self):
+        """Курсорная страница не выполняет COUNT и OFFSET"""
+        first = self.paginator.get_cursor_page()
+        with CaptureQueriesContext(connection) as queries:
+            list(self.paginator.get_cursor_page(after=first.next_cursor))
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_views_use_cursor_links(self):
+        """Ленты отдают курсорные ссылки, ?page=N продолжает работать"""
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.author}),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                page_obj = response.context['page_obj']
+                self.assertTrue(page_obj.is_cursor)
+                self.assertContains(
+                    response, f'?after={page_obj.next_cursor}'
+                )
+                response = self.client.get(
+                    url, {'after': page_obj.next_cursor}
+                )
+                self.assertEqual(
+                    len(response.context['page_obj']),
+                    NUM_OF_POSTS - POSTS_LIMIT
+                )
+                response = self.client.get(url, {'page': 2})
+                self.assertEqual(
+                    response.context['page_obj'].number, 2
+                )
+
+
+class CachedCountPaginatorTest(TestCase):
+    """Проверка паджинатора с кэшируемым COUNT"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        Post.objects.bulk_create([
+            Post(author=cls.author, text=f'Тестовый пост {i}')
+            for i in range(NUM_OF_POSTS)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_count_is_cached(self):
+        """Повторный COUNT для той же ленты берётся из кэша"""
+        CachedCountPaginator(Post.objects.all(), POSTS_LIMIT).get_page(1)
+        paginator = CachedCountPaginator(Post.objects.all(), POSTS_LIMIT)
+        with self.assertNumQueries(1):
+            page = paginator.get_page(2)
+            list(page)
+        self.assertEqual(paginator.count, NUM_OF_POSTS)
+
+    def test_count_hint_skips_query(self):
+        """Переданное число записей заменяет COUNT"""
+        paginator = CachedCountPaginator(
+            Post.objects.all(), POSTS_LIMIT, count=NUM_OF_POSTS
+        )
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.num_pages, 2)
+
+    def test_elided_page_range(self):
+        """Диапазон страниц сокращается вокруг текущей страницы"""
+        ellipsis = CachedCountPaginator.ELLIPSIS
+        paginator = CachedCountPaginator(range(500), 10)
+        self.assertEqual(
+            paginator.get_elided_page_range(25),
+            [1, ellipsis, 23, 24, 25, 26, 27, ellipsis, 50]
+        )
+        self.assertEqual(
+            paginator.get_elided_page_range(1),
+            [1, 2, 3, ellipsis, 50]
+        )
+        small = CachedCountPaginator(range(30), 10)
+        self.assertEqual(small.get_elided_page_range(2), [1, 2, 3])
+
+    def test_view_renders_bounded_navigation(self):
+        """Навигация не выводит ссылки на все страницы ленты"""
+        Post.objects.bulk_create([
+            Post(author=self.author, text=f'Ещё пост {i}')
+            for i in range(200)
+        ])
+        response = self.client.get(reverse('posts:index'), {'page': 10})
+        self.assertContains(response, '?page=10', count=0)
+        self.assertContains(response, '?page=9"')
+        self.assertNotContains(response, '?page=5"')
+        self.assertContains(response, CachedCountPaginator.ELLIPSIS)
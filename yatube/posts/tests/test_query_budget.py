@@ -0,0 +1,125 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.decorators import QueryBudgetExceeded, query_budget
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PAGE_SIZES = (2, 25)
+
+
+@query_budget(1)
+def greedy_view(request):
+    list(User.objects.all())
+    list(Group.objects.all())
+    return HttpResponse()
+
+
+class QueryBudgetDecoratorTests(TestCase):
+    """Проверка декоратора query_budget"""
+
+    def test_over_budget_raises(self):
+        """Превышение бюджета приводит к исключению"""
+        request = RequestFactory().get('/')
+        with override_settings(QUERY_BUDGET_RAISE=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                greedy_view(request)
+
+    def test_over_budget_logs(self):
+        """Без QUERY_BUDGET_RAISE превышение пишется в журнал"""
+        request = RequestFactory().get('/')
+        with override_settings(QUERY_BUDGET_RAISE=False):
+            with self.assertLogs('core.decorators', 'WARNING'):
+                greedy_view(request)
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class ViewQueryBudgetTests(TestCase):
+    """Число запросов view-функций не зависит от размера страницы"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug',
+            description='Тестовое описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(ViewQueryBudgetTests.reader)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                author=self.author, group=self.group, text=f'Пост {i}'
+            )
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {i}'
+            )
+        return post
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_pages_fit_budget_for_any_page_size(self):
+        """Ленты и страница записи укладываются в бюджет"""
+        counts = {}
+        for size in PAGE_SIZES:
+            post = self.add_posts(size)
+            urls = (
+                reverse('posts:index'),
+                reverse('posts:index') + '?page=1',
+                reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+                reverse('posts:profile', kwargs={'username': self.author}),
+                reverse('posts:follow_index'),
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+            )
+            for url in urls:
+                with self.subTest(url=url, size=size):
+                    counts.setdefault(url.split('/')[1], set()).add(
+                        self.count_queries(url)
+                    )
+        for name, values in counts.items():
+            with self.subTest(page=name):
+                self.assertEqual(len(values), 1, values)
+
+    def test_write_views_fit_budget(self):
+        """Создание записи, комментария и подписки укладываются в бюджет"""
+        post = self.add_posts(1)
+        author_client = Client()
+        author_client.force_login(self.author)
+        requests = (
+            (author_client.post, reverse('posts:post_create'),
+             {'text': 'Новый пост', 'group': self.group.pk}),
+            (author_client.post,
+             reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+             {'text': 'Исправленный пост'}),
+            (self.client.post,
+             reverse('posts:add_comment', kwargs={'post_id': post.pk}),
+             {'text': 'Комментарий'}),
+            (self.client.get, reverse(
+                'posts:profile_unfollow', kwargs={'username': self.author}
+            ), {}),
+            (self.client.get, reverse(
+                'posts:profile_follow', kwargs={'username': self.author}
+            ), {}),
+        )
+        for method, url, data in requests:
+            with self.subTest(url=url):
+                self.assertEqual(method(url, data).status_code, 302)
@@ -0,0 +1,48 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..query_plans import find_problems, plan_problems, seed_dataset
+
+
+class QueryPlanTests(TestCase):
+    """Запросы лент и страницы записи используют индексы"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user, cls.post = seed_dataset(posts=30)
+
+    def test_plan_problems_detection(self):
+        """Полный просмотр и сортировка в B-дереве распознаются"""
+        details = [
+            'SCAN posts_post',
+            'SCAN TABLE posts_post',
+            'SCAN posts_post USING INDEX post_pub_date_idx',
+            'USE TEMP B-TREE FOR ORDER BY',
+        ]
+        self.assertEqual(
+            plan_problems(details),
+            ['SCAN posts_post', 'SCAN TABLE posts_post',
+             'USE TEMP B-TREE FOR ORDER BY']
+        )
+
+    def test_pages_have_no_scans_or_sorts(self):
+        """Ни один запрос лент и страницы записи не просматривает таблицу
+        целиком и не сортирует результат во временном B-дереве"""
+        for engine in ('timeline', 'merge'):
+            with self.subTest(engine=engine):
+                with override_settings(FOLLOW_FEED_ENGINE=engine):
+                    problems = find_problems(self.user, self.post)
+                self.assertEqual(problems, {})
+
+    @override_settings(FOLLOW_FEED_ENGINE='join')
+    def test_join_feed_only_sorts(self):
+        """Лента на JOIN читает записи по индексам авторов и сортирует
+        только их слияние: без материализованной ленты это неизбежно"""
+        problems = find_problems(self.user, self.post)
+        self.assertTrue(problems)
+        follow = reverse('posts:follow_index')
+        for (url, sql), found in problems.items():
+            with self.subTest(url=url):
+                self.assertTrue(url.startswith(follow))
+                self.assertEqual(found, ['USE TEMP B-TREE FOR ORDER BY'])
@@ -0,0 +1,113 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Post
+from ..search import match_expression, search_posts
+
+User = get_user_model()
+
+
+def found(query):
+    return list(
+        search_posts(Post.objects.all(), query).values_list('text', flat=True)
+    )
+
+
+class SearchIndexTests(TestCase):
+    """Проверка полнотекстового индекса записей"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при создании, изменении и удалении записи"""
+        post = Post.objects.create(author=self.user, text='Рыжий кот')
+        self.assertEqual(found('кот'), ['Рыжий кот'])
+        post.text = 'Серая собака'
+        post.save()
+        self.assertEqual(found('кот'), [])
+        self.assertEqual(found('собака'), ['Серая собака'])
+        Post.objects.filter(pk=post.pk).update(text='Белый медведь')
+        self.assertEqual(found('собака'), [])
+        self.assertEqual(found('медведь'), ['Белый медведь'])
+        post.delete()
+        self.assertEqual(found('медведь'), [])
+
+    def test_words_match_as_prefixes_ignoring_case(self):
+        """Слова запроса ищутся как начала слов без учёта регистра"""
+        Post.objects.create(author=self.user, text='Котики и собаки')
+        Post.objects.create(author=self.user, text='Только котики')
+        self.assertEqual(len(found('КОТ')), 2)
+        self.assertEqual(found('кот соб'), ['Котики и собаки'])
+
+    def test_results_are_ranked(self):
+        """Выше стоят записи, где слово встречается чаще"""
+        Post.objects.create(
+            author=self.user, text='Про погоду и немного про чай'
+        )
+        Post.objects.create(author=self.user, text='Чай, чай и снова чай')
+        self.assertEqual(found('чай')[0], 'Чай, чай и снова чай')
+
+    def test_query_syntax_is_escaped(self):
+        """Операторы FTS5 из запроса не ломают поиск"""
+        Post.objects.create(author=self.user, text='Кот AND собака')
+        self.assertEqual(match_expression('кот" OR (*'), '"кот"* "OR"*')
+        self.assertEqual(found('"AND" ^*'), ['Кот AND собака'])
+        self.assertEqual(found('  *() '), [])
+
+
+class SearchViewTests(TestCase):
+    """Проверка страницы поиска и поиска в админке"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='author')
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        Post.objects.bulk_create([
+            Post(author=cls.user, text=f'Заметка о путешествии {number}')
+            for number in range(12)
+        ] + [Post(author=cls.user, text='Рецепт пирога')])
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_search_page_is_paginated(self):
+        """Поиск выводит найденные записи по страницам"""
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'путешествии'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 12)
+        self.assertEqual(len(page_obj), 10)
+        self.assertContains(response, '?q=%D0%BF%D1%83%D1%82')
+        response = self.client.get(
+            reverse('posts:search'), {'q': 'путешествии', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertNotContains(response, 'Рецепт пирога')
+
+    def test_empty_query_finds_nothing(self):
+        """Пустой запрос не выполняет поиск"""
+        response = self.client.get(reverse('posts:search'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['page_obj'].paginator.count, 0)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт через MATCH, а не LIKE"""
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                reverse('admin:posts_post_changelist'), {'q': 'пирог'}
+            )
+        self.assertEqual(response.context['cl'].result_count, 1)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertIn('MATCH', sql)
+        self.assertNotIn('LIKE', sql)
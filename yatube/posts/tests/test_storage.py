@@ -0,0 +1,154 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from ..models import Post
+from ..storage import delete_unreferenced, image_file, is_content_name
+from ..thumbnails import generate_thumbnails, thumbnail_variants
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def gif(color):
+    content = BytesIO()
+    Image.new('RGB', (4, 4), color).save(content, 'GIF')
+    return content.getvalue()
+
+
+def run_on_commit(callback):
+    callback()
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0,
+    POSTS_IMAGE_REUSE_GRACE=0
+)
+@mock.patch('django.db.transaction.on_commit', run_on_commit)
+class ContentAddressedStorageTests(TestCase):
+    """Проверка хранения картинок по хэшу содержимого"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def create_post(self, name, content):
+        return Post.objects.create(
+            author=self.user, text=name,
+            image=SimpleUploadedFile(name, content, 'image/gif')
+        )
+
+    def path(self, name):
+        return os.path.join(TEMP_MEDIA_ROOT, name)
+
+    def thumbnail_path(self, name):
+        geometry, options = thumbnail_variants()[0]
+        thumbnail = get_thumbnail(image_file(name), geometry, **options)
+        return self.path(thumbnail.name)
+
+    def test_identical_uploads_share_file(self):
+        """Одинаковые картинки хранятся одним файлом"""
+        first = self.create_post('first.gif', gif('red'))
+        second = self.create_post('second.GIF', gif('red'))
+        other = self.create_post('first.gif', gif('blue'))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertNotEqual(first.image.name, other.image.name)
+        self.assertTrue(is_content_name(first.image.name))
+        self.assertTrue(first.image.name.endswith('.gif'))
+        directory = os.path.dirname(self.path(first.image.name))
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_file_is_deleted_with_last_reference(self):
+        """Файл и миниатюры удаляются вместе с последней ссылкой"""
+        first = self.create_post('first.gif', gif('red'))
+        second = self.create_post('second.gif', gif('red'))
+        name = first.image.name
+        generate_thumbnails(name)
+        thumbnail = self.thumbnail_path(name)
+        first.delete()
+        self.assertTrue(os.path.exists(self.path(name)))
+        self.assertTrue(os.path.exists(thumbnail))
+        second.delete()
+        self.assertFalse(os.path.exists(self.path(name)))
+        self.assertFalse(os.path.exists(thumbnail))
+
+    def test_replaced_image_is_released(self):
+        """Прежний файл удаляется, когда запись меняет картинку"""
+        post = self.create_post('old.gif', gif('red'))
+        old_name = post.image.name
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {
+                'text': 'Новая картинка',
+                'image': SimpleUploadedFile('new.gif', gif('blue')),
+            }
+        )
+        post.refresh_from_db()
+        self.assertNotEqual(post.image.name, old_name)
+        self.assertFalse(os.path.exists(self.path(old_name)))
+        self.assertTrue(os.path.exists(self.path(post.image.name)))
+
+    @override_settings(POSTS_IMAGE_REUSE_GRACE=60)
+    def test_recently_reused_file_is_kept(self):
+        """Только что переиспользованный файл не удаляется"""
+        post = self.create_post('first.gif', gif('red'))
+        name = post.image.name
+        Post.objects.filter(pk=post.pk).update(image='')
+        self.assertFalse(delete_unreferenced(name))
+        self.assertTrue(os.path.exists(self.path(name)))
+
+    def test_dedupe_media_command(self):
+        """Команда переименовывает старые файлы и объединяет копии"""
+        os.makedirs(self.path('posts'))
+        legacy = {'posts/a.gif': 'red', 'posts/b.gif': 'red',
+                  'posts/c.gif': 'blue'}
+        posts = {}
+        for name, color in legacy.items():
+            with open(self.path(name), 'wb') as file:
+                file.write(gif(color))
+            posts[name] = Post.objects.create(author=self.user, text=name)
+            Post.objects.filter(pk=posts[name].pk).update(image=name)
+        orphan = self.create_post('orphan.gif', gif('green'))
+        Post.objects.filter(pk=orphan.pk).update(image='')
+        out = StringIO()
+        call_command('dedupe_media', stdout=out)
+        self.assertIn(
+            'Переименовано: 2, объединено с копиями: 1, без ссылок: 1',
+            out.getvalue()
+        )
+        names = {
+            name: Post.objects.get(pk=post.pk).image.name
+            for name, post in posts.items()
+        }
+        self.assertEqual(names['posts/a.gif'], names['posts/b.gif'])
+        self.assertNotEqual(names['posts/a.gif'], names['posts/c.gif'])
+        for old_name, new_name in names.items():
+            self.assertTrue(is_content_name(new_name))
+            self.assertTrue(os.path.exists(self.path(new_name)))
+            self.assertFalse(os.path.exists(self.path(old_name)))
+        self.assertFalse(os.path.exists(self.path(orphan.image.name)))
@@ -0,0 +1,116 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from ..models import Comment, Follow, Group, Post, Timeline, UserStats
+from ..synthetic import END, DatasetGenerator
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def generate(prefix, seed=1, **sizes):
+    options = {'users': 30, 'groups': 3, 'posts': 200, 'comments': 300,
+               'follows': 5, 'prefix': prefix, 'seed': seed}
+    options.update(sizes)
+    generator = DatasetGenerator(**options)
+    generator.run()
+    return generator
+
+
+def snapshot(prefix):
+    users = User.objects.filter(username__startswith=prefix)
+    first_user = users.order_by('pk').first().pk
+    first_group = Group.objects.filter(
+        slug__startswith=prefix
+    ).order_by('pk').first().pk
+    posts = Post.objects.filter(author__in=users).order_by('pk')
+    return [
+        (author - first_user, text, pub_date, group and group - first_group)
+        for author, text, pub_date, group in posts.values_list(
+            'author_id', 'text', 'pub_date', 'group_id'
+        )
+    ]
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class DatasetGeneratorTests(TestCase):
+    """Проверка генератора синтетических данных"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_same_seed_gives_same_rows(self):
+        """Одинаковый seed даёт одинаковые строки, другой — другие"""
+        generate('first')
+        generate('second')
+        generate('third', seed=2)
+        self.assertEqual(snapshot('first'), snapshot('second'))
+        self.assertNotEqual(snapshot('first'), snapshot('third'))
+
+    def test_rows_and_derived_data(self):
+        """Строки созданы, счётчики и ленты согласованы"""
+        generator = generate('user', images=0.5)
+        self.assertEqual(generator.inserted['posts.post'], 200)
+        self.assertEqual(Comment.objects.count(), 300)
+        self.assertFalse(
+            Follow.objects.filter(user=F('author')).exists()
+        )
+        self.assertEqual(
+            Follow.objects.count(), generator.inserted['posts.follow']
+        )
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date')).exists()
+        )
+        posts = Post.objects.annotate(actual=Count('comments'))
+        self.assertFalse(posts.exclude(comments_count=F('actual')).exists())
+        for stats in UserStats.objects.all():
+            self.assertEqual(
+                stats.posts_count,
+                Post.objects.filter(author_id=stats.user_id).count()
+            )
+        follows = Follow.objects.annotate(posts=Count('author__posts'))
+        self.assertEqual(
+            Timeline.objects.count(),
+            sum(follows.values_list('posts', flat=True))
+        )
+        with_images = Post.objects.exclude(image='')
+        self.assertTrue(with_images.exists())
+        self.assertFalse(with_images.filter(image_width=None).exists())
+
+    def test_post_dates_are_distinct(self):
+        """Даты записей различны и растут вместе с id"""
+        generate('dense', posts=2000, days=1)
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True
+        ))
+        self.assertEqual(dates, sorted(set(dates)))
+        self.assertLess(dates[-1], END)
+
+    def test_power_law_popularity(self):
+        """Немногие авторы пишут заметно больше среднего"""
+        generate('user', users=100, posts=2000)
+        posts = Post.objects.order_by().values('author')
+        top = max(
+            posts.annotate(total=Count('pk')).values_list('total', flat=True)
+        )
+        self.assertGreater(top, 10 * 2000 / 100)
+
+    def test_command(self):
+        """Команда сообщает число строк и скорость"""
+        out = StringIO()
+        call_command(
+            'generate_dataset', users=5, posts=10, comments=10, follows=2,
+            stdout=out
+        )
+        self.assertIn('posts.post: создано 10', out.getvalue())
+        self.assertIn('строк/с', out.getvalue())
@@ -0,0 +1,227 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail import default, get_thumbnail
+
+from .. import thumbnails
+from ..models import Post
+from ..storage import image_file
+from ..thumbnails import (generate_thumbnails, resolve_thumbnails,
+                          responsive_image, schedule_thumbnails, srcset,
+                          thumbnail_variants)
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTests(TestCase):
+    """Проверка заблаговременного создания миниатюр"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def upload(self, name='small.gif'):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif'
+        )
+
+    def thumbnail_path(self, name):
+        geometry, options = thumbnail_variants()[0]
+        thumbnail = get_thumbnail(image_file(name), geometry, **options)
+        return os.path.join(TEMP_MEDIA_ROOT, thumbnail.name)
+
+    @mock.patch('posts.forms.schedule_thumbnails')
+    def test_form_schedules_new_images_only(self, schedule):
+        """Миниатюры ставятся в очередь только для новой картинки"""
+        self.client.post(
+            reverse('posts:post_create'),
+            {'text': 'С картинкой', 'image': self.upload()}
+        )
+        post = Post.objects.get(text='С картинкой')
+        schedule.assert_called_once_with(post.image.name)
+        schedule.reset_mock()
+        self.client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Новый текст'}
+        )
+        schedule.assert_not_called()
+
+    @mock.patch('django.db.transaction.on_commit', lambda submit: submit())
+    @override_settings(POSTS_THUMBNAIL_WORKERS=1, POSTS_THUMBNAIL_QUEUE_SIZE=1)
+    def test_full_queue_generates_in_request_thread(self):
+        """При заполненной очереди миниатюры создаются в потоке запроса"""
+        release = threading.Event()
+        threads = {}
+
+        def generate(name):
+            threads[name] = threading.current_thread().name
+            release.wait(5)
+
+        with mock.patch('posts.thumbnails.generate_thumbnails', generate), \
+                mock.patch('posts.thumbnails._executor', None), \
+                mock.patch('posts.thumbnails._queue_slots', None):
+            schedule_thumbnails('posts/first.gif')
+            release.set()
+            schedule_thumbnails('posts/second.gif')
+            thumbnails.get_executor().shutdown(wait=True)
+        self.assertTrue(threads['posts/first.gif'].startswith('thumbnails'))
+        self.assertEqual(
+            threads['posts/second.gif'], threading.current_thread().name
+        )
+
+    def test_pregenerated_thumbnail_is_used_by_templates(self):
+        """Шаблон выводит заранее созданную миниатюру"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('feed.gif')
+        )
+        generate_thumbnails(post.image.name)
+        path = self.thumbnail_path(post.image.name)
+        self.assertTrue(os.path.exists(path))
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, os.path.basename(path))
+
+    def test_command_regenerates_thumbnails(self):
+        """Команда создаёт миниатюры и сообщает о ходе работы"""
+        post = Post.objects.create(
+            author=self.user, text='Пост', image=self.upload('batch.gif')
+        )
+        path = self.thumbnail_path(post.image.name)
+        os.remove(path)
+        out = StringIO()
+        call_command(
+            'generate_thumbnails', '--workers', '1', '--force', stdout=out
+        )
+        self.assertIn('Обработано 1 из 1', out.getvalue())
+        self.assertTrue(os.path.exists(path))
+
+    def test_page_thumbnails_are_resolved_in_one_read(self):
+        """Миниатюры страницы находятся одним чтением кэша"""
+        images = []
+        for color in ('red', 'green', 'blue'):
+            content = BytesIO()
+            Image.new('RGB', (8, 8), color).save(content, 'GIF')
+            post = Post.objects.create(
+                author=self.user, text=color, image=SimpleUploadedFile(
+                    f'{color}.gif', content.getvalue(), 'image/gif'
+                )
+            )
+            generate_thumbnails(post.image.name)
+            images.append(post.image)
+        kv_cache = default.kvstore.cache
+        with mock.patch.object(
+            kv_cache, 'get_many', wraps=kv_cache.get_many
+        ) as get_many, mock.patch.object(
+            kv_cache, 'get', wraps=kv_cache.get
+        ) as get, mock.patch(
+            'django.core.files.storage.FileSystemStorage.exists'
+        ) as exists, self.assertNumQueries(0):
+            resolved = resolve_thumbnails(images, 'feed')
+        get_many.assert_called_once()
+        get.assert_not_called()
+        exists.assert_not_called()
+        for image in images:
+            self.assertEqual(
+                srcset(image, 'feed', thumbnails=resolved[image.name]),
+                srcset(image, 'feed')
+            )
+        # после сброса кэша промахи читаются из таблицы одним запросом
+        cache.clear()
+        with self.assertNumQueries(1):
+            resolve_thumbnails(images, 'feed')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class ResponsiveImageTests(TestCase):
+    """Проверка вариантов картинок по ширине и формату"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        image = BytesIO()
+        Image.new('RGB', (1600, 900), (200, 30, 30)).save(image, 'PNG')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Большая картинка',
+            image=SimpleUploadedFile('large.png', image.getvalue())
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_preset_widths_and_formats(self):
+        """Пресет ленты даёт все ширины в основном формате и WebP"""
+        data = responsive_image(self.post.image, 'feed')
+        widths = [width for width, _ in data['srcset']]
+        self.assertEqual(
+            widths, list(settings.POSTS_IMAGE_PRESETS['feed']['widths'])
+        )
+        self.assertEqual(data['src'], data['srcset'][-1][1])
+        mime, variants = data['sources'][0]
+        self.assertEqual(mime, 'image/webp')
+        self.assertTrue(all(url.endswith('.webp') for _, url in variants))
+
+    def test_small_image_is_not_upscaled(self):
+        """Маленькая картинка даёт один вариант фактической ширины"""
+        post = Post.objects.create(
+            author=self.user, text='Маленькая',
+            image=SimpleUploadedFile('tiny.gif', SMALL_GIF)
+        )
+        data = responsive_image(post.image, 'detail')
+        self.assertEqual([width for width, _ in data['srcset']], [2])
+
+    def test_pages_emit_srcset_and_sizes(self):
+        """Лента и страница записи выводят srcset, sizes и WebP"""
+        urls = {
+            reverse('posts:index'): 'feed',
+            reverse('posts:post_detail',
+                    kwargs={'post_id': self.post.pk}): 'detail',
+        }
+        for url, preset in urls.items():
+            with self.subTest(url=url):
+                response = Client().get(url)
+                self.assertContains(response, 'srcset=')
+                self.assertContains(response, 'type="image/webp"')
+                self.assertContains(
+                    response,
+                    f'sizes="{settings.POSTS_IMAGE_PRESETS[preset]["sizes"]}"'
+                )
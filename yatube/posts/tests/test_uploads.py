@@ -0,0 +1,158 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..forms import PostForm
+from ..models import Post
+from ..thumbnails import display_size
+from ..uploads import EXIF_ORIENTATION, normalize_image
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_upload(name, size, image_format, mode='RGB', **save_options):
+    content = BytesIO()
+    Image.new(mode, size, 'red').save(content, image_format, **save_options)
+    return SimpleUploadedFile(name, content.getvalue())
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_IMAGE_MAX_SIDE=100,
+    POSTS_THUMBNAIL_WORKERS=0
+)
+class UploadNormalizationTests(TestCase):
+    """Проверка нормализации картинок при загрузке"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_large_photo_is_downsized_and_stripped(self):
+        """Большое фото уменьшается, поворачивается и теряет EXIF"""
+        exif = Image.Exif()
+        exif[EXIF_ORIENTATION] = 6
+        exif[0x010F] = 'Camera maker'
+        upload = make_upload(
+            'photo.jpeg', (400, 200), 'JPEG', exif=exif.tobytes()
+        )
+        with Image.open(normalize_image(upload)) as result:
+            self.assertEqual(result.format, 'JPEG')
+            self.assertEqual(result.size, (50, 100))
+            self.assertEqual(dict(result.getexif()), {})
+
+    def test_formats_are_kept_or_converted(self):
+        """PNG с прозрачностью остаётся PNG, BMP перекодируется в JPEG"""
+        png = normalize_image(
+            make_upload('alpha.png', (20, 20), 'PNG', 'RGBA')
+        )
+        self.assertEqual(png.name, 'alpha.png')
+        bmp = normalize_image(make_upload('old.bmp', (20, 20), 'BMP'))
+        self.assertEqual(bmp.name, 'old.jpg')
+        with Image.open(bmp) as result:
+            self.assertEqual(result.format, 'JPEG')
+
+    @override_settings(POSTS_IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_are_rejected(self):
+        """Кадр больше предела отклоняется до декодирования"""
+        form = PostForm(
+            data={'text': 'Пост'},
+            files={'image': make_upload('big.png', (20, 20), 'PNG')}
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_post_create_stores_normalized_image(self):
+        """Через форму сохраняется уменьшенная картинка"""
+        client = Client()
+        client.force_login(self.user)
+        client.post(reverse('posts:post_create'), {
+            'text': 'Большая картинка',
+            'image': make_upload('large.png', (300, 150), 'PNG'),
+        })
+        post = Post.objects.get(text='Большая картинка')
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (100, 50))
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_placeholder),
+            (100, 50, '#ff0000')
+        )
+        client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            {'text': 'Без картинки', 'image-clear': 'on'}
+        )
+        post.refresh_from_db()
+        self.assertIsNone(post.image_width)
+        self.assertEqual(post.image_placeholder, '')
+
+    def test_benchmark_command(self):
+        """Бенчмарк выводит время и память для каждого случая"""
+        out = StringIO()
+        call_command(
+            'benchmark_image_uploads', '--sizes', '300x200',
+            '--formats', 'JPEG', 'PNG', stdout=out
+        )
+        lines = out.getvalue().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(lines[0].startswith('JPEG 300x200:'))
+        self.assertIn('память', lines[1])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
+class ImageMetadataTests(TestCase):
+    """Проверка размеров и заглушек картинок в записях"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_display_size_follows_presets(self):
+        """Размер для шаблона повторяет расчёт sorl-thumbnail"""
+        self.assertEqual(display_size(1600, 900, 'feed'), (960, 339))
+        self.assertEqual(display_size(500, 500, 'feed'), (500, 339))
+        self.assertEqual(display_size(1600, 900, 'detail'), (1440, 810))
+        self.assertEqual(display_size(300, 200, 'detail'), (300, 200))
+
+    def test_backfill_and_template_attributes(self):
+        """Команда заполняет поля, а шаблон выводит размеры и заглушку"""
+        post = Post.objects.create(
+            author=self.user, text='Старая запись',
+            image=make_upload('old.jpg', (1600, 900), 'JPEG')
+        )
+        self.assertIsNone(post.image_width)
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn('Обработано 1 из 1', out.getvalue())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (1600, 900))
+        self.assertRegex(post.image_placeholder, r'^#[0-9a-f]{6}$')
+        self.assertGreater(int(post.image_placeholder[1:3], 16), 240)
+        response = Client().get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk})
+        )
+        self.assertContains(response, 'width="1440" height="810"')
+        self.assertContains(
+            response, f'style="background-color: {post.image_placeholder}"'
+        )
+        self.assertContains(response, 'loading="lazy"')
@@ -4,7 +4,6 @@ import tempfile
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, override_settings, TestCase
 from django.urls import reverse
@@ -17,7 +16,7 @@ User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POSTS_THUMBNAIL_WORKERS=0)
 class PostViewsTests(TestCase):
     """Проверка вью функций приложения Posts"""
 
@@ -219,17 +218,21 @@ class PostViewsTests(TestCase):
         """Проверка работы кэша для Главной"""
         response = self.authorized_client.get(reverse('posts:index'))
         posts = response.content
-        Post.objects.create(
-            author=PostViewsTests.user,
-            text='новый пост'
+        # изменение в обход сигналов не сбрасывает кэш фрагмента
+        Post.objects.filter(pk=PostViewsTests.post.pk).update(
+            text='изменённый текст'
         )
         response_2 = self.authorized_client.get(reverse('posts:index'))
         old_posts = response_2.content
         self.assertEqual(old_posts, posts)
-        cache.clear()
+        Post.objects.create(
+            author=PostViewsTests.user,
+            text='новый пост'
+        )
         response_3 = self.authorized_client.get(reverse('posts:index'))
         new_posts = response_3.content
         self.assertNotEqual(new_posts, old_posts)
+        self.assertContains(response_3, 'новый пост')
 
 
 NUM_OF_POSTS = 13
@@ -0,0 +1,288 @@
+"""Варианты картинок записей и их заблаговременное создание.
+
+Набор вариантов задают настройки: POSTS_IMAGE_PRESETS описывает ширины,
+кадр и атрибут sizes для каждого места показа (карточка ленты, страница
+записи), POSTS_IMAGE_EXTRA_FORMATS — форматы, которые создаются рядом
+с основным (JPEG sorl-thumbnail), например WebP. Тег {% responsive_image %}
+выводит варианты через srcset и sizes.
+
+Миниатюра, созданная при первом показе страницы, задерживает её первого
+зрителя, поэтому все варианты создаются заранее: после сохранения записи
+через PostForm — в фоновом пуле потоков, для уже загруженных картинок —
+командой generate_thumbnails. Очередь пула ограничена
+POSTS_THUMBNAIL_QUEUE_SIZE заданиями: когда она заполнена, миниатюры
+создаются в потоке запроса, так что всплеск загрузок замедляет
+загружающих, а не копит задания в памяти.
+
+На страницах лент resolve_thumbnails() находит миниатюры всех записей
+страницы одним чтением кэша sorl (и одним запросом к его таблице для
+промахов кэша) без проверок существования файлов в хранилище; шаблоны
+подключают его тегом {% prefetch_thumbnails %}.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.db import connections, transaction
+from sorl.thumbnail import default, delete, get_thumbnail
+from sorl.thumbnail.conf import defaults as thumbnail_defaults
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from .storage import image_file
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_queue_slots = None
+
+
+def preset_variants(preset, image_format=None):
+    """Пары (геометрия, параметры sorl) для всех ширин пресета.
+
+    Картинки не увеличиваются: ширина варианта может оказаться меньше
+    заявленной, поэтому в srcset выводится фактическая ширина.
+    """
+    config = settings.POSTS_IMAGE_PRESETS[preset]
+    for width in config['widths']:
+        options = {'upscale': False}
+        if config['crop']:
+            crop_width, crop_height = config['crop']
+            height = round(width * crop_height / crop_width)
+            geometry = f'{width}x{height}'
+            options['crop'] = 'center'
+        else:
+            geometry = str(width)
+        if image_format:
+            options['format'] = image_format
+        yield geometry, options
+
+
+def image_formats():
+    """Основной формат (None — по настройкам sorl) и дополнительные."""
+    return (None,) + tuple(settings.POSTS_IMAGE_EXTRA_FORMATS)
+
+
+def thumbnail_variants():
+    """Все варианты всех пресетов во всех форматах."""
+    variants = []
+    for preset in settings.POSTS_IMAGE_PRESETS:
+        for image_format in image_formats():
+            variants.extend(preset_variants(preset, image_format))
+    return variants
+
+
+def thumbnail_name(source, geometry, options):
+    """Имя файла миниатюры, которое выберет sorl-thumbnail.
+
+    Повторяет подстановку параметров по умолчанию из get_thumbnail,
+    но не обращается ни к кэшу, ни к хранилищу.
+    """
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, setting in backend.extra_options:
+        value = getattr(thumbnail_settings, setting)
+        if value != getattr(thumbnail_defaults, setting):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def _read_kvstore(keys):
+    """{ключ: значение} записей KV-хранилища sorl.
+
+    Кэш читается одним get_many, промахи — одним запросом к таблице,
+    найденные в ней значения возвращаются в кэш.
+    """
+    # модуль импортируется процессами пула до django.setup()
+    from sorl.thumbnail.models import KVStore
+
+    kv_cache = default.kvstore.cache
+    found = {
+        key: value for key, value in kv_cache.get_many(keys).items()
+        if isinstance(value, str)
+    }
+    missing = [key for key in keys if key not in found]
+    if missing:
+        stored = dict(
+            KVStore.objects.filter(key__in=missing)
+            .values_list('key', 'value')
+        )
+        if stored:
+            kv_cache.set_many(
+                stored, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+        found.update(stored)
+    return found
+
+
+def resolve_thumbnails(images, preset):
+    """Миниатюры всех вариантов пресета для нескольких картинок сразу.
+
+    Возвращает {имя картинки: {(геометрия, формат): миниатюра}}.
+    Миниатюры, которых нет в KV-хранилище, создаются обычным
+    get_thumbnail по одной.
+    """
+    variants = [
+        (image_format, geometry, options)
+        for image_format in image_formats()
+        for geometry, options in preset_variants(preset, image_format)
+    ]
+    wanted = {}
+    for image in images:
+        source = ImageFile(image)
+        for image_format, geometry, options in variants:
+            thumbnail = ImageFile(
+                thumbnail_name(source, geometry, options), default.storage
+            )
+            wanted[add_prefix(thumbnail.key)] = (
+                image, (geometry, image_format), options
+            )
+    stored = _read_kvstore(list(wanted)) if wanted else {}
+    resolved = {}
+    for key, (image, variant, options) in wanted.items():
+        if key in stored:
+            thumbnail = deserialize_image_file(stored[key])
+        else:
+            thumbnail = get_thumbnail(image, variant[0], **options)
+        resolved.setdefault(image.name, {})[variant] = thumbnail
+    return resolved
+
+
+def srcset(image, preset, image_format=None, thumbnails=None):
+    """Список (ширина, url) вариантов картинки по возрастанию ширины.
+
+    thumbnails — готовые миниатюры картинки из resolve_thumbnails.
+    Варианты, которые не удалось создать из повреждённого файла,
+    в список не попадают.
+    """
+    widths = {}
+    for geometry, options in preset_variants(preset, image_format):
+        if thumbnails is None:
+            thumbnail = get_thumbnail(image, geometry, **options)
+        else:
+            thumbnail = thumbnails[geometry, image_format]
+        if thumbnail.size:
+            widths.setdefault(thumbnail.width, thumbnail.url)
+    return sorted(widths.items())
+
+
+def display_size(width, height, preset):
+    """Размер наибольшего варианта пресета для картинки width×height.
+
+    Повторяет расчёт sorl-thumbnail без увеличения: при обрезке кадр
+    масштабируется по большему из коэффициентов, затем обрезается.
+    """
+    config = settings.POSTS_IMAGE_PRESETS[preset]
+    target_width = max(config['widths'])
+    if not config['crop']:
+        factor = min(1, target_width / width)
+        return round(width * factor), round(height * factor)
+    crop_width, crop_height = config['crop']
+    target_height = round(target_width * crop_height / crop_width)
+    factor = min(1, max(target_width / width, target_height / height))
+    return (
+        min(target_width, round(width * factor)),
+        min(target_height, round(height * factor)),
+    )
+
+
+def responsive_image(image, preset, thumbnails=None):
+    """Данные для <picture>: sizes, src, srcset и источники по форматам.
+
+    Размеры и цвет заглушки берутся из полей записи, без обращения
+    к файлу. Если картинку не удалось прочитать, возвращает None.
+    """
+    fallback = srcset(image, preset, thumbnails=thumbnails)
+    if not fallback:
+        return None
+    sources = [
+        (
+            f'image/{image_format.lower()}',
+            srcset(image, preset, image_format, thumbnails),
+        )
+        for image_format in settings.POSTS_IMAGE_EXTRA_FORMATS
+    ]
+    data = {
+        'sizes': settings.POSTS_IMAGE_PRESETS[preset]['sizes'],
+        'src': fallback[-1][1],
+        'srcset': fallback,
+        'sources': sources,
+        'placeholder': getattr(image.instance, 'image_placeholder', ''),
+    }
+    width = getattr(image.instance, 'image_width', None)
+    height = getattr(image.instance, 'image_height', None)
+    if width and height:
+        data['width'], data['height'] = display_size(width, height, preset)
+    return data
+
+
+def generate_thumbnails(name, force=False):
+    """Создаёт все варианты миниатюр картинки name.
+
+    force=True удаляет прежние миниатюры и создаёт их заново.
+    Возвращает число вариантов.
+    """
+    image = image_file(name)
+    if force:
+        delete(image, delete_file=False)
+    variants = thumbnail_variants()
+    for geometry, options in variants:
+        get_thumbnail(image, geometry, **options)
+    return len(variants)
+
+
+def _generate_in_background(name):
+    try:
+        generate_thumbnails(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        # соединения с базой у каждого потока свои
+        connections.close_all()
+
+
+def init_worker():
+    """Инициализация процесса пула команды generate_thumbnails."""
+    django.setup()
+
+
+def get_executor():
+    global _executor, _queue_slots
+    if _executor is None:
+        _queue_slots = threading.BoundedSemaphore(
+            settings.POSTS_THUMBNAIL_QUEUE_SIZE
+        )
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POSTS_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def _submit(name):
+    """Ставит задание в пул; False, если очередь заполнена."""
+    executor = get_executor()
+    if not _queue_slots.acquire(blocking=False):
+        return False
+    job = executor.submit(_generate_in_background, name)
+    job.add_done_callback(lambda job: _queue_slots.release())
+    return True
+
+
+def schedule_thumbnails(name):
+    """Ставит создание миниатюр в очередь после фиксации транзакции.
+
+    При POSTS_THUMBNAIL_WORKERS = 0 или заполненной очереди пула
+    миниатюры создаются сразу, в том же потоке.
+    """
+    def submit():
+        if not settings.POSTS_THUMBNAIL_WORKERS or not _submit(name):
+            generate_thumbnails(name)
+
+    transaction.on_commit(submit)
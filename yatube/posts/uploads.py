@@ -0,0 +1,116 @@
+"""Нормализация картинок при загрузке.
+
+Загрузка пишется во временный файл на диске (FILE_UPLOAD_HANDLERS),
+а не в память. Картинка, у которой большая сторона длиннее
+POSTS_IMAGE_MAX_SIDE, уменьшается. Метаданные (EXIF, ICC, комментарии)
+отбрасываются, поворот из EXIF применяется к пикселям, а результат
+перекодируется во временный файл на диске.
+
+Пиковая память ограничена независимо от размера файла. Размер кадра
+читается из заголовка до декодирования, и картинки больше
+POSTS_IMAGE_MAX_PIXELS отклоняются, поэтому декодированный кадр
+(4 байта на пиксель) не превышает заданного предела. JPEG декодируется
+сразу в уменьшенном масштабе (draft) и занимает в 4–64 раза меньше.
+У анимированных GIF сохраняется первый кадр.
+
+Заодно вычисляются размеры результата и цвет заглушки, которые
+сохраняются в записи: шаблонам не нужно открывать файл.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image, ImageOps
+
+# формат → расширение; прочие форматы перекодируются в PNG или JPEG
+SAVE_FORMATS = {'JPEG': 'jpg', 'PNG': 'png', 'GIF': 'gif', 'WEBP': 'webp'}
+EXIF_ORIENTATION = 0x0112
+PLACEHOLDER_SAMPLE = 16
+
+
+def _save_options(image_format):
+    quality = settings.POSTS_IMAGE_QUALITY
+    return {
+        'JPEG': {'quality': quality, 'optimize': True, 'progressive': True},
+        'WEBP': {'quality': quality},
+        'PNG': {'optimize': True},
+    }.get(image_format, {})
+
+
+def _target_format(image):
+    if image.format in SAVE_FORMATS:
+        return image.format
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (
+        'transparency' in image.info
+    )
+    return 'PNG' if has_alpha else 'JPEG'
+
+
+def dominant_color(image):
+    """Средний цвет картинки в виде #rrggbb для заглушки."""
+    sample = image.resize((PLACEHOLDER_SAMPLE, PLACEHOLDER_SAMPLE))
+    red, green, blue = sample.convert('RGB').reduce(
+        PLACEHOLDER_SAMPLE
+    ).getpixel((0, 0))
+    return f'#{red:02x}{green:02x}{blue:02x}'
+
+
+def image_metadata(file):
+    """Ширина, высота и цвет заглушки уже сохранённой картинки.
+
+    Размеры читаются из заголовка, а для цвета JPEG декодируется
+    в наименьшем масштабе.
+    """
+    with Image.open(file) as image:
+        width, height = image.size
+        if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+            width, height = height, width
+        image.draft('RGB', (PLACEHOLDER_SAMPLE, PLACEHOLDER_SAMPLE))
+        return width, height, dominant_color(image)
+
+
+def normalize_image(upload):
+    """Уменьшенная копия картинки без метаданных во временном файле.
+
+    Возвращает TemporaryUploadedFile с дополнительными атрибутами
+    image_size (ширина, высота) и placeholder (цвет заглушки); для
+    слишком большого кадра выбрасывает ValidationError.
+    """
+    upload.seek(0)
+    image = Image.open(upload)
+    width, height = image.size
+    if width * height > settings.POSTS_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            f'Картинка {width}×{height} слишком большая: допускается '
+            f'не больше {settings.POSTS_IMAGE_MAX_PIXELS} пикселей.',
+            code='image_too_large',
+        )
+    image_format = _target_format(image)
+    max_side = settings.POSTS_IMAGE_MAX_SIDE
+    # для JPEG декодер сразу уменьшает кадр в 2–8 раз
+    image.draft(None, (max_side, max_side))
+    image.thumbnail((max_side, max_side))
+    # exif_transpose всегда копирует кадр, поэтому вызывается по делу
+    if image.getexif().get(EXIF_ORIENTATION, 1) != 1:
+        image = ImageOps.exif_transpose(image)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    extension = SAVE_FORMATS[image_format]
+    name = f'{os.path.splitext(os.path.basename(upload.name))[0]}.{extension}'
+    output = TemporaryUploadedFile(
+        name, Image.MIME.get(image_format, 'application/octet-stream'), 0,
+        None
+    )
+    # из метаданных остаётся только прозрачность палитры
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key == 'transparency'
+    }
+    image.save(output, image_format, **_save_options(image_format))
+    output.size = output.tell()
+    output.seek(0)
+    output.image_size = image.size
+    output.placeholder = dominant_color(image)
+    return output
@@ -1,71 +1,162 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import (Http404, HttpResponseBadRequest,
+                         StreamingHttpResponse)
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
+
+from core.decorators import query_budget
+from core.page_cache import add_cache_tags
 
-from .forms import CommentForm, PostForm
+from .caching import (GROUPS_TAG, POSTS_TAG, followers_tag,
+                      fragment_context, group_tag, page_author_tags,
+                      post_tag, user_tag)
+from .conditional import (feed_etag, post_etag, post_last_modified,
+                          profile_etag)
+from .counters import get_user_stats
+from .export import (CONTENT_TYPES, EXPORTS, ExportError, as_blocks,
+                     export_records)
+from .feeds import follow_feed
+from .forms import CommentForm, ExportForm, PostForm
 from .models import Comment, Follow, Group, Post, User
+from .paginators import CachedCountPaginator, CursorPaginator
+from .search import search_posts
 
 POSTS_PER_PAGE = 10
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, POSTS_PER_PAGE)
+def get_page_context(queryset, request, count=None, **paginator_kwargs):
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None or settings.POSTS_PAGINATION == 'page':
+        paginator = CachedCountPaginator(
+            queryset, POSTS_PER_PAGE, count, **paginator_kwargs
+        )
+        page_obj = paginator.get_page(page_number)
+    else:
+        paginator = CursorPaginator(
+            queryset, POSTS_PER_PAGE, **paginator_kwargs
+        )
+        page_obj = paginator.get_cursor_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
     return {
         'paginator': paginator,
         'page_number': page_number,
         'page_obj': page_obj,
+        'feed_cache': fragment_context(request, page_obj),
     }
 
 
+@query_budget(4)
+@condition(etag_func=feed_etag)
 def index(request):
-    posts = Post.objects.select_related('group')
+    posts = Post.objects.select_related('author', 'group')
     paginate = get_page_context(posts, request)
-    context = {'page_obj': paginate['page_obj']}
-    return render(request, 'posts/index.html', context)
+    context = {
+        'page_obj': paginate['page_obj'],
+        'feed_cache': paginate['feed_cache'],
+    }
+    response = render(request, 'posts/index.html', context)
+    return add_cache_tags(
+        response, POSTS_TAG, GROUPS_TAG,
+        *page_author_tags(paginate['page_obj'])
+    )
 
 
+@query_budget(5)
+@condition(etag_func=feed_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
+    posts = group.posts.select_related('author')
     paginate = get_page_context(posts, request)
     context = {
         'group': group,
         'posts': posts,
         'page_obj': paginate['page_obj'],
+        'feed_cache': paginate['feed_cache'],
     }
-    return render(request, 'posts/group_list.html', context)
+    response = render(request, 'posts/group_list.html', context)
+    return add_cache_tags(
+        response, POSTS_TAG, group_tag(group.pk),
+        *page_author_tags(paginate['page_obj'])
+    )
 
 
+@query_budget(7)
+@condition(etag_func=profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    count = author.posts.count()
-    following = Follow.objects.filter(author__username=username).exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.select_related('group')
+    stats = get_user_stats(author)
+    count = stats.posts_count
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author=author
+    ).exists()
     paginate = get_page_context(posts, request)
     context = {
         'author': author,
+        'stats': stats,
         'count': count,
         'page_obj': paginate['page_obj'],
+        'feed_cache': paginate['feed_cache'],
         'following': following,
     }
-    return render(request, 'posts/profile.html', context)
+    response = render(request, 'posts/profile.html', context)
+    return add_cache_tags(
+        response, user_tag(author.pk), followers_tag(author.pk), GROUPS_TAG
+    )
 
 
+@query_budget(5)
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
-    comments = Comment.objects.filter(post=post)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
+    comments = Comment.objects.filter(post=post).select_related('author')
     form = CommentForm(request.POST, request.FILES or None)
     context = {
         'post': post,
+        'author_stats': get_user_stats(post.author),
         'comments': comments,
         'form': form,
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    tags = [post_tag(post.pk), user_tag(post.author_id)]
+    if post.group_id:
+        tags.append(group_tag(post.group_id))
+    return add_cache_tags(response, *tags)
+
+
+@query_budget(4)
+def search(request):
+    """Записи, найденные по словам запроса, в порядке релевантности."""
+    query = request.GET.get('q', '').strip()
+    posts = search_posts(
+        Post.objects.select_related('author', 'group'), query
+    )
+    page_obj = CachedCountPaginator(posts, POSTS_PER_PAGE).get_page(
+        request.GET.get('page')
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+        'page_query': urlencode({'q': query}) + '&',
+    }
+    response = render(request, 'posts/search.html', context)
+    return add_cache_tags(
+        response, POSTS_TAG, GROUPS_TAG, *page_author_tags(page_obj)
+    )
 
 
 @login_required
+@query_budget(7)
 def post_create(request):
     if request.method == 'POST':
         form = PostForm(
@@ -73,9 +164,8 @@ def post_create(request):
             files=request.FILES or None
         )
         if form.is_valid():
-            post = form.save(commit=False)
-            post.author = request.user
-            post.save()
+            form.instance.author = request.user
+            form.save()
             return redirect('posts:profile', request.user)
         context = {
             'form': form,
@@ -90,6 +180,7 @@ def post_create(request):
 
 
 @login_required
+@query_budget(6)
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     if post.author != request.user:
@@ -111,6 +202,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@query_budget(5)
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -123,14 +215,16 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(4)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginate = get_page_context(posts, request)
+    entries, paginator_kwargs = follow_feed(request.user)
+    paginate = get_page_context(entries, request, **paginator_kwargs)
     context = {'page_obj': paginate['page_obj']}
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@query_budget(10)
 def profile_follow(request, username):
     following = get_object_or_404(User, username=username)
     if request.user != following:
@@ -139,7 +233,35 @@ def profile_follow(request, username):
 
 
 @login_required
+@query_budget(9)
 def profile_unfollow(request, username):
     following = get_object_or_404(User, username=username)
     Follow.objects.filter(author=following, user=request.user).delete()
     return redirect('posts:follow_index')
+
+
+@staff_member_required
+def export(request, table):
+    """Потоковая выгрузка таблицы в NDJSON или CSV для персонала."""
+    if table not in EXPORTS:
+        raise Http404
+    form = ExportForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    fmt = form.cleaned_data['format'] or 'ndjson'
+    try:
+        records = export_records(
+            table, fmt,
+            since=form.cleaned_data['since'],
+            until=form.cleaned_data['until'],
+            after=form.cleaned_data['after'],
+        )
+    except ExportError as error:
+        return HttpResponseBadRequest(str(error))
+    response = StreamingHttpResponse(
+        as_blocks(records), content_type=CONTENT_TYPES[fmt]
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="{table}.{fmt}"'
+    )
+    return response
@@ -1,4 +1,8 @@
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -23,9 +27,30 @@ INTERNAL_IPS = [
     '127.0.0.1',
 ] 
 
+# manage.py test и pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+
+# LRU в памяти процесса перед общим для процессов файлом SQLite.
+CACHE_LOCATION = os.getenv(
+    'CACHE_LOCATION', default=os.path.join(BASE_DIR, 'cache.sqlite3')
+)
+if TESTING:
+    # тесты очищают кэш и не должны трогать файл сервера разработки
+    _test_cache_dir = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    atexit.register(shutil.rmtree, _test_cache_dir, ignore_errors=True)
+    CACHE_LOCATION = os.path.join(_test_cache_dir, 'cache.sqlite3')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.TieredCache',
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {
+            # общий уровень хранит страницы, фрагменты, версии тегов,
+            # ленты авторов и ключи sorl; по умолчанию Django всего 300
+            'MAX_ENTRIES': 50000,
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_MAX_BYTES': 16 * 1024 * 1024,
+        },
     }
 }
 
@@ -53,6 +78,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'core.middleware.AnonymousPageCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -130,5 +156,69 @@ STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Паджинация лент: 'cursor' — по ключу (pub_date, id) без OFFSET,
+# 'page' — классическая ?page=N. Явный ?page=N работает в обоих режимах.
+POSTS_PAGINATION = 'cursor'
+
+# Движок ленты подписок: 'timeline' — материализованная лента
+# (fan-out on write), 'merge' — слияние кэшированных лент авторов
+# (fan-out on read), 'join' — JOIN между Follow и Post.
+# После переключения на 'timeline' выполните manage.py rebuild_timelines.
+FOLLOW_FEED_ENGINE = 'timeline'
+
+# Превышение бюджета SQL-запросов view-функцией (core.decorators):
+# True — исключение QueryBudgetExceeded, False — предупреждение в журнале.
+QUERY_BUDGET_RAISE = False
+
+# Кэш полных страниц для анонимных GET-запросов (core.middleware).
+# По умолчанию включён только при DEBUG = False; переменная окружения
+# PAGE_CACHE_ENABLED=1 (или 0) задаёт его явно, например в .env.
+PAGE_CACHE_ENABLED = os.getenv(
+    'PAGE_CACHE_ENABLED', default=str(not DEBUG)
+).lower() in ('1', 'true', 'yes')
+
+# Варианты картинок записей (posts.thumbnails): ширины в пикселях,
+# пропорции кадра (None — без обрезки) и атрибут sizes тега <img>.
+POSTS_IMAGE_PRESETS = {
+    'feed': {
+        'widths': (360, 720, 960),
+        'crop': (960, 339),
+        'sizes': '(max-width: 576px) 100vw, 960px',
+    },
+    'detail': {
+        'widths': (480, 960, 1440),
+        'crop': None,
+        'sizes': '(max-width: 768px) 100vw, 75vw',
+    },
+}
+# Форматы, создаваемые рядом с основным форматом миниатюр.
+POSTS_IMAGE_EXTRA_FORMATS = ('WEBP',)
+
+# Нормализация загружаемых картинок (posts.uploads): наибольшая сторона
+# после уменьшения, предельное число пикселей исходного кадра и качество
+# перекодирования JPEG и WebP.
+POSTS_IMAGE_MAX_SIDE = 2560
+POSTS_IMAGE_MAX_PIXELS = 60 * 1000 * 1000
+POSTS_IMAGE_QUALITY = 85
+
+# Картинки записей хранятся под именами по хэшу содержимого
+# (posts.storage). Файл, который переиспользовался за последние столько
+# секунд, не удаляется даже без ссылок на него.
+POSTS_IMAGE_REUSE_GRACE = 60
+
+# Загрузки любого размера пишутся во временный файл, а не в память.
+FILE_UPLOAD_HANDLERS = [
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+# Потоки фонового создания миниатюр (posts.thumbnails);
+# 0 — создавать миниатюры сразу после сохранения записи. В тестах
+# потоки не запускаются: они писали бы во временный MEDIA_ROOT, который
+# тест уже удаляет.
+POSTS_THUMBNAIL_WORKERS = 0 if TESTING else 2
+# Сколько заданий может ждать в очереди пула; при заполненной очереди
+# миниатюры создаются в потоке запроса.
+POSTS_THUMBNAIL_QUEUE_SIZE = 100
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')